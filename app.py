@@ -1,87 +1,348 @@
 #!/usr/bin/env python3
 """Main applicatin where all routes will be run."""
 from flask import Flask, render_template, url_for, current_app, request
-from flask import flash, session, redirect
+from flask import flash, session, redirect, jsonify, abort
+from flask import Response, stream_with_context, g, Blueprint
 from application.models.services import GlobalServices
+from application.models.async_services import AsyncGlobalServices
 from application.models.paypal_handler import PayPalHandler
+from application.models.session_store import create_session_interface
+from application.models.fulfillment import FulfillmentQueue, FulfillmentError
+from application.models.bulk import BulkTopUp
+from application.models.helpers import Helpers
+from application.models.outbox import Outbox
+from application.models.ledger import Ledger
+from application.models.reconciler import Reconciler
+from application.models.catalog_snapshot import CatalogSync
+from application.models.circuit_breaker import CircuitBreaker
+from application.models.phone_number import normalize, InvalidPhoneNumber
+from application.models.idempotency import IdempotencyStore
+from application.models.quotes import QuoteEngine
+from application.models.page_cache import PageCache
+from application.models.static_assets import StaticAssets
+from application.models.profiler import SamplingProfiler
+from application.models.traffic_capture import TrafficCapture
+from application.models.metrics import metrics, request_spans, server_timing
+from application.models.config import load_config
+from application.models.lazy import Lazy
+import json
+import time
+import asyncio
+import hmac
 import os
-from dotenv import load_dotenv
 
-app = Flask(__name__)
-
-# Set a secret key for the Flask application
-app.secret_key = os.urandom(24)
-
-
-# Load environment variables from the .env file
-load_dotenv()
+# Routes live on a blueprint registered by create_app().
+main = Blueprint('main', __name__)
+
+# Services are built on first use rather than at import time. With
+# gunicorn --preload the read-only ones are built in the master and
+# shared copy-on-write by the workers, which open their own connections.
+service = Lazy(GlobalServices)
+async_service = Lazy(lambda: AsyncGlobalServices(service.get()))
+paypal_handler = Lazy(lambda: PayPalHandler(
+    os.getenv('PAYPAL_MODE'),
+    os.getenv('PAYPAL_CLIENT_ID'),
+    os.getenv('PAYPAL_CLIENT_SECRET')
+))
+
+# Keep the shared catalog snapshot fresh (off unless an interval is set).
+catalog_sync = Lazy(lambda: CatalogSync(
+    service.get(),
+    service.catalog_snapshot.path,
+    interval=current_app.config['CATALOG_SYNC_INTERVAL']
+))
+
+# Receipts are sent by the outbox in the background (if SMTP is set up).
+helpers = Lazy(lambda: Helpers(Outbox.from_env()))
+
+# Local record of every completed top-up.
+ledger = Lazy(lambda: Ledger(
+    os.getenv('LEDGER_DB_PATH', os.path.join('var', 'ledger.db')),
+    batch_size=int(os.getenv('LEDGER_BATCH_SIZE', '500')),
+    flush_interval=float(os.getenv('LEDGER_FLUSH_INTERVAL', '0.5'))
+))
+
+# Follow submitted top-ups until DT One reports a final status.
+reconciler = Lazy(lambda: Reconciler(
+    service.get(),
+    ledger.get(),
+    os.getenv('RECONCILER_LOCK_PATH', os.path.join('var', 'reconciler.lock')),
+    batch_size=int(os.getenv('RECONCILER_BATCH_SIZE', '50')),
+    concurrency=int(os.getenv('RECONCILER_CONCURRENCY', '4')),
+    max_age=float(os.getenv('RECONCILER_MAX_AGE', '86400'))
+))
+
+# Outcome of every PayPal return, so a refresh never pays or credits twice.
+payment_results = Lazy(lambda: IdempotencyStore(
+    os.getenv('PAYMENT_RESULTS_DB_PATH', os.path.join('var', 'payments.db')),
+    ttl=float(os.getenv('PAYMENT_RESULTS_TTL', '86400')),
+    lock_timeout=float(os.getenv('FULFILLMENT_JOB_TIMEOUT', '300'))
+))
+
+# Server-side prices, cached per (operator, currency).
+quote_engine = Lazy(QuoteEngine)
+
+# Content hashes of static files, added to their URLs.
+static_assets = Lazy(lambda: StaticAssets(current_app.static_folder))
+
+# Landing pages served from the page cache.
+CACHED_PAGES = ('/', '/about', '/services')
+
+# Shown when a payment's outcome is unknown and must be checked by hand.
+PAYMENT_NEEDS_REVIEW = ("We could not confirm your top-up. Your payment "
+                        "needs review; please contact support.")
+
+
+def collect_app_metrics():
+    """Report cache, outbox and ledger statistics to the /metrics route."""
+    for name, value in service.catalog_cache.stats().items():
+        yield f"billhub_catalog_cache_{name}", {}, value
+    for name, value in service.catalog_snapshot.stats().items():
+        yield f"billhub_catalog_snapshot_{name}", {}, value
+    yield "billhub_prefix_index_size", {}, service.prefix_index.size
+    yield "billhub_page_cache_hits", {}, current_app.page_cache.hits
+    yield "billhub_page_cache_renders", {}, current_app.page_cache.renders
+    yield "billhub_quote_unpriced_products", {}, quote_engine.unpriced
+    for endpoint, stats in service.breakers.stats().items():
+        yield ("billhub_circuit_open", {"endpoint": endpoint},
+               int(stats["state"] != CircuitBreaker.CLOSED))
+        yield ("billhub_circuit_rejected", {"endpoint": endpoint},
+               stats["rejected"])
+        yield ("billhub_circuit_opened", {"endpoint": endpoint},
+               stats["opened"])
+    yield "billhub_upstream_rate_delayed", {}, service.rate_limiters.delayed
+    yield "billhub_upstream_rate_shed", {}, service.rate_limiters.shed
+    yield ("billhub_upstream_coalesced", {},
+           service.single_flight.shared + async_service.coalesced)
+    yield "billhub_ledger_pending", {}, ledger.pending()
+    yield "billhub_reconciler_checks", {}, reconciler.checks
+    yield "billhub_reconciler_finalized", {}, reconciler.finalized
+    yield "billhub_reconciler_stuck", {}, reconciler.stuck
+    yield "billhub_reconciler_errors", {}, reconciler.errors
+    outbox = helpers.outbox
+    if outbox is not None:
+        yield "billhub_outbox_pending", {}, outbox.pending()
+        yield "billhub_outbox_sent", {}, outbox.sent
+        yield "billhub_outbox_failed", {}, outbox.failed
+
+
+metrics.register_collector(collect_app_metrics)
+
+
+@main.before_app_request
+def start_background():
+    """Start this worker's background threads on its first request."""
+    start_background_tasks(current_app)
+
+
+@main.before_app_request
+def start_request_timer():
+    """Start timing the request and collecting its upstream spans."""
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started = time.perf_counter()
+    g.metrics_token = request_spans.set([])
+    metrics.inc('billhub_http_request_in_flight', route=g.metrics_route)
+
+
+@main.after_app_request
+def record_request_metrics(response):
+    """Record the request latency and add the timing header."""
+    if 'metrics_started' not in g:
+        # An earlier before_request hook failed before the timer started.
+        return response
+    elapsed = time.perf_counter() - g.metrics_started
+    metrics.observe('billhub_http_request_seconds', elapsed,
+                    route=g.metrics_route, method=request.method)
+    metrics.inc('billhub_http_requests_total', route=g.metrics_route,
+                status=response.status_code)
+    g.metrics_recorded = True
+    if current_app.config['METRICS_TIMING_HEADER']:
+        response.headers['Server-Timing'] = server_timing(
+            request_spans.get() or [], total=elapsed)
+    return response
+
+
+@main.after_app_request
+def capture_traffic(response):
+    """Record the request for replay when capture is on."""
+    if current_app.traffic_capture.enabled and 'metrics_started' in g:
+        session_id = getattr(session, 'sid', None) or request.cookies.get(
+            current_app.config['SESSION_COOKIE_NAME'])
+        current_app.traffic_capture.record(
+            request,
+            response,
+            session_id,
+            time.perf_counter() - g.metrics_started
+        )
+    return response
 
-#  Retrieve Paypal credentials from environment
-PAYPAL_MODE = os.getenv('PAYPAL_MODE')
-PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID')
-PAYPAL_CLIENT_SECRET = os.getenv('PAYPAL_CLIENT_SECRET')
 
+@main.after_app_request
+def cache_static_files(response):
+    """Let browsers keep fingerprinted static files."""
+    if request.endpoint == 'static':
+        static_assets.cache_response(
+            request.view_args.get('filename'),
+            request.args.get('v'),
+            response
+        )
+    return response
+
+
+@main.app_url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Add content hashes to the URLs of static files."""
+    static_assets.url_defaults(endpoint, values)
+
+
+@main.teardown_app_request
+def finish_request_metrics(error=None):
+    """Close the request's in-flight gauge, even when a view raised."""
+    # Streamed responses push the request context again, so this can run
+    # twice for one request; only the first call counts.
+    if g.pop('metrics_started', None) is None:
+        return
+    # Errors turned into a 500 response were counted by the after-request
+    # hook; only count those that never reached it.
+    if error is not None and not g.get('metrics_recorded'):
+        metrics.inc('billhub_http_requests_total', route=g.metrics_route,
+                    status=500)
+    metrics.dec('billhub_http_request_in_flight', route=g.metrics_route)
+    request_spans.reset(g.metrics_token)
+
+
+@main.route('/metrics')
+def metrics_endpoint():
+    """Expose application metrics in the Prometheus text format."""
+    token = os.getenv('METRICS_TOKEN')
+    if token and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+    return Response(metrics.render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@main.route('/admin/profiler', methods=['GET', 'POST'])
+def profiler_admin():
+    """
+    Show or change the state of this worker's sampling profiler.
 
-# Instantiate the classes needed.
-service = GlobalServices()
-paypal_handler = PayPalHandler(
-    PAYPAL_MODE,
-    PAYPAL_CLIENT_ID,
-    PAYPAL_CLIENT_SECRET
-)
+    A POST takes an `action`: start (with an optional `sample_rate`),
+    stop, or dump, which writes the stacks collected so far. Each worker
+    has its own profiler; to reach a given worker, send it the
+    PROFILER_SIGNAL instead. Requires PROFILER_TOKEN as a Bearer token.
 
-# Add different instances to the current_app object
-app.service = service
-app.paypal_handler = paypal_handler
+    Returns:
+        Flask.Response: The profiler status and the files written, as JSON.
+    """
+    token = os.getenv('PROFILER_TOKEN')
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(401)
+
+    profiler = current_app.profiler
+    files = []
+    if request.method == 'POST':
+        action = request.values.get('action')
+        if action == 'start':
+            sample_rate = request.values.get('sample_rate')
+            if sample_rate is not None:
+                try:
+                    sample_rate = float(sample_rate)
+                except ValueError:
+                    sample_rate = 0.0
+                if not 0 < sample_rate <= 1:
+                    return jsonify(
+                        {'error': "sample_rate must be in (0, 1]"}), 400
+            profiler.start(sample_rate)
+        elif action == 'stop':
+            files = profiler.stop()
+        elif action == 'dump':
+            files = profiler.dump()
+        else:
+            return jsonify(
+                {'error': "action must be start, stop or dump"}), 400
+    return jsonify(dict(profiler.status(), files=files))
 
 
-@app.route('/')
+@main.route('/')
 def home():
     """Define home page Route."""
-    return render_template('index.html')
+    return current_app.page_cache.respond('index.html')
 
 
-@app.route('/about')
+@main.route('/about')
 def about():
     """Define the about route."""
-    return render_template('index.html')
+    return current_app.page_cache.respond('index.html')
 
 
-@app.route('/')
+@main.route('/services')
 def services():
     """Define Services route."""
-    return render_template('index.html')
+    return current_app.page_cache.respond('index.html')
 
 
-@app.route('/buy_global_airtime', methods=['GET', 'POST'],
+@main.route('/buy_global_airtime', methods=['GET', 'POST'],
            strict_slashes=True)
-def buy_global_airtime():
+async def buy_global_airtime():
     """Buy airtime globally.
     This route handles the vending of airtime.
     """
     if request.method == 'POST':
-        # Retrive Phone number from the form.
-        phone_number = request.form['Phone_number']
+        # Retrive Phone number from the form and check it locally.
+        try:
+            phone_number = normalize(request.form['Phone_number'])
+        except InvalidPhoneNumber:
+            return render_template(
+                'buy_global_airtime.html',
+                error="Please enter a valid mobile number, "
+                      "including the country code."
+                )
 
-        # lookup the product id based on user phone number.
-        product_id = service.lookup_mobile_number(phone_number)
+        # lookup the operator id based on user phone number.
+        operator_id = await async_service.lookup_mobile_number(phone_number)
+        if operator_id is None:
+            # A lookup that failed fast is no answer about the number.
+            if service.breakers.is_open('lookup/mobile-number') or \
+                    service.rate_limiters.is_limited('lookup/mobile-number'):
+                error = ("Top-ups are temporarily unavailable. "
+                         "Please try again in a few minutes.")
+            else:
+                error = "We could not find the operator of this number."
+            return render_template('buy_global_airtime.html', error=error)
 
         # Store the phone number in the session
         session['phone_number'] = phone_number
 
-        # Retrieve products based on product_it.
-        products = service.get_products(product_id)
+        # Optional email address the receipt is sent to.
+        email = request.form.get('Email', '').strip()
+        if email:
+            session['email'] = email
+
+        # Retrieve products based on operator_id.
+        products = await async_service.get_products(operator_id)
+        if products is None:
+            return render_template(
+                'buy_global_airtime.html',
+                error="No products are available for this number right now."
+                )
 
-        # Store products in session.
-        session['products'] = products
+        # Keep only the operator in the session; the catalog is cached.
+        session['operator_id'] = operator_id
+        quotes = quote_engine.quotes(operator_id, products)
         return render_template(
             'buy_global_airtime.html',
-            products=products
+            products=products,
+            quote=quotes[0],
+            display_quotes=quotes[1:]
             )
     return render_template('buy_global_airtime.html')
 
 
-@app.route('/create_transaction', methods=['POST'])
+@main.route('/create_transaction', methods=['POST'])
 def create_transaction():
     """
     Create a PayPal payment and redirect user to PayPal payment page.
@@ -96,108 +357,421 @@ def create_transaction():
     """
     if request.method == 'POST':
         product_id = request.form['product_id']
-        retail_price = (request.form['retail_price'])
-        transaction_fee = request.form.get('transaction_fee', None)
-        destination_amount = request.form['destination_amount']
         phone_number = session.get('phone_number')
-        print("retail price: ", retail_price)
+        operator_id = session.get('operator_id')
+
+        # Price the product on the server; amounts posted by the browser
+        # are never trusted.
+        total = None
+        if operator_id is not None:
+            total = quote_engine.price(
+                operator_id,
+                product_id,
+                service.get_products(operator_id)
+                )
+        if total is None:
+            flash("This product is no longer available.")
+            return redirect(url_for('main.buy_global_airtime'))
 
         # Store some info in session.
-        session['product_id'] = product_id
-
-        # Add the retail price and the transaction Fee.
-        if transaction_fee:
-            transaction_fee = float(transaction_fee)
-            total = retail_price + transaction_fee
-        else:
-            total = retail_price
+        session['product_id'] = int(product_id)
+        total = f"{total:.2f}"
 
         # Create a PayPal payment
-        paypal_redirect_url = paypal_handler.create_payment(
+        payment_id, paypal_redirect_url = paypal_handler.create_payment(
             total,
             phone_number,
             request
             )
 
         if paypal_redirect_url:
+            # Bind the payment to this order on the server, so the return
+            # from PayPal credits what was paid for.
+            payment_results.save_payment(
+                payment_id,
+                int(product_id),
+                total,
+                operator_id
+                )
             # Redirect the user to the PayPal payment page
             return redirect(paypal_redirect_url)
         else:
             flash("Failed to create PayPal payment.")
-            return redirect(url_for('home'))
+            return redirect(url_for('main.home'))
 
 
-@app.route('/execute_payment')
-def execute_payment():
+async def fulfil_payment(job):
     """
-    Execute PayPal payment and perform action after successful payment.
+    Execute the PayPal payment of a job and credit the customer.
 
-    This route is called when the user returns from PayPal after completing
-    the payment. It executes the PayPal payment using the PayPalHandler class,
-    and if the payment execution is successful, it credits the customer based
-    on the requested service.
+    Args:
+        job (dict): The payment_id, payer_id, phone_number, product_id and
+                    optional receipt email of the purchase.
 
     Returns:
-        Flask.redirect or Flask.render_template: Redirects the user to the home
-        page or renders the success template based on the payment status.
-    """
-    payment_id = request.args.get('paymentId')
-    payer_id = request.args.get('PayerID')
+        dict: The transaction ID and the response of the top-up API.
 
+    Raises:
+        FulfillmentError: If the payment or the top-up fails.
+    """
     # Execute PayPal payment
-    success, error_message = paypal_handler.execute_payment(
-        payment_id,
-        payer_id
+    success, error_message = await asyncio.to_thread(
+        paypal_handler.execute_payment,
+        job['payment_id'],
+        job['payer_id']
+        )
+    if not success:
+        raise FulfillmentError(
+            f"Failed to execute PayPal payment: {error_message}"
         )
 
-    if success:
-        # Retrieve the relevant info from session.
-        product_id = session.get('product_id')
-        phone_number = session.get('phone_number')
+    # Create a unique transaction_id
+    trx_id = service.generate_transaction_id()
+    response = await async_service.create_transaction(
+        job['phone_number'],
+        trx_id,
+        job['product_id']
+        )
+    if response is None:
+        raise FulfillmentError(
+            "Something went wrong and the transaction could not be performed."
+        )
 
-        # Create a unique transaction_id
-        trx_id = service.generate_transaction_id()
+    # Keep a durable record of the top-up (written in the background).
+    ledger.record(
+        trx_id,
+        response,
+        msisdn=job['phone_number'],
+        payment_id=job['payment_id'],
+        product_id=job['product_id']
+    )
+
+    if job.get('email'):
+        # The top-up is done; a receipt that cannot be queued must not
+        # turn it into a failure.
         try:
-            response = service.create_transaction(
-                phone_number,
-                trx_id,
-                product_id
-                )
-            print("Response after sending airtime: ", response)
-            print()
-            # Retrieve information from the response
-            confirmation_date = response.get('confirmation_date')
-            credit_party_mobile_number = response.get('credit_party_identifier', {}).get('mobile_number')
-            retail_price = response.get('prices', {}).get('retail', {}).get('amount')
-            retail_price_currency = response.get('prices', {}).get('retail', {}).get('unit')
-            wholesale_price = response.get('prices', {}).get('wholesale', {}).get('amount')
-            wholesale_price_currency = response.get('prices', {}).get('wholesale', {}).get('unit')
-            operator_name = response.get('product', {}).get('operator', {}).get('name')
-            product_description = response.get('product', {}).get('description')
-            status_message = response.get('status', {}).get('message')
-
-            # Log or print the retrieved information
-            print("Confirmation Date:", confirmation_date)
-            print("Credit Party Mobile Number:", credit_party_mobile_number)
-            print("Retail Price:", retail_price, retail_price_currency)
-            print("Wholesale Price:", wholesale_price, wholesale_price_currency)
-            print("Operator Name:", operator_name)
-            print("Product Description:", product_description)
-            print("Status Message:", status_message)
-            print()
-            print("Transaction_id: ", trx_id)
-            flash("Transaction performed successfully.")
-            return render_template(
-                'success.html',
-                response=response,
-                trx_id=trx_id
-                )
+            helpers.send_receipt_email(trx_id, response, job['email'])
         except Exception as e:
-            flash("Something went wrong and the transaction could not be performed. ", e)
-    else:
-        flash(f"Failed to execute PayPal payment: {error_message}")
-        return redirect(url_for('home'))
+            print(f"Error queueing the receipt of {trx_id}: {e}")
+    return {'trx_id': trx_id, 'response': response}
+
+
+# Run top-ups on background workers; FULFILLMENT_WORKERS=0 runs them inline.
+fulfillment_queue = Lazy(lambda: FulfillmentQueue(
+    lambda job: async_service.run(fulfil_payment(job)),
+    os.getenv('FULFILLMENT_DB_PATH', os.path.join('var', 'jobs.db')),
+    max_workers=current_app.config['FULFILLMENT_WORKERS'],
+    job_timeout=float(os.getenv('FULFILLMENT_JOB_TIMEOUT', '300'))
+))
+
 
+def get_fulfillment_queue():
+    """Return the fulfillment queue, or None if top-ups run inline."""
+    if current_app.config['FULFILLMENT_WORKERS'] <= 0:
+        return None
+    return fulfillment_queue.get()
+
+
+@main.route('/execute_payment')
+async def execute_payment():
+    """
+    Execute PayPal payment and perform action after successful payment.
+
+    This route is called when the user returns from PayPal after completing
+    the payment. The payment execution and the top-up are queued on the
+    fulfillment workers and the user gets a status page that polls the
+    job until it finishes.
+
+    Returns:
+        Flask.redirect or Flask.render_template: Redirects the user to the home
+        page or renders the status (or success) template.
+    """
+    job = {
+        'payment_id': request.args.get('paymentId'),
+        'payer_id': request.args.get('PayerID'),
+        'phone_number': session.get('phone_number'),
+        'email': session.get('email')
+    }
+    if not job['payment_id'] or not job['payer_id']:
+        flash("Missing PayPal payment details.")
+        return redirect(url_for('main.home'))
+
+    # Credit the product the payment was created for, never one taken
+    # from a session that may have moved on to another order.
+    payment = payment_results.get_payment(job['payment_id'])
+    if payment is None or payment['product_id'] != session.get('product_id'):
+        flash("This payment does not match your order.")
+        return redirect(url_for('main.home'))
+    job['product_id'] = payment['product_id']
+
+    # Only the first request for a payment runs it; repeats get its outcome.
+    key = f"{job['payment_id']}:{job['payer_id']}"
+    claimed, entry = payment_results.claim(key)
+    if not claimed:
+        return await replay_payment(key, entry)
+
+    queue = get_fulfillment_queue()
+    if queue is not None:
+        job_id = queue.submit(job)
+        payment_results.set_job(key, job_id)
+        return render_template('fulfillment_status.html', job_id=job_id)
+
+    try:
+        result = await fulfil_payment(job)
+    except FulfillmentError as e:
+        payment_results.fail(key, str(e))
+        flash(str(e))
+        return redirect(url_for('main.home'))
+    except Exception as e:
+        # The payment may have gone through; never leave the key pending.
+        print(f"Error fulfilling payment {job['payment_id']}: {e}")
+        payment_results.fail(key, PAYMENT_NEEDS_REVIEW)
+        flash(PAYMENT_NEEDS_REVIEW)
+        return redirect(url_for('main.home'))
+    payment_results.complete(key, result)
+    flash("Transaction performed successfully.")
+    return render_template(
+        'success.html',
+        response=result['response'],
+        trx_id=result['trx_id']
+        )
+
+
+async def replay_payment(key, entry):
+    """
+    Answer a repeated PayPal return with the outcome of the first one.
+
+    Args:
+        key (str): The paymentId:PayerID idempotency key.
+        entry (dict): The entry stored for the key.
+
+    Returns:
+        Flask.redirect or Flask.render_template: The same page the first
+        request led to.
+    """
+    if entry['status'] == IdempotencyStore.PENDING and not entry['job_id']:
+        # The first request is still running in another thread or worker.
+        entry = await asyncio.to_thread(payment_results.wait, key) or entry
+
+    if entry['job_id']:
+        return redirect(url_for('main.fulfillment', job_id=entry['job_id']))
+    if entry['abandoned']:
+        # The first request died before it queued a job or stored its
+        # outcome, so whether the payment was executed is unknown.
+        flash(PAYMENT_NEEDS_REVIEW)
+        return redirect(url_for('main.home'))
+    if entry['status'] == IdempotencyStore.DONE:
+        flash("Transaction performed successfully.")
+        return render_template(
+            'success.html',
+            response=entry['result']['response'],
+            trx_id=entry['result']['trx_id']
+            )
+    if entry['status'] == IdempotencyStore.FAILED:
+        flash(entry['error'])
+        return redirect(url_for('main.home'))
+    flash("This payment is still being processed. Please check back later.")
+    return redirect(url_for('main.home'))
+
+
+@main.route('/job_status/<job_id>')
+def job_status(job_id):
+    """Return the status and timing of a fulfillment job as JSON."""
+    queue = get_fulfillment_queue()
+    if queue is None:
+        abort(404)
+    job = queue.get(job_id)
+    if job is None:
+        abort(404)
+    job.pop('result')
+    return jsonify(job)
+
+
+@main.route('/fulfillment/<job_id>')
+def fulfillment(job_id):
+    """Show the outcome of a fulfillment job."""
+    queue = get_fulfillment_queue()
+    if queue is None:
+        abort(404)
+    job = queue.get(job_id)
+    if job is None:
+        abort(404)
+    if job['status'] == FulfillmentQueue.DONE:
+        flash("Transaction performed successfully.")
+        return render_template(
+            'success.html',
+            response=job['result']['response'],
+            trx_id=job['result']['trx_id']
+            )
+    if job['status'] == FulfillmentQueue.FAILED:
+        flash(job['error'])
+        return redirect(url_for('main.home'))
+    return render_template('fulfillment_status.html', job_id=job_id)
+
+
+@main.route('/transaction_status/<trx_id>')
+def transaction_status(trx_id):
+    """
+    Return the latest known status of a transaction as JSON.
+
+    The status is read from the ledger, which the reconciler keeps up to
+    date, so polling this route never calls the top-up API.
+    """
+    entry = ledger.get(trx_id)
+    if entry is None:
+        return jsonify({'trx_id': trx_id, 'status': None, 'final': False})
+    return jsonify({
+        'trx_id': trx_id,
+        'status': entry['status'],
+        'final': entry['next_check_at'] is None
+    })
+
+
+@main.route('/bulk_topup', methods=['POST'])
+def bulk_topup():
+    """
+    Credit many mobile numbers in one request.
+
+    The request body (or an uploaded `file`) is a CSV or JSONL document of
+    msisdn and product_id rows. Each row's result is streamed back as a
+    JSON line as soon as it finishes. Requires the BULK_API_KEY in the
+    X-API-Key header.
+
+    Returns:
+        Flask.Response: A streamed application/x-ndjson response.
+    """
+    api_key = os.getenv('BULK_API_KEY')
+    if not api_key:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-API-Key', ''), api_key):
+        abort(401)
+
+    upload = request.files.get('file')
+    text = upload.read().decode() if upload else request.get_data(as_text=True)
+    try:
+        rows = BulkTopUp.parse_rows(text)
+    except (ValueError, KeyError) as e:
+        return jsonify({'error': f"Invalid bulk file: {e}"}), 400
+
+    bulk = BulkTopUp(
+        service,
+        ledger,
+        concurrency=current_app.config['BULK_CONCURRENCY']
+    )
+
+    def generate():
+        for result in bulk.run(rows):
+            yield json.dumps(result) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson'
+    )
+
+
+_background_pid = None
+
+
+def start_background_tasks(app):
+    """
+    Start the background threads of the current process.
+
+    Threads do not survive a fork, so they are started in each worker:
+    from gunicorn's post_fork hook, or else on the worker's first request.
+    Later calls in the same process return immediately, once a call has
+    succeeded; after a failure, the next request tries again.
+
+    Args:
+        app (Flask): The application whose settings are used.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with app.app_context():
+        if app.config['CATALOG_SYNC_INTERVAL'] > 0:
+            catalog_sync.start()
+        if app.config['RECONCILER_ENABLED']:
+            reconciler.start()
+        # Fail the jobs a previous run left running, and pick up the ones
+        # it left queued, without waiting for this worker's first job.
+        queue = get_fulfillment_queue()
+        if queue is not None:
+            queue.start()
+    _background_pid = os.getpid()
+
+
+def preload_shared_data(app):
+    """
+    Load the read-only data worth sharing before gunicorn forks.
+
+    Compiles every template, renders the cached pages and maps the
+    catalog snapshot, so workers inherit them copy-on-write instead of
+    each loading their own copy.
+
+    Args:
+        app (Flask): The application to preload.
+    """
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        service.catalog_snapshot.load()
+        quote_engine.get()
+    for path in CACHED_PAGES:
+        with app.test_request_context(path):
+            app.view_functions[request.endpoint]()
+
+
+def create_app(config=None):
+    """
+    Create the Flask application.
+
+    The configuration is loaded once, here. Services are not built until
+    they are first used, and no connection or thread is opened, so the
+    application can be preloaded by a gunicorn master before it forks.
+
+    Args:
+        config (dict, optional): Settings overriding the environment.
+
+    Returns:
+        Flask: The application.
+    """
+    app = Flask(__name__)
+    app.config.from_mapping(load_config(config))
+
+    # Keep session data on the server; the cookie only holds the session ID.
+    session_interface = create_session_interface()
+    if session_interface is not None:
+        app.session_interface = session_interface
+
+    # Add different instances to the current_app object
+    app.service = service
+    app.async_service = async_service
+    app.paypal_handler = paypal_handler
+    app.helpers = helpers
+    app.ledger = ledger
+    app.reconciler = reconciler
+    app.catalog_sync = catalog_sync
+    app.payment_results = payment_results
+    app.quote_engine = quote_engine
+    # Pages that do not depend on the session are rendered once.
+    app.page_cache = PageCache()
+    app.fulfillment_queue = fulfillment_queue
+    # Purchase-flow requests recorded for replay (off unless CAPTURE_PATH
+    # is set). Built here, once load_config has read the .env file.
+    app.traffic_capture = TrafficCapture()
+    app.start_background_tasks = lambda: start_background_tasks(app)
+    app.preload_shared_data = lambda: preload_shared_data(app)
+
+    app.register_blueprint(main)
+
+    # Off until switched on by PROFILER_SIGNAL or /admin/profiler.
+    app.profiler = SamplingProfiler(app)
+    app.wsgi_app = app.profiler
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
+    app.profiler.install_signal_handler()
     app.run(debug=True, host='0.0.0.0')
@@ -0,0 +1,409 @@
+"""Define the async services module.
+
+This module contains an asyncio counterpart of GlobalServices built on a
+pooled httpx.AsyncClient. All upstream calls run on one event loop owned
+by the instance, so connections stay pooled across requests even though
+Flask runs each async view on its own short-lived loop.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+
+from application.models.metrics import metrics, endpoint_label, add_span
+from application.models.product import parse_products
+from application.models.pager import total_pages
+from application.models.circuit_breaker import CircuitBreaker
+from application.models.circuit_breaker import CircuitOpenError
+from application.models.rate_limit import RateLimitedError
+from application.models.single_flight import AsyncSingleFlight
+
+
+class AsyncGlobalServices:
+    """Define AsyncGlobalServices class.
+
+    Offers the same lookup_mobile_number, get_products and
+    create_transaction methods as GlobalServices, as coroutines. The
+    configuration, catalog cache and prefix index are shared with the
+    GlobalServices instance it is built from.
+    """
+
+    def __init__(self, services, pool_size=None, max_retries=None,
+                 backoff_factor=None):
+        """Initialize the AsyncGlobalServices instance.
+
+        Args:
+            services (GlobalServices): The synchronous service to share
+                                       configuration and caches with.
+            pool_size (int, optional): Maximum number of open connections.
+            max_retries (int, optional): Retries for idempotent GETs.
+            backoff_factor (float, optional): Backoff factor between
+                                              retries.
+        """
+        self.services = services
+        self.base_url = services.base_url
+        self.catalog_cache = services.catalog_cache
+        self.prefix_index = services.prefix_index
+        self.breakers = services.breakers
+        self.rate_limiters = services.rate_limiters
+        self.pool_size = pool_size or int(
+            os.getenv("SERVICES_ASYNC_POOL_SIZE", "100"))
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.getenv("SERVICES_MAX_RETRIES", "2"))
+        self.backoff_factor = backoff_factor or float(
+            os.getenv("SERVICES_RETRY_BACKOFF", "0.3"))
+        self._loop = None
+        self._client = None
+        self._single_flight = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self):
+        """Start the event loop thread of this process if needed."""
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._loop = asyncio.new_event_loop()
+                self._client = None
+                self._single_flight = AsyncSingleFlight()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="async-services",
+                    daemon=True
+                ).start()
+            return self._loop
+
+    def _get_client(self):
+        """Return the pooled HTTP client, creating it on the service loop."""
+        if self._client is None:
+            connect_timeout, read_timeout = self.services.timeout
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=httpx.BasicAuth(
+                    self.services.auth.username,
+                    self.services.auth.password
+                ),
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+            )
+        return self._client
+
+    async def _submit(self, coro, span=None):
+        """Run coro on the service loop and await it from any loop.
+
+        The wait is added to the caller's request timing under span.
+        """
+        loop = self._ensure_loop()
+        started = time.perf_counter()
+        try:
+            if asyncio.get_running_loop() is loop:
+                return await coro
+            return await asyncio.wrap_future(
+                asyncio.run_coroutine_threadsafe(coro, loop)
+            )
+        finally:
+            if span is not None:
+                add_span(span, time.perf_counter() - started)
+
+    def run(self, coro):
+        """Run coro on the service loop and block until it is done.
+
+        Lets synchronous code, such as the fulfillment workers, use the
+        same pooled client.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    @property
+    def coalesced(self):
+        """Return how many calls shared an identical call in flight."""
+        flights = self._single_flight
+        return flights.shared if flights is not None else 0
+
+    async def _coalesced(self, key, call):
+        """Await call(), sharing it with identical calls in flight.
+
+        Must run on the service loop.
+        """
+        return await self._single_flight.do(key, call)
+
+    async def _hedged(self, label, call):
+        """
+        Run a read-only call, starting a second copy if it is slow.
+
+        Args:
+            label (str): The endpoint label of the call.
+            call (callable): Returns a coroutine for one copy of the call,
+                             whose result is None on failure.
+
+        Returns:
+            The first successful result, or None if both copies failed.
+        """
+        if self.services.hedge_after <= 0:
+            return await call()
+        first = asyncio.ensure_future(call())
+        done, _ = await asyncio.wait({first},
+                                     timeout=self.services.hedge_after)
+        if done or self.breakers.get(label).state != CircuitBreaker.CLOSED:
+            return await first
+        metrics.inc("billhub_upstream_hedged_total", endpoint=label)
+        pending = {first, asyncio.ensure_future(call())}
+        result = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result is not None:
+                        return result
+            return result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _make_get_request(self, endpoint, params=None):
+        """Make a GET request to the specified endpoint."""
+        response = await self._get_response(endpoint, params)
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError as e:
+            print(f"Error occurred during GET request: {e}")
+            return None
+
+    async def _get_response(self, endpoint, params=None):
+        """Make a GET request, retrying failures, and return the response."""
+        client = self._get_client()
+        label = endpoint_label(endpoint)
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.rate_limiters.acquire_async(label)
+                with self.breakers.guard(label), \
+                        metrics.timer("billhub_upstream_seconds",
+                                      endpoint=label, method="GET"):
+                    response = await client.get(endpoint, params=params)
+                    response.raise_for_status()
+                return response
+            except (CircuitOpenError, RateLimitedError) as e:
+                print(f"{e}; failing fast.")
+                return None
+            except httpx.HTTPStatusError as e:
+                if (e.response.status_code in (429, 500, 502, 503, 504)
+                        and attempt < self.max_retries):
+                    await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+                    continue
+                print(f"Error occurred during GET request: {e}")
+                return None
+            except httpx.TransportError as e:
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+                    continue
+                print(f"Error occurred during GET request: {e}")
+                return None
+            except httpx.HTTPError as e:
+                print(f"Error occurred during GET request: {e}")
+                return None
+
+    async def _make_post_request(self, method, endpoint, payload=None):
+        """Make a request with a JSON payload to the specified endpoint.
+
+        Args:
+            method (str): The HTTP method ("GET", "POST", "PUT", "DELETE")
+            endpoint (str): The endpoint URL.
+            payload (dict, optional): The data to include in the request.
+
+        Returns:
+            dict or None: The JSON response from the server,
+                            or None if an error occurs.
+        """
+        label = endpoint_label(endpoint)
+        try:
+            await self.rate_limiters.acquire_async(label)
+            with self.breakers.guard(label), \
+                    metrics.timer("billhub_upstream_seconds",
+                                  endpoint=label, method=method):
+                response = await self._get_client().request(
+                    method,
+                    endpoint,
+                    json=payload
+                )
+                response.raise_for_status()
+                return response.json()
+        except (CircuitOpenError, RateLimitedError) as e:
+            print(f"{e}; failing fast.")
+            return None
+        except (httpx.HTTPError, ValueError) as http_err:
+            print(f"HTTP error occurred: {http_err}")
+            return None
+
+    async def lookup_mobile_number(self, mobile_number):
+        """
+        Perform a lookup for the given mobile number using the Dtone API.
+
+        Args:
+            mobile_number (str): The mobile number to lookup.
+
+        Returns:
+            Operator_id(int): The Operator ID that identifies the operator,
+                              or None if the number is invalid.
+        """
+        mobile_number, operator_id = self.services._lookup_locally(
+            mobile_number)
+        if mobile_number is None or operator_id is not None:
+            return operator_id
+        # Concurrent lookups of the same number share one API call.
+        key = ("lookup", mobile_number)
+        return await self._submit(
+            self._coalesced(key,
+                            lambda: self._lookup_mobile_number(mobile_number)),
+            span="lookup/mobile-number"
+        )
+
+    async def _lookup_mobile_number(self, mobile_number):
+        """Ask the API for the operator of a number and learn the result."""
+        endpoint = "lookup/mobile-number"
+        payload = {
+            "mobile_number": mobile_number,
+            "page": 1,
+            "per_page": self.services.lookup_per_page
+        }
+        # The lookup has no side effects, so it may be hedged.
+        result = await self._hedged(
+            endpoint,
+            lambda: self._make_post_request("POST", endpoint, payload)
+        )
+        if not result:
+            print("Invalid Number")
+            return None
+        for item in result:
+            if item.get('identified'):
+                operator_id = item.get('id')
+                self.services.lookup_cache.set(mobile_number, operator_id)
+                self.prefix_index.learn(mobile_number, operator_id)
+                return operator_id
+        print("Invalid Number")
+        return None
+
+    async def get_products(self, operator_id):
+        """
+        Retrieve products from the API, filtered by operator ID.
+
+        Args:
+            operator_id (int): The operator ID to filter products.
+
+        Returns:
+            list or None: A list of Product records, or None if an error occurs
+        """
+        if operator_id is None:
+            return None
+        products = self.services.catalog_snapshot.get_products(operator_id)
+        if products is not None:
+            return products
+        products, refresh = self.catalog_cache.lookup(operator_id)
+        if refresh:
+            asyncio.run_coroutine_threadsafe(
+                self._refresh_products(operator_id), self._ensure_loop()
+            )
+        if products is None:
+            products = await self._submit(
+                self._coalesced(
+                    ("products", operator_id),
+                    lambda: self._hedged(
+                        "products", lambda: self._fetch_products(operator_id))
+                ),
+                span="products"
+            )
+            if products is not None:
+                self.catalog_cache.set(operator_id, products)
+            else:
+                # Better an outdated catalog than none while the API fails.
+                products = self.services.catalog_snapshot.get_products(
+                    operator_id, stale_ok=True)
+        return products
+
+    async def _fetch_products(self, operator_id):
+        """Fetch the products of one operator from the API.
+
+        Pages after the first are fetched concurrently, at most
+        SERVICES_PAGE_CONCURRENCY at a time.
+        """
+        per_page = self.services.page_size
+        params = {"operator_id": operator_id, "per_page": per_page}
+        semaphore = asyncio.Semaphore(self.services.page_concurrency)
+
+        async def fetch_page(page):
+            async with semaphore:
+                response = await self._get_response(
+                    "products", params={**params, "page": page})
+            try:
+                return response, parse_products(response.json())
+            except (AttributeError, ValueError):
+                return None, None
+
+        first, products = await fetch_page(1)
+        if products is None:
+            print("No products received from the API.")
+            return None
+        pages = total_pages(first.headers)
+        if pages is None:
+            # Without a page count, read on until a short page.
+            page = 1
+            while len(products) == page * per_page:
+                page += 1
+                _, more = await fetch_page(page)
+                if more is None:
+                    print("No products received from the API.")
+                    return None
+                products.extend(more)
+            return products
+
+        for _, more in await asyncio.gather(
+                *(fetch_page(page) for page in range(2, pages + 1))):
+            if more is None:
+                print("No products received from the API.")
+                return None
+            products.extend(more)
+        return products
+
+    async def _refresh_products(self, operator_id):
+        """Reload a stale catalog entry in the background."""
+        products = None
+        try:
+            products = await self._fetch_products(operator_id)
+        finally:
+            self.catalog_cache.finish_refresh(operator_id, products)
+
+    async def create_transaction(self, mobile_number, trx_id, product_id):
+        """Create a transaction."""
+        endpoint = "async/transactions"
+        payload = {
+            "external_id": trx_id,
+            "product_id": product_id,
+            "auto_confirm": True,
+            "credit_party_identifier": {
+                "mobile_number": mobile_number
+            }
+            }
+        return await self._submit(
+            self._make_post_request("POST", endpoint, payload),
+            span=endpoint
+        )
+
+    def generate_transaction_id(self):
+        """Generate a unique transaction ID."""
+        return self.services.generate_transaction_id()
+
+    async def aclose(self):
+        """Close the pooled HTTP client."""
+        if self._client is not None:
+            await self._submit(self._client.aclose())
+            self._client = None
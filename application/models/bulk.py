@@ -0,0 +1,189 @@
+"""Define the bulk top-up module.
+
+This module contains a class that credits many mobile numbers at once,
+fanning the lookups and transactions out over a bounded thread pool and
+yielding each row's result as soon as it is known.
+"""
+
+import csv
+import io
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from application.models.phone_number import normalize, InvalidPhoneNumber
+
+
+class BulkTopUp:
+    """Define BulkTopUp class.
+
+    Rows are grouped by mobile number so that every number is looked up
+    only once, however many rows it appears in.
+    """
+
+    def __init__(self, services, ledger=None, concurrency=8):
+        """Initialize the BulkTopUp instance.
+
+        Args:
+            services (GlobalServices): The service used for the upstream
+                                       calls.
+            ledger (Ledger, optional): Where created transactions are
+                                       recorded.
+            concurrency (int): Maximum number of numbers processed at once.
+        """
+        self.services = services
+        self.ledger = ledger
+        self.concurrency = concurrency
+
+    @staticmethod
+    def parse_rows(text):
+        """Parse a CSV or JSONL document into rows.
+
+        CSV input has `msisdn,product_id` columns, with or without a
+        header line. JSONL input has one object per line with `msisdn`
+        and `product_id` keys.
+
+        Args:
+            text (str): The document.
+
+        Returns:
+            list: Dictionaries with line, msisdn and product_id keys.
+        """
+        rows = []
+        stripped = text.lstrip()
+        if stripped.startswith("{"):
+            for line_no, line in enumerate(text.splitlines(), start=1):
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                rows.append({
+                    "line": line_no,
+                    "msisdn": str(item["msisdn"]).strip(),
+                    "product_id": int(item["product_id"])
+                })
+            return rows
+
+        reader = csv.reader(io.StringIO(text))
+        for line_no, record in enumerate(reader, start=1):
+            if len(record) < 2 or not record[0].strip():
+                continue
+            msisdn, product_id = record[0].strip(), record[1].strip()
+            if not rows and not product_id.isdigit():
+                try:
+                    normalize(msisdn)
+                except InvalidPhoneNumber:
+                    continue  # Header line.
+            rows.append({
+                "line": line_no,
+                "msisdn": msisdn,
+                "product_id": int(product_id)
+            })
+        return rows
+
+    def run(self, rows):
+        """Top up every row and yield results as they finish.
+
+        Args:
+            rows (list): Rows as returned by parse_rows.
+
+        Yields:
+            dict: One result per row, in completion order.
+        """
+        groups = {}
+        for row in rows:
+            try:
+                key = normalize(row["msisdn"])
+            except InvalidPhoneNumber:
+                key = row["msisdn"]
+            groups.setdefault(key, []).append(row)
+
+        results = queue.Queue()
+        pool = ThreadPoolExecutor(max_workers=self.concurrency,
+                                  thread_name_prefix="bulk")
+        try:
+            for msisdn, group in groups.items():
+                pool.submit(self._process_number, msisdn, group, results)
+            for _ in range(len(rows)):
+                yield results.get()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _process_number(self, msisdn, group, results):
+        """Post one result per row of a number, even if processing fails."""
+        posted = 0
+        try:
+            for result in self._credit_number(msisdn, group):
+                results.put(result)
+                posted += 1
+        except Exception as e:
+            print(f"Bulk top-up failed for {msisdn}: {e}")
+            for row in group[posted:]:
+                result = self._result(row, None)
+                result["error"] = "Internal error."
+                results.put(result)
+
+    @staticmethod
+    def _result(row, operator_id):
+        """Return the result of a row, marked failed until it is credited."""
+        return {
+            "line": row["line"],
+            "msisdn": row["msisdn"],
+            "product_id": row["product_id"],
+            "operator_id": operator_id,
+            "trx_id": None,
+            "status": "failed",
+            "error": None
+        }
+
+    def _record(self, trx_id, response, msisdn, product_id):
+        """Record a created transaction in the ledger, if there is one."""
+        if self.ledger is None:
+            return
+        try:
+            self.ledger.record(trx_id, response, msisdn=msisdn,
+                               product_id=product_id)
+        except Exception as e:
+            # The top-up was made; its row must still report it.
+            print(f"Error recording bulk transaction {trx_id}: {e}")
+
+    def _credit_number(self, msisdn, group):
+        """Look one number up once and credit each of its rows."""
+        started = time.monotonic()
+        try:
+            operator_id = self.services.lookup_mobile_number(msisdn)
+        except Exception as e:
+            print(f"Bulk lookup failed for {msisdn}: {e}")
+            operator_id = None
+        products = None
+        if operator_id is not None:
+            products = self.services.get_products(operator_id)
+        product_ids = {product.id for product in products or []}
+
+        for row in group:
+            result = self._result(row, operator_id)
+            if operator_id is None:
+                result["error"] = "Invalid number."
+            elif not product_ids:
+                # Products cannot be checked without the catalog.
+                result["error"] = "Operator catalog unavailable."
+            elif row["product_id"] not in product_ids:
+                result["error"] = "Product not offered by the operator."
+            else:
+                trx_id = self.services.generate_transaction_id()
+                try:
+                    response = self.services.create_transaction(
+                        msisdn, trx_id, row["product_id"])
+                except Exception as e:
+                    print(f"Bulk transaction failed for {msisdn}: {e}")
+                    response = None
+                result["trx_id"] = trx_id
+                if response is None:
+                    result["error"] = "Transaction failed."
+                else:
+                    result["status"] = "submitted"
+                    result["transaction_status"] = response.get(
+                        "status", {}).get("message")
+                    self._record(trx_id, response, msisdn, row["product_id"])
+            result["elapsed"] = round(time.monotonic() - started, 4)
+            yield result
@@ -0,0 +1,154 @@
+"""Define the catalog cache module.
+
+This module contains an in-process cache for operator product catalogs,
+so that repeated purchases on the same operator do not hit the upstream
+`products` endpoint every time.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CatalogCache:
+    """Define CatalogCache class.
+
+    A size-bounded LRU cache with a time-to-live per entry. Entries that
+    are past their TTL but still inside the stale window are served
+    immediately while a background thread refreshes them
+    (stale-while-revalidate).
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, stale_ttl=21600):
+        """Initialize the CatalogCache instance.
+
+        Args:
+            max_entries (int): Maximum number of operator catalogs kept.
+            ttl (float): Seconds an entry is considered fresh.
+            stale_ttl (float): Extra seconds after the TTL during which a
+                               stale entry may still be served while it
+                               is refreshed in the background.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        # Counters exposed through stats().
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        """Return the cached value for key, loading it on a miss.
+
+        Args:
+            key: The cache key (the operator ID).
+            loader (callable): Called with the key to fetch a fresh value.
+                               A None result is not cached.
+
+        Returns:
+            The cached or freshly loaded value, or None.
+        """
+        value, refresh = self.lookup(key)
+        if refresh:
+            threading.Thread(
+                target=self._refresh,
+                args=(key, loader),
+                daemon=True
+            ).start()
+        if value is not None:
+            return value
+
+        value = loader(key)
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def lookup(self, key):
+        """Look key up without loading it.
+
+        Args:
+            key: The cache key (the operator ID).
+
+        Returns:
+            tuple: The cached value (None on a miss) and whether the caller
+                   is now responsible for refreshing a stale entry and must
+                   report back through finish_refresh().
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, loaded_at = entry
+                age = now - loaded_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, False
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                    return value, refresh
+                del self._entries[key]
+            self.misses += 1
+            return None, False
+
+    def set(self, key, value):
+        """Store value under key and evict the least recently used entries."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one entry, or the whole cache when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _refresh(self, key, loader):
+        """Reload a stale entry in the background."""
+        value = None
+        try:
+            value = loader(key)
+        except Exception as e:
+            print(f"Error refreshing catalog for {key}: {e}")
+        finally:
+            self.finish_refresh(key, value)
+
+    def finish_refresh(self, key, value):
+        """Store the result of a background refresh started by lookup()."""
+        if value is not None:
+            self.set(key, value)
+        with self._lock:
+            if value is not None:
+                self.refreshes += 1
+            self._refreshing.discard(key)
+
+    def stats(self):
+        """Return the cache counters as a dictionary."""
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": size,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "evictions": self.evictions,
+            "hit_ratio": (
+                (self.hits + self.stale_hits) / lookups if lookups else 0.0
+            )
+        }
@@ -0,0 +1,397 @@
+"""Define the catalog snapshot module.
+
+This module contains a compact binary snapshot of the full product
+catalog. A sync job writes the snapshot file, and every gunicorn worker
+memory-maps it read-only. The operating system then shares one copy of
+the catalog between all workers, and a freshly started worker can serve
+products without fetching them from the API.
+
+File layout (little-endian):
+    header      magic, version, created_at, operator count, product count
+    index       (operator_id, first product, product count), sorted by ID
+    products    fixed-size records, grouped by operator
+    strings     UTF-8 text referenced by (offset, length) from records
+"""
+
+import fcntl
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from application.models.circuit_breaker import CircuitOpenError
+from application.models.product import Product
+from application.models.rate_limit import RateLimitedError
+
+MAGIC = b"BHCS"
+VERSION = 1
+
+HEADER = struct.Struct("<4sIdII")
+INDEX_ENTRY = struct.Struct("<qII")
+# id, operator_id, retail amount, retail fee, destination amount,
+# integer flags, then (offset, length) of name, operator name, retail
+# unit and destination unit.
+RECORD = struct.Struct("<qqdddI8I")
+
+NO_STRING = 0xFFFFFFFF
+NUMBER_FIELDS = ("retail_amount", "retail_fee", "destination_amount")
+STRING_FIELDS = ("name", "operator_name", "retail_unit", "destination_unit")
+
+
+def _pack_number(value):
+    """Return a float for the record; None is stored as NaN."""
+    return math.nan if value is None else float(value)
+
+
+def _unpack_number(value, is_int):
+    """Return the original number of a record field."""
+    if math.isnan(value):
+        return None
+    return int(value) if is_int else value
+
+
+def write_snapshot(path, products):
+    """
+    Write products to a snapshot file and swap it in atomically.
+
+    The file is written next to its destination and renamed over it, so
+    readers see either the old or the new snapshot, never a partial one.
+
+    Args:
+        path (str): Path to the snapshot file.
+        products (iterable): Product records; those without an ID or an
+                             operator ID are skipped.
+
+    Returns:
+        int: The number of products written.
+    """
+    by_operator = {}
+    for product in products:
+        if product.id is None or product.operator_id is None:
+            continue
+        by_operator.setdefault(int(product.operator_id), []).append(product)
+
+    strings = bytearray()
+    string_offsets = {}
+
+    def intern(text):
+        if text is None:
+            return NO_STRING, 0
+        data = str(text).encode("utf-8")
+        offset = string_offsets.get(data)
+        if offset is None:
+            offset = string_offsets[data] = len(strings)
+            strings.extend(data)
+        return offset, len(data)
+
+    index = bytearray()
+    records = bytearray()
+    count = 0
+    for operator_id in sorted(by_operator):
+        group = by_operator[operator_id]
+        index += INDEX_ENTRY.pack(operator_id, count, len(group))
+        for product in group:
+            flags = 0
+            for bit, field in enumerate(NUMBER_FIELDS):
+                if isinstance(getattr(product, field), int):
+                    flags |= 1 << bit
+            references = []
+            for field in STRING_FIELDS:
+                references.extend(intern(getattr(product, field)))
+            records += RECORD.pack(
+                int(product.id),
+                operator_id,
+                *(_pack_number(getattr(product, f)) for f in NUMBER_FIELDS),
+                flags,
+                *references
+            )
+            count += 1
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, time.time(),
+                                        len(by_operator), count))
+        snapshot_file.write(index)
+        snapshot_file.write(records)
+        snapshot_file.write(strings)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temp_path, path)
+    return count
+
+
+class _MappedSnapshot:
+    """One memory-mapped version of the snapshot file.
+
+    Decoded product lists of the most recently used operators are kept
+    for the life of the mapping, so a busy operator is decoded once per
+    version while memory stays bounded by memo_size operators.
+    """
+
+    def __init__(self, path, memo_size=64):
+        with open(path, "rb") as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.data = mmap.mmap(snapshot_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        magic, version, self.created_at, self.operators, self.products = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} snapshot")
+        self.index_start = HEADER.size
+        self.records_start = self.index_start + \
+            self.operators * INDEX_ENTRY.size
+        self.strings_start = self.records_start + \
+            self.products * RECORD.size
+        self.memo_size = memo_size
+        self._decoded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find(self, operator_id):
+        """Binary search the index for an operator's product range."""
+        low, high = 0, self.operators
+        while low < high:
+            middle = (low + high) // 2
+            key, first, count = INDEX_ENTRY.unpack_from(
+                self.data, self.index_start + middle * INDEX_ENTRY.size)
+            if key == operator_id:
+                return first, count
+            if key < operator_id:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def decoded(self, operator_id):
+        """Return the memoized products of an operator, or None."""
+        with self._lock:
+            products = self._decoded.get(operator_id)
+            if products is not None:
+                self._decoded.move_to_end(operator_id)
+            return products
+
+    def remember(self, operator_id, products):
+        """Memoize the products of an operator, evicting the oldest."""
+        with self._lock:
+            self._decoded[operator_id] = products
+            self._decoded.move_to_end(operator_id)
+            while len(self._decoded) > self.memo_size:
+                self._decoded.popitem(last=False)
+
+    def string(self, offset, length):
+        """Decode a string of the string table."""
+        if offset == NO_STRING:
+            return None
+        start = self.strings_start + offset
+        return self.data[start:start + length].decode("utf-8")
+
+    def product(self, position):
+        """Build the Product record stored at a position."""
+        fields = RECORD.unpack_from(
+            self.data, self.records_start + position * RECORD.size)
+        product_id, operator_id = fields[0], fields[1]
+        numbers, flags, references = fields[2:5], fields[5], fields[6:]
+        retail_amount, retail_fee, destination_amount = (
+            _unpack_number(value, flags & (1 << bit))
+            for bit, value in enumerate(numbers)
+        )
+        name, operator_name, retail_unit, destination_unit = (
+            self.string(references[i], references[i + 1])
+            for i in range(0, len(references), 2)
+        )
+        return Product(product_id, name, operator_id, operator_name,
+                       retail_amount, retail_fee, retail_unit,
+                       destination_amount, destination_unit)
+
+
+class CatalogSnapshot:
+    """Define CatalogSnapshot class.
+
+    Read-only view of the snapshot file. The file is checked for a new
+    version at most every check_interval seconds, and the new mapping
+    replaces the old one in a single assignment, so concurrent readers
+    keep using the version they started with.
+    """
+
+    def __init__(self, path, max_age=86400, check_interval=5.0,
+                 memo_size=64):
+        """Initialize the CatalogSnapshot instance.
+
+        Args:
+            path (str): Path to the snapshot file.
+            max_age (float): Seconds after which a snapshot is too old to
+                             be served.
+            check_interval (float): Seconds between checks for a new file.
+            memo_size (int): Number of operators whose decoded products
+                             are kept.
+        """
+        self.path = path
+        self.max_age = max_age
+        self.check_interval = check_interval
+        self.memo_size = memo_size
+        self._mapped = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats().
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _current(self, stale_ok=False):
+        """Return the mapping of the latest snapshot file, or None."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            with self._lock:
+                if now - self._checked_at >= self.check_interval:
+                    self._checked_at = now
+                    self._reload()
+        mapped = self._mapped
+        if mapped is None or (not stale_ok and
+                              time.time() - mapped.created_at > self.max_age):
+            return None
+        return mapped
+
+    def _reload(self):
+        """Map the snapshot file again if it was replaced."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._mapped = None
+            return
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._mapped is not None and self._mapped.identity == identity:
+            return
+        try:
+            self._mapped = _MappedSnapshot(self.path, self.memo_size)
+            self.reloads += 1
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Error loading catalog snapshot: {e}")
+
+    def load(self):
+        """Map the snapshot file now rather than on first use."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._reload()
+
+    def get_products(self, operator_id, stale_ok=False):
+        """
+        Return the products of an operator from the snapshot.
+
+        Args:
+            operator_id (int): The operator ID.
+            stale_ok (bool): Serve a snapshot older than max_age, as a
+                             fallback when the API is unavailable.
+
+        Returns:
+            list or None: The Product records, or None if the snapshot is
+                          missing, too old or does not list the operator.
+        """
+        mapped = self._current(stale_ok)
+        if mapped is None:
+            self.misses += 1
+            return None
+        operator_id = int(operator_id)
+        products = mapped.decoded(operator_id)
+        if products is None:
+            found = mapped.find(operator_id)
+            if found is None:
+                self.misses += 1
+                return None
+            first, count = found
+            products = tuple(mapped.product(position)
+                             for position in range(first, first + count))
+            mapped.remember(operator_id, products)
+        self.hits += 1
+        return list(products)
+
+    def stats(self):
+        """Return the snapshot counters as a dictionary."""
+        mapped = self._mapped
+        return {
+            "operators": mapped.operators if mapped else 0,
+            "products": mapped.products if mapped else 0,
+            "age_seconds": time.time() - mapped.created_at if mapped else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads
+        }
+
+
+class CatalogSync:
+    """Define CatalogSync class.
+
+    Rewrites the snapshot from the full products listing at a fixed
+    interval. Only the worker holding the lock file syncs.
+    """
+
+    def __init__(self, services, path, interval=3600, lock_path=None):
+        """Initialize the CatalogSync instance.
+
+        Args:
+            services (GlobalServices): The service used to list products.
+            path (str): Path to the snapshot file.
+            interval (float): Seconds between two syncs.
+            lock_path (str, optional): Lock file electing the syncing
+                                       worker; defaults to path + ".lock".
+        """
+        self.services = services
+        self.path = path
+        self.interval = interval
+        self.lock_path = lock_path or f"{path}.lock"
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def sync(self):
+        """
+        Write a new snapshot from the full products listing.
+
+        Returns:
+            int or None: The number of products written, or None if the
+                         listing could not be fetched.
+        """
+        try:
+            return write_snapshot(self.path, self.services.iter_products())
+        except (requests.exceptions.RequestException, ValueError,
+                CircuitOpenError, RateLimitedError) as e:
+            print(f"Catalog sync failed; keeping the current snapshot: {e}")
+            return None
+
+    def start(self):
+        """Start the sync thread in the current process if needed."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="catalog-sync",
+                             daemon=True).start()
+
+    def _run(self):
+        """Sync forever while holding the lock file."""
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            while True:
+                if self._due():
+                    try:
+                        self.sync()
+                    except Exception as e:
+                        print(f"Catalog sync error: {e}")
+                time.sleep(min(self.interval, 60))
+
+    def _due(self):
+        """Return True if the snapshot is missing or older than interval."""
+        try:
+            return time.time() - os.path.getmtime(self.path) >= self.interval
+        except OSError:
+            return True
@@ -0,0 +1,241 @@
+"""Define the circuit breaker module.
+
+This module contains per-endpoint circuit breakers for the upstream API.
+When an endpoint keeps failing or answering slowly, its breaker opens and
+calls fail immediately instead of tying up a worker until they time out.
+After a cool-down, a few probe calls decide whether it closes again.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit is open."""
+
+
+class CircuitBreaker:
+    """Define CircuitBreaker class.
+
+    Tracks the outcome of the last `window` calls. The circuit opens when
+    at least `min_calls` were made and either the failure rate or the
+    rate of calls slower than `slow_call_seconds` reaches its threshold.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Admission of an ordinary call; probes get the token of their trial.
+    CALL = "call"
+
+    def __init__(self, name, window=20, min_calls=10, failure_rate=0.5,
+                 slow_call_seconds=5.0, slow_call_rate=0.5, open_seconds=30.0,
+                 half_open_probes=1):
+        """Initialize the CircuitBreaker instance.
+
+        Args:
+            name (str): The endpoint the breaker protects.
+            window (int): Number of recent calls considered.
+            min_calls (int): Calls needed before the circuit may open.
+            failure_rate (float): Failure ratio that opens the circuit.
+            slow_call_seconds (float): Duration above which a call is slow.
+            slow_call_rate (float): Slow call ratio that opens the circuit.
+            open_seconds (float): Seconds the circuit stays open before
+                                  probe calls are let through.
+            half_open_probes (int): Concurrent probe calls allowed while
+                                    half open.
+        """
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._trial = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring.
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self):
+        """
+        Admit a call if it may be made now.
+
+        A caller that is admitted must report the outcome with record(),
+        passing back the admission it got.
+
+        Returns:
+            object or None: None if the call is rejected, CALL for an
+                            ordinary call, or the token of the current
+                            half-open trial for a probe call.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return None
+                self.state = self.HALF_OPEN
+                self._probes = 0
+                self._trial = object()
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return None
+                self._probes += 1
+                return self._trial
+            return self.CALL
+
+    def check(self):
+        """
+        Admit a call or raise CircuitOpenError.
+
+        Returns:
+            object: The admission to pass to record().
+        """
+        admission = self.allow()
+        if admission is None:
+            raise CircuitOpenError(f"Circuit open for {self.name}")
+        return admission
+
+    def record(self, success, elapsed, admission=CALL):
+        """
+        Record the outcome of a call allowed by allow().
+
+        Only the probes of the current half-open trial decide whether the
+        circuit closes; calls admitted before the circuit opened, or
+        probes of an earlier trial, may finish at any time and are not
+        counted against the probe limit.
+
+        Args:
+            success (bool): False if the call failed or the server erred.
+            elapsed (float): Duration of the call in seconds.
+            admission (object): What allow() returned for the call.
+        """
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            probe = admission is not None and admission is self._trial
+            if probe:
+                self._probes -= 1
+            if self.state == self.HALF_OPEN:
+                if probe:
+                    if success and not slow:
+                        self.state = self.CLOSED
+                        self._outcomes.clear()
+                    else:
+                        self._open()
+                return
+            if self.state == self.OPEN:
+                # A late outcome must not extend the cool-down.
+                return
+            self._outcomes.append((success, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+            if (failures / calls >= self.failure_rate
+                    or slow_calls / calls >= self.slow_call_rate):
+                self._open()
+
+    def _open(self):
+        """Open the circuit; the caller holds the lock."""
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+
+class CircuitBreakers:
+    """Define CircuitBreakers class.
+
+    One CircuitBreaker per endpoint, created on first use with the
+    SERVICES_BREAKER_* settings.
+    """
+
+    def __init__(self, **settings):
+        """Initialize the registry.
+
+        Args:
+            **settings: CircuitBreaker arguments; missing ones are read
+                        from the environment.
+        """
+        defaults = {
+            "window": int(os.getenv("SERVICES_BREAKER_WINDOW", "20")),
+            "min_calls": int(os.getenv("SERVICES_BREAKER_MIN_CALLS", "10")),
+            "failure_rate": float(
+                os.getenv("SERVICES_BREAKER_FAILURE_RATE", "0.5")),
+            "slow_call_seconds": float(
+                os.getenv("SERVICES_BREAKER_SLOW_SECONDS", "5")),
+            "slow_call_rate": float(
+                os.getenv("SERVICES_BREAKER_SLOW_RATE", "0.5")),
+            "open_seconds": float(
+                os.getenv("SERVICES_BREAKER_OPEN_SECONDS", "30")),
+        }
+        defaults.update(settings)
+        self.settings = defaults
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the breaker of an endpoint, creating it if needed."""
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, **self.settings)
+                    self._breakers[name] = breaker
+        return breaker
+
+    @contextmanager
+    def guard(self, name):
+        """
+        Run the body of a with block as a call through a breaker.
+
+        Client errors (4xx other than 429) do not count as failures: they
+        are the caller's fault, not a sign of an unhealthy endpoint.
+
+        Raises:
+            CircuitOpenError: If the endpoint's circuit is open.
+        """
+        breaker = self.get(name)
+        admission = breaker.check()
+        started = time.perf_counter()
+        success = False
+        try:
+            yield breaker
+            success = True
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            success = status is not None and status < 500 and status != 429
+            raise
+        finally:
+            breaker.record(success, time.perf_counter() - started,
+                           admission)
+
+    def is_open(self, name):
+        """Return True if calls to an endpoint are currently rejected."""
+        breaker = self._breakers.get(name)
+        return breaker is not None and breaker.state == CircuitBreaker.OPEN
+
+    def stats(self):
+        """Return the state and counters of every breaker."""
+        return {
+            name: {
+                "state": breaker.state,
+                "rejected": breaker.rejected,
+                "opened": breaker.opened
+            }
+            for name, breaker in list(self._breakers.items())
+        }
@@ -0,0 +1,49 @@
+"""Define the config module.
+
+This module loads the .env file once per process and collects the
+settings the Flask application reads. Only these settings can be
+overridden with create_app(config=...). The models, including the PayPal
+and DT One clients, read every other setting from the environment, which
+load_config() has filled by then.
+"""
+
+import os
+from dotenv import load_dotenv
+
+_loaded = False
+
+
+def _flag(name, default):
+    """Return an environment variable as a boolean."""
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "")
+
+
+def load_config(overrides=None):
+    """
+    Load the .env file (only the first time) and return the app settings.
+
+    Args:
+        overrides (dict, optional): Settings that replace the loaded ones,
+                                    for example in tests.
+
+    Returns:
+        dict: Settings for Flask's app.config.
+    """
+    global _loaded
+    if not _loaded:
+        load_dotenv()
+        _loaded = True
+
+    config = {
+        # Must be shared by every worker for their sessions to be valid
+        # everywhere; a random key only works with a single process.
+        "SECRET_KEY": os.getenv("SECRET_KEY") or os.urandom(24),
+        "CATALOG_SYNC_INTERVAL": float(
+            os.getenv("CATALOG_SYNC_INTERVAL", "0")),
+        "RECONCILER_ENABLED": _flag("RECONCILER_ENABLED", "1"),
+        "FULFILLMENT_WORKERS": int(os.getenv("FULFILLMENT_WORKERS", "4")),
+        "METRICS_TIMING_HEADER": _flag("METRICS_TIMING_HEADER", "0"),
+        "BULK_CONCURRENCY": int(os.getenv("BULK_CONCURRENCY", "8")),
+    }
+    config.update(overrides or {})
+    return config
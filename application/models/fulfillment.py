@@ -0,0 +1,264 @@
+"""Define the fulfillment module.
+
+This module contains a persistent job queue that runs post-payment
+top-ups on a bounded pool of background threads, so that the request
+which returns from PayPal does not wait for the upstream calls.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FulfillmentError(Exception):
+    """Raised by a job handler when a job cannot be fulfilled."""
+
+
+class FulfillmentQueue:
+    """Define FulfillmentQueue class.
+
+    Jobs are stored in an SQLite database shared by every gunicorn worker
+    and claimed atomically, so a queued job survives restarts and is run
+    exactly once by whichever worker has a free slot.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, handler, path, max_workers=4, job_timeout=300,
+                 poll_interval=1.0, sweep_interval=30.0):
+        """Initialize the FulfillmentQueue instance.
+
+        Args:
+            handler (callable): Called with a job payload (dict); returns a
+                                JSON-serializable result or raises.
+            path (str): Path to the SQLite database file.
+            max_workers (int): Maximum number of jobs run concurrently by
+                               this process.
+            job_timeout (float): Seconds after which a job still marked
+                                 running is considered interrupted.
+            poll_interval (float): Seconds between checks for jobs queued
+                                   by other processes.
+            sweep_interval (float): Seconds between checks for jobs left
+                                    running by a dead process.
+        """
+        self.handler = handler
+        self.path = path
+        self.max_workers = max_workers
+        self.job_timeout = job_timeout
+        self.poll_interval = poll_interval
+        self.sweep_interval = sweep_interval
+        self._running = set()
+        self._swept_at = 0.0
+        self._local = threading.local()
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL,"
+            " result TEXT, error TEXT, created_at REAL NOT NULL,"
+            " started_at REAL, finished_at REAL)"
+        )
+        self._connection().execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created_at)"
+        )
+        columns = {row[1] for row in self._connection().execute(
+            "PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            # Process running the job; added after the first release.
+            self._connection().execute(
+                "ALTER TABLE jobs ADD COLUMN owner INTEGER")
+
+    def _connection(self):
+        """Return the SQLite connection of the current thread and process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self):
+        """Start the dispatcher and worker pool in the current process."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Jobs run by a parent before a fork are not ours.
+            self._running = set()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="fulfillment"
+            )
+            self._fail_interrupted()
+            threading.Thread(target=self._dispatch, daemon=True).start()
+
+    def submit(self, payload):
+        """Queue a job and return its ID.
+
+        Args:
+            payload (dict): JSON-serializable job data for the handler.
+
+        Returns:
+            str: The job ID.
+        """
+        self.start()
+        job_id = secrets.token_urlsafe(16)
+        self._connection().execute(
+            "INSERT INTO jobs (id, status, payload, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (job_id, self.QUEUED, json.dumps(payload), time.time())
+        )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return the status, result and timing of a job.
+
+        Args:
+            job_id (str): The job ID returned by submit.
+
+        Returns:
+            dict or None: The job, or None if it does not exist.
+        """
+        row = self._connection().execute(
+            "SELECT id, status, result, error, created_at, started_at,"
+            " finished_at FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, status, result, error, created, started, finished = row
+        return {
+            "id": job_id,
+            "status": status,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created,
+            "started_at": started,
+            "finished_at": finished,
+            "queue_time": (started - created) if started else None,
+            "run_time": (finished - started) if finished and started else None
+        }
+
+    def _fail_interrupted(self):
+        """Mark jobs left running by a dead process as failed.
+
+        A running job is interrupted when the process that claimed it is
+        gone, or when it has run for longer than job_timeout. Such jobs
+        are not retried automatically: the payment may already have been
+        executed, so they need a manual check.
+        """
+        self._swept_at = time.monotonic()
+        conn = self._connection()
+        now = time.time()
+        rows = conn.execute(
+            "SELECT id, owner, started_at FROM jobs WHERE status = ?",
+            (self.RUNNING,)
+        ).fetchall()
+        interrupted = [
+            (self.FAILED, "Interrupted while running; needs review.", now,
+             job_id, self.RUNNING)
+            for job_id, owner, started_at in rows
+            if (started_at or 0) < now - self.job_timeout
+            or not self._owner_alive(owner, job_id)
+        ]
+        if interrupted:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE id = ? AND status = ?",
+                interrupted
+            )
+
+    def _owner_alive(self, owner, job_id):
+        """Return True if the process that claimed a job still runs it."""
+        if owner is None:
+            return True  # Claimed by an older version; left to the timeout.
+        if owner == os.getpid():
+            # A new process may reuse the PID of the one that died.
+            return job_id in self._running
+        try:
+            os.kill(owner, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _claim(self):
+        """Atomically claim the oldest queued job, if any."""
+        conn = self._connection()
+        while True:
+            row = conn.execute(
+                "SELECT id, payload FROM jobs WHERE status = ? "
+                "ORDER BY created_at LIMIT 1",
+                (self.QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Marked as ours first, so a concurrent sweep in this process
+            # never sees the job without its owner.
+            self._running.add(row[0])
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, owner = ? "
+                "WHERE id = ? AND status = ?",
+                (self.RUNNING, time.time(), os.getpid(), row[0], self.QUEUED)
+            ).rowcount
+            if claimed:
+                return row[0], json.loads(row[1])
+            self._running.discard(row[0])
+
+    def _dispatch(self):
+        """Hand queued jobs to the worker pool while slots are free."""
+        while True:
+            if time.monotonic() - self._swept_at >= self.sweep_interval:
+                try:
+                    self._fail_interrupted()
+                except sqlite3.Error as e:
+                    print(f"Error checking interrupted jobs: {e}")
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            self._wakeup.clear()
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"Error claiming fulfillment job: {e}")
+                job = None
+            if job is None:
+                self._slots.release()
+                self._wakeup.wait(self.poll_interval)
+                continue
+            self._executor.submit(self._run, *job)
+
+    def _run(self, job_id, payload):
+        """Run one job and record its outcome."""
+        try:
+            try:
+                result = self.handler(payload)
+                status, result, error = self.DONE, json.dumps(result), None
+            except Exception as e:
+                status, result, error = self.FAILED, None, str(e)
+            self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?,"
+                " finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+        finally:
+            self._running.discard(job_id)
+            self._slots.release()
+            self._wakeup.set()
@@ -3,6 +3,14 @@ import os
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from jinja2 import Environment, FileSystemLoader
+
+
+# Directory holding the Jinja templates of the application.
+TEMPLATES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "templates"
+)
 
 
 class Helpers():
@@ -11,64 +19,89 @@ class Helpers():
                     This class contains methods that will be helping with
                     certain operations.
     """
-    def __init__(self):
-        """Define the Init method."""
+    # Compiled once per process and reused for every receipt.
+    _receipt_template = None
 
-    def send_receipt_email(self, transaction_info, voucher, units):
+    def __init__(self, outbox=None):
+        """Define the Init method.
+
+        Args:
+            outbox (Outbox, optional): The outbox receipts are queued on.
         """
-        Send an email to the customer with transaction details.
+        self.outbox = outbox
+
+    @classmethod
+    def receipt_template(cls):
+        """Return the precompiled receipt email template."""
+        if cls._receipt_template is None:
+            environment = Environment(
+                loader=FileSystemLoader(TEMPLATES_DIR),
+                autoescape=True
+            )
+            cls._receipt_template = environment.get_template(
+                "receipt_email.html")
+        return cls._receipt_template
+
+    def render_receipt(self, trx_id, response):
+        """
+        Render the receipt email of a transaction.
 
         Args:
-            
+            trx_id (str): The transaction ID.
+            response (dict): The response of the top-up API.
 
         Returns:
-            None
+            str: The HTML receipt.
+        """
+        prices = response.get('prices', {})
+        retail = prices.get('retail') or {}
+        wholesale = prices.get('wholesale') or {}
+        product = response.get('product', {})
+        return self.receipt_template().render(
+            trx_id=trx_id,
+            confirmation_date=response.get('confirmation_date'),
+            credit_party_mobile_number=response.get(
+                'credit_party_identifier', {}).get('mobile_number'),
+            retail_price=f"{retail.get('amount')} {retail.get('unit')}",
+            wholesale_price=f"{wholesale.get('amount')} {wholesale.get('unit')}",
+            operator_name=product.get('operator', {}).get('name'),
+            product_description=product.get('description'),
+            status_message=response.get('status', {}).get('message')
+        )
+
+    def send_receipt_email(self, trx_id, response, customer_email):
         """
-        
+        Queue an email to the customer with transaction details.
 
-        # Compose email message
+        The email is sent by the outbox's background sender, so this call
+        returns immediately.
+
+        Args:
+            trx_id (str): The transaction ID.
+            response (dict): The response of the top-up API.
+            customer_email (str): The customer's email address.
+
+        Returns:
+            bool: True if the receipt was queued.
+        """
+        if self.outbox is None:
+            print("No outbox configured; receipt not sent.")
+            return False
         subject = "Receipt for your recent purchase"
-        html_message = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-        <title>Transaction Confirmation</title>
-        </head>
-        <body>
-        <h1>Transaction Confirmation</h1>
-
-        <p>Dear Customer,</p>
-
-        <p>We are pleased to inform you that your transaction has been successfully processed.</p>
-
-        <h2>Transaction Details:</h2>
-        <ul>
-        <li><strong>Confirmation Date:</strong> {{ confirmation_date }}</li>
-        <li><strong>Credit Party Mobile Number:</strong> {{ credit_party_mobile_number }}</li>
-        <li><strong>Retail Price:</strong> {{ retail_price }}</li>
-        <li><strong>Wholesale Price:</strong> {{ wholesale_price }}</li>
-        <li><strong>Operator Name:</strong> {{ operator_name }}</li>
-        <li><strong>Product Description:</strong> {{ product_description }}</li>
-        <li><strong>Status Message:</strong> {{ status_message }}</li>
-        </ul>
-
-        <p>Thank you for choosing our service.</p>
-
-        <p>Sincerely,<br>Your Company Name</p>
-        </body>
-        </html>
-        """       
-        company_email = "payment@remmittance.com"
-
-        # Retrieve email sending
-        email_api_key = os.getenv('email_api')
-        smtp_port = os.getenv('smtp_port')
-        smtp_server = os.getenv('smtp_server')
-        email_password = os.getenv('email_password')
-
-        # Sending email
-        response = self.send_email(company_email, customer_email, email_password, smtp_server, smtp_port, subject, message)
-        return response
+        html_message = self.render_receipt(trx_id, response)
+        self.outbox.enqueue(customer_email, subject, html_message)
+        return True
+
+    @staticmethod
+    def build_message(sender_email, receiver_email, subject, html_message):
+        """Build a multipart email with an HTML body."""
+        message = MIMEMultipart()
+        message["From"] = sender_email
+        message["To"] = receiver_email
+        message["Subject"] = subject
+        message.attach(MIMEText(html_message, "html"))
+        return message
+
     def send_email(self, sender_email, receiver_email, password, smtp_server, smtp_port, subject, html_message):
         """
         Send an email with HTML content using SMTP.
@@ -93,14 +126,9 @@ class Helpers():
         server.ehlo()
         server.login(sender_email, password)
 
-        # Create a multipart message
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = receiver_email
-        message["Subject"] = subject
-
-        # Attach HTML message
-        message.attach(MIMEText(html_message, "html"))
+        # Create a multipart message with the HTML body
+        message = self.build_message(
+            sender_email, receiver_email, subject, html_message)
 
         # Send email
         try:
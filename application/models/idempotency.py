@@ -0,0 +1,219 @@
+"""Define the idempotency module.
+
+This module contains a store of outcomes keyed by an idempotency key, so
+that an operation with side effects, such as executing a PayPal payment
+and crediting the customer, runs once no matter how often its request is
+repeated.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class IdempotencyStore:
+    """Define IdempotencyStore class.
+
+    Entries live in an SQLite database in WAL mode, so a key claimed by
+    one gunicorn worker is seen by every other worker on the host. A key
+    is claimed with a single INSERT, which makes the first request the
+    only one that runs the operation; repeats read its outcome.
+    """
+
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path, ttl=86400, lock_timeout=300, cleanup_every=500):
+        """Initialize the IdempotencyStore instance.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            ttl (float): Seconds an outcome is kept after the key is claimed.
+            lock_timeout (float): Seconds after which a key still pending is
+                                  considered abandoned by a dead process.
+            cleanup_every (int): Number of claims between purges of
+                                 expired entries.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.cleanup_every = cleanup_every
+        self._local = threading.local()
+        self._claims = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outcomes ("
+            "key TEXT PRIMARY KEY, status TEXT NOT NULL, job_id TEXT,"
+            " result TEXT, error TEXT, created_at REAL NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS outcomes_expires ON outcomes(expires)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS payments ("
+            "payment_id TEXT PRIMARY KEY, product_id INTEGER NOT NULL,"
+            " operator_id INTEGER, total TEXT NOT NULL,"
+            " expires REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        """Return the SQLite connection of the current thread and process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def claim(self, key):
+        """
+        Claim a key for the caller if nobody holds it.
+
+        Args:
+            key (str): The idempotency key.
+
+        Returns:
+            tuple: (True, None) if the caller must run the operation, or
+                   (False, entry) with the existing entry otherwise.
+        """
+        conn = self._connection()
+        while True:
+            now = time.time()
+            conn.execute("DELETE FROM outcomes WHERE key = ? AND expires < ?",
+                         (key, now))
+            claimed = conn.execute(
+                "INSERT OR IGNORE INTO outcomes "
+                "(key, status, created_at, expires) VALUES (?, ?, ?, ?)",
+                (key, self.PENDING, now, now + self.ttl)
+            ).rowcount
+            self._claims += 1
+            if self._claims % self.cleanup_every == 0:
+                conn.execute("DELETE FROM outcomes WHERE expires < ?", (now,))
+                conn.execute("DELETE FROM payments WHERE expires < ?", (now,))
+            if claimed:
+                return True, None
+            entry = self.get(key)
+            if entry is not None:
+                return False, entry
+            # The entry expired between the two statements; claim again.
+
+    def get(self, key):
+        """
+        Return the entry of a key.
+
+        Args:
+            key (str): The idempotency key.
+
+        Returns:
+            dict or None: The entry, or None if it is missing or expired.
+        """
+        row = self._connection().execute(
+            "SELECT status, job_id, result, error, created_at FROM outcomes "
+            "WHERE key = ? AND expires >= ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        status, job_id, result, error, created_at = row
+        return {
+            "key": key,
+            "status": status,
+            "job_id": job_id,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "abandoned": (status == self.PENDING and job_id is None
+                          and time.time() - created_at > self.lock_timeout)
+        }
+
+    def set_job(self, key, job_id):
+        """Record the background job that produces the outcome of a key."""
+        self._connection().execute(
+            "UPDATE outcomes SET job_id = ? WHERE key = ?", (job_id, key)
+        )
+
+    def complete(self, key, result):
+        """Store the JSON-serializable result of a key's operation."""
+        self._connection().execute(
+            "UPDATE outcomes SET status = ?, result = ? WHERE key = ?",
+            (self.DONE, json.dumps(result), key)
+        )
+
+    def fail(self, key, error):
+        """Store the error message of a key's failed operation."""
+        self._connection().execute(
+            "UPDATE outcomes SET status = ?, error = ? WHERE key = ?",
+            (self.FAILED, error, key)
+        )
+
+    def save_payment(self, payment_id, product_id, total, operator_id=None):
+        """
+        Bind a created PayPal payment to the order it pays for.
+
+        Args:
+            payment_id (str): The PayPal payment ID.
+            product_id (int): The product being bought.
+            total (str): The amount charged, as sent to PayPal.
+            operator_id (int): The operator of the product.
+        """
+        self._connection().execute(
+            "INSERT OR REPLACE INTO payments "
+            "(payment_id, product_id, operator_id, total, expires) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (payment_id, product_id, operator_id, total,
+             time.time() + self.ttl)
+        )
+
+    def get_payment(self, payment_id):
+        """
+        Return the order a PayPal payment was created for.
+
+        Args:
+            payment_id (str): The PayPal payment ID.
+
+        Returns:
+            dict or None: The product_id, operator_id and total, or None
+                          if the payment is unknown or expired.
+        """
+        row = self._connection().execute(
+            "SELECT product_id, operator_id, total FROM payments "
+            "WHERE payment_id = ? AND expires >= ?",
+            (payment_id, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        product_id, operator_id, total = row
+        return {"payment_id": payment_id, "product_id": product_id,
+                "operator_id": operator_id, "total": total}
+
+    def wait(self, key, timeout=30.0, interval=0.05):
+        """
+        Wait until the operation of a key has an outcome or a job.
+
+        Args:
+            key (str): The idempotency key.
+            timeout (float): Maximum number of seconds to wait.
+            interval (float): Seconds between two checks.
+
+        Returns:
+            dict or None: The latest entry, which may still be pending if
+                          the timeout was reached.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            entry = self.get(key)
+            if (entry is None or entry["status"] != self.PENDING
+                    or entry["job_id"] or entry["abandoned"]
+                    or time.monotonic() >= deadline):
+                return entry
+            time.sleep(interval)
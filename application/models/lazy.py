@@ -0,0 +1,49 @@
+"""Define the lazy module.
+
+This module contains a proxy for the application's service singletons.
+A singleton is built on first use instead of at import time, so a
+gunicorn master that preloads the app stays small and its workers start
+quickly. Objects built before the fork are shared copy-on-write; they
+open their connections per process, on first use in each worker.
+"""
+
+import threading
+
+
+class Lazy:
+    """Define Lazy class.
+
+    Stands in for the object returned by `factory`, building it on the
+    first attribute access.
+    """
+
+    def __init__(self, factory):
+        """Initialize the Lazy instance.
+
+        Args:
+            factory (callable): Builds the object; called at most once.
+        """
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the object, building it if needed."""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    def __getattr__(self, name):
+        """Forward attribute access to the object."""
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        """Set the proxy's own attributes, or the object's."""
+        if name in ("_factory", "_instance", "_lock"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self.get(), name, value)
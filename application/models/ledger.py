@@ -0,0 +1,405 @@
+"""Define the ledger module.
+
+This module contains a durable, local record of completed top-ups kept in
+SQLite (WAL mode). Writes are batched by a background thread so that the
+request path only appends to an in-memory queue.
+"""
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    trx_id TEXT NOT NULL UNIQUE,
+    msisdn TEXT,
+    payment_id TEXT,
+    product_id INTEGER,
+    operator_name TEXT,
+    product_description TEXT,
+    retail_amount REAL,
+    retail_unit TEXT,
+    wholesale_amount REAL,
+    wholesale_unit TEXT,
+    status TEXT,
+    confirmation_date TEXT,
+    created_at REAL NOT NULL,
+    dtone_id INTEGER,
+    next_check_at REAL,
+    checks INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS transactions_msisdn
+    ON transactions(msisdn, created_at);
+CREATE INDEX IF NOT EXISTS transactions_payment_id
+    ON transactions(payment_id);
+CREATE INDEX IF NOT EXISTS transactions_created_at
+    ON transactions(created_at);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day TEXT NOT NULL,
+    operator_name TEXT NOT NULL,
+    retail_unit TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    retail_total REAL NOT NULL,
+    wholesale_total REAL NOT NULL,
+    PRIMARY KEY (day, operator_name, retail_unit)
+);
+"""
+
+COLUMNS = (
+    "trx_id", "msisdn", "payment_id", "product_id", "operator_name",
+    "product_description", "retail_amount", "retail_unit",
+    "wholesale_amount", "wholesale_unit", "status", "confirmation_date",
+    "created_at", "dtone_id", "next_check_at"
+)
+
+# Columns added after the first release, with their definitions.
+MIGRATIONS = (
+    ("dtone_id", "INTEGER"),
+    ("next_check_at", "REAL"),
+    ("checks", "INTEGER NOT NULL DEFAULT 0"),
+)
+
+# Transaction status classes after which the status no longer changes.
+FINAL_STATUSES = frozenset(
+    ("COMPLETED", "REJECTED", "CANCELLED", "REVERSED", "DECLINED"))
+
+# The status of a top-up that was credited; only these are in the totals.
+SUCCESS_STATUS = "COMPLETED"
+
+# Adds the transactions selected by a WHERE clause to the daily totals.
+ROLLUP = (
+    "INSERT INTO daily_totals (day, operator_name, retail_unit,"
+    " count, retail_total, wholesale_total) "
+    "SELECT date(created_at, 'unixepoch'),"
+    " COALESCE(operator_name, ''), COALESCE(retail_unit, ''),"
+    " COUNT(*), COALESCE(SUM(retail_amount), 0),"
+    " COALESCE(SUM(wholesale_amount), 0) "
+    "FROM transactions WHERE {where} GROUP BY 1, 2, 3 "
+    "ON CONFLICT (day, operator_name, retail_unit) DO UPDATE SET"
+    " count = count + excluded.count,"
+    " retail_total = retail_total + excluded.retail_total,"
+    " wholesale_total = wholesale_total + excluded.wholesale_total"
+)
+
+
+def status_of(response):
+    """Return the status class name of a transaction response."""
+    status = response.get('status') or {}
+    name = (status.get('class') or {}).get('message') or status.get('message')
+    return name.upper() if name else None
+
+
+class Ledger:
+    """Define Ledger class.
+
+    Entries are appended to an in-memory queue and written in batches by
+    a background thread. Per-day, per-operator totals of completed
+    top-ups are rolled up when a transaction is written or its status
+    becomes COMPLETED, so reporting aggregates never scan the whole
+    transactions table.
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=0.5):
+        """Initialize the Ledger instance.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            batch_size (int): Maximum number of entries per write.
+            flush_interval (float): Maximum seconds an entry waits in
+                                    memory before it is written.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Add columns missing from a database created by an older version."""
+        conn = self._connection()
+        existing = {row[1] for row in conn.execute(
+            "PRAGMA table_info(transactions)")}
+        for column, definition in MIGRATIONS:
+            if column not in existing:
+                conn.execute(
+                    f"ALTER TABLE transactions ADD COLUMN {column} {definition}")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS transactions_next_check "
+            "ON transactions(next_check_at) WHERE next_check_at IS NOT NULL")
+
+    def _connection(self):
+        """Return the SQLite connection of the current thread and process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30,
+                                   isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def start(self):
+        """Start the background writer in the current process if needed."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._pending.clear()
+            threading.Thread(target=self._writer, name="ledger",
+                             daemon=True).start()
+            atexit.register(self.flush)
+
+    def record(self, trx_id, response, msisdn=None, payment_id=None,
+               product_id=None):
+        """Queue a completed top-up for writing.
+
+        Args:
+            trx_id (str): The transaction ID.
+            response (dict): The response of the top-up API.
+            msisdn (str, optional): The credited mobile number.
+            payment_id (str, optional): The PayPal payment ID.
+            product_id (int, optional): The product ID.
+        """
+        self.start()
+        prices = response.get('prices', {})
+        retail = prices.get('retail') or {}
+        wholesale = prices.get('wholesale') or {}
+        product = response.get('product', {})
+        status = status_of(response)
+        now = time.time()
+        # Transactions that are not final yet are picked up by the reconciler.
+        next_check_at = (
+            now if response.get('id') and status not in FINAL_STATUSES
+            else None)
+        self._pending.append((
+            trx_id,
+            msisdn or response.get(
+                'credit_party_identifier', {}).get('mobile_number'),
+            payment_id,
+            product_id or product.get('id'),
+            product.get('operator', {}).get('name'),
+            product.get('description'),
+            retail.get('amount'),
+            retail.get('unit'),
+            wholesale.get('amount'),
+            wholesale.get('unit'),
+            status,
+            response.get('confirmation_date'),
+            now,
+            response.get('id'),
+            next_check_at
+        ))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self):
+        """Return the number of entries not written yet."""
+        return len(self._pending)
+
+    def _writer(self):
+        """Flush pending entries every flush_interval or full batch."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing ledger entries: {e}")
+                time.sleep(1)
+
+    def flush(self):
+        """Write every pending entry now."""
+        with self._flush_lock:
+            while self._pending:
+                batch = []
+                while self._pending and len(batch) < self.batch_size:
+                    batch.append(self._pending.popleft())
+                try:
+                    self._write(batch)
+                except sqlite3.Error:
+                    self._pending.extendleft(reversed(batch))
+                    raise
+
+    def _write(self, batch):
+        """Insert a batch and roll its completed top-ups into the totals."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+            conn.executemany(
+                f"INSERT OR IGNORE INTO transactions ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                batch
+            )
+            conn.execute(ROLLUP.format(where="id > ? AND status = ?"),
+                         (last_id, SUCCESS_STATUS))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def due(self, now, limit=100):
+        """
+        Return transactions whose status is due to be checked.
+
+        Args:
+            now (float): The current timestamp.
+            limit (int): Maximum number of transactions returned.
+
+        Returns:
+            list: Dictionaries with trx_id, dtone_id, status, checks and
+                  created_at, most overdue first.
+        """
+        rows = self._connection().execute(
+            "SELECT trx_id, dtone_id, status, checks, created_at "
+            "FROM transactions WHERE next_check_at <= ? "
+            "ORDER BY next_check_at LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def update_statuses(self, updates):
+        """
+        Record the outcome of a batch of status checks.
+
+        Transactions whose status becomes COMPLETED are added to the
+        daily totals, once.
+
+        Args:
+            updates (list): (trx_id, status, next_check_at) tuples; a
+                            next_check_at of None stops further checks.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            completed = [(trx_id, SUCCESS_STATUS)
+                         for trx_id, status, _ in updates
+                         if status == SUCCESS_STATUS]
+            if completed:
+                conn.executemany(ROLLUP.format(
+                    where="trx_id = ? AND status IS NOT ?"), completed)
+            conn.executemany(
+                "UPDATE transactions SET status = COALESCE(?, status),"
+                " next_check_at = ?, checks = checks + 1 WHERE trx_id = ?",
+                [(status, next_check_at, trx_id)
+                 for trx_id, status, next_check_at in updates]
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, trx_id):
+        """Return the entry of a transaction ID, or None."""
+        row = self._connection().execute(
+            "SELECT * FROM transactions WHERE trx_id = ?", (trx_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def by_payment_id(self, payment_id):
+        """Return the entries created for a PayPal payment ID."""
+        rows = self._connection().execute(
+            "SELECT * FROM transactions WHERE payment_id = ? ORDER BY id",
+            (payment_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def by_msisdn(self, msisdn, limit=100):
+        """Return the most recent entries of a mobile number."""
+        rows = self._connection().execute(
+            "SELECT * FROM transactions WHERE msisdn = ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (msisdn, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def range(self, start, end, after=None, limit=1000):
+        """
+        Return one page of entries created between two timestamps.
+
+        Pages are read by keyset on (created_at, id), so every page costs
+        the same however deep into the range it is.
+
+        Args:
+            start (float): Start timestamp (inclusive).
+            end (float): End timestamp (exclusive).
+            after (tuple, optional): The (created_at, id) of the last entry
+                                     of the previous page.
+            limit (int): Maximum entries per page.
+
+        Returns:
+            list: The entries, oldest first.
+        """
+        if after is None:
+            rows = self._connection().execute(
+                "SELECT * FROM transactions "
+                "WHERE created_at >= ? AND created_at < ? "
+                "ORDER BY created_at, id LIMIT ?",
+                (start, end, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM transactions "
+                "WHERE (created_at, id) > (?, ?) AND created_at < ? "
+                "AND created_at >= ? ORDER BY created_at, id LIMIT ?",
+                (after[0], after[1], end, start, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def iter_range(self, start, end, page_size=1000):
+        """Yield every entry created between two timestamps."""
+        after = None
+        while True:
+            page = self.range(start, end, after=after, limit=page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1]["created_at"], page[-1]["id"])
+
+    def totals(self, start_day, end_day, group_by="day"):
+        """
+        Return completed top-ups between two days from the rollup table.
+
+        Args:
+            start_day (str): First day, as YYYY-MM-DD (inclusive).
+            end_day (str): Last day, as YYYY-MM-DD (inclusive).
+            group_by (str): "day", "operator" or "currency".
+
+        Returns:
+            list: Dictionaries with the group key, count, retail_total and
+                  wholesale_total, per retail currency.
+        """
+        keys = {
+            "day": "day, retail_unit",
+            "operator": "operator_name, retail_unit",
+            "currency": "retail_unit"
+        }
+        if group_by not in keys:
+            raise ValueError(f"Unknown group_by: {group_by}")
+        rows = self._connection().execute(
+            f"SELECT {keys[group_by]}, SUM(count) AS count,"
+            " SUM(retail_total) AS retail_total,"
+            " SUM(wholesale_total) AS wholesale_total "
+            "FROM daily_totals WHERE day BETWEEN ? AND ? "
+            f"GROUP BY {keys[group_by]} ORDER BY {keys[group_by]}",
+            (start_day, end_day)
+        ).fetchall()
+        return [dict(row) for row in rows]
@@ -0,0 +1,288 @@
+"""Define the metrics module.
+
+This module contains a small, low-overhead metrics registry with
+counters, in-flight gauges and latency histograms, rendered in the
+Prometheus text format. Every thread records into its own shard, so the
+hot path takes no locks; shards are only merged when metrics are read.
+Each gunicorn worker keeps its own registry, so every sample carries a
+`worker` label with the process ID; sum over it to aggregate workers.
+"""
+
+import bisect
+import os
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Latency buckets in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+# Characters not allowed in a Server-Timing metric name.
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+# Spans of the current request, for the Server-Timing header.
+request_spans = ContextVar("request_spans", default=None)
+
+
+class _ShardOwner:
+    """Thread-local marker collected when its thread exits."""
+
+    __slots__ = ("__weakref__",)
+
+
+class MetricsRegistry:
+    """Define MetricsRegistry class.
+
+    Counters, gauges and histograms are identified by a name and a set
+    of labels. Values live in per-thread shards and are summed when the
+    registry is rendered. The shard of a thread that has exited is folded
+    into a shared total, so short-lived threads do not pile up shards.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize the registry with its histogram buckets."""
+        self.buckets = tuple(buckets)
+        self._descriptions = {}
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # Shards of exited threads, and the sum of those already folded.
+        self._dead = deque()
+        self._retired = {}
+        self._local = threading.local()
+        self._collectors = []
+
+    def describe(self, name, metric_type, help_text):
+        """Declare the type ("counter", "gauge", "histogram") of a metric."""
+        self._descriptions[name] = (metric_type, help_text)
+
+    def register_collector(self, collector):
+        """Register a callable read at render time.
+
+        The callable returns an iterable of (name, labels, value) gauge
+        samples, for values owned elsewhere such as cache statistics.
+        """
+        self._collectors.append(collector)
+
+    def _shard(self):
+        """Return the shard of the current thread."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            owner = self._local.owner = _ShardOwner()
+            # Runs when the thread's locals are cleared on exit. It may run
+            # in any thread, even one holding _shards_lock, so it only
+            # queues the shard; _fold_dead merges it later.
+            weakref.finalize(owner, self._dead.append, shard)
+            with self._shards_lock:
+                self._fold_dead()
+                self._shards.append(shard)
+        return shard
+
+    def _fold_dead(self):
+        """Merge the shards of exited threads into the retired total.
+
+        Must be called with _shards_lock held.
+        """
+        while self._dead:
+            shard = self._dead.popleft()
+            self._shards.remove(shard)
+            _merge(self._retired, shard)
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter or gauge."""
+        key = (name, tuple(sorted(labels.items())))
+        shard = self._shard()
+        cell = shard.get(key)
+        if cell is None:
+            shard[key] = [value]
+        else:
+            cell[0] += value
+
+    def dec(self, name, value=1, **labels):
+        """Subtract value from a gauge."""
+        self.inc(name, -value, **labels)
+
+    def observe(self, name, value, **labels):
+        """Record one observation in a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        shard = self._shard()
+        cell = shard.get(key)
+        if cell is None:
+            # One slot per bucket plus +Inf, then sum.
+            cell = shard[key] = [0] * (len(self.buckets) + 2)
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def timer(self, name, span=None, **labels):
+        """Time a block into a histogram and track it as in flight.
+
+        Exceptions raised by the block are counted in the matching
+        `_errors_total` counter.
+
+        Args:
+            name (str): The histogram name, e.g. billhub_upstream_seconds.
+            span (str, optional): Name under which the duration is added
+                                  to the current request's timing header.
+            **labels: The metric labels.
+        """
+        in_flight = name.replace("_seconds", "_in_flight")
+        self.inc(in_flight, **labels)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc(name.replace("_seconds", "_errors_total"), **labels)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.dec(in_flight, **labels)
+            self.observe(name, elapsed, **labels)
+            if span is not None:
+                add_span(span, elapsed)
+
+    def snapshot(self):
+        """Merge every shard into one dictionary of values."""
+        merged = {}
+        with self._shards_lock:
+            self._fold_dead()
+            shards = list(self._shards)
+            _merge(merged, self._retired)
+        for shard in shards:
+            _merge(merged, shard)
+        return merged
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        worker = ("worker", str(os.getpid()))
+        samples = {}
+        for (name, labels), values in self.snapshot().items():
+            samples.setdefault(name, []).append(
+                (tuple(sorted(labels + (worker,))), values))
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    samples.setdefault(name, []).append(
+                        (tuple(sorted([*labels.items(), worker])), [value]))
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+
+        lines = []
+        for name in sorted(samples):
+            metric_type, help_text = self._descriptions.get(
+                name, ("gauge", name))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, values in sorted(samples[name]):
+                if metric_type == "histogram":
+                    lines.extend(self._render_histogram(name, labels, values))
+                else:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_num(values[0])}")
+        return "\n".join(lines) + "\n"
+
+    def _render_histogram(self, name, labels, values):
+        """Return the bucket, sum and count lines of one histogram."""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+            cumulative += count
+            le = bound if bound == "+Inf" else _num(bound)
+            lines.append(
+                f"{name}_bucket{_format_labels(labels + (('le', le),))} "
+                f"{cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_num(values[-1])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+def _merge(total, shard):
+    """Add the values of a shard into total, in place."""
+    for key, cell in shard.copy().items():
+        values = total.get(key)
+        if values is None:
+            total[key] = list(cell)
+        else:
+            for i, value in enumerate(cell):
+                values[i] += value
+
+
+def _format_labels(labels):
+    """Format label pairs as {key="value",...}."""
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\")
+                         .replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _num(value):
+    """Format a sample value."""
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def endpoint_label(endpoint):
+    """Return a low-cardinality label for an API endpoint path.
+
+    Numeric path segments such as transaction IDs are replaced by `:id`.
+    """
+    return "/".join(
+        ":id" if segment.isdigit() else segment
+        for segment in endpoint.strip("/").split("/")
+    )
+
+
+def add_span(name, elapsed):
+    """Add elapsed seconds under name to the current request's spans."""
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((name, elapsed))
+
+
+def server_timing(spans, total=None):
+    """Format spans as a Server-Timing header value (milliseconds)."""
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed
+    parts = [f"{_TOKEN_UNSAFE.sub('-', name)};dur={elapsed * 1000:.1f}"
+             for name, elapsed in totals.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# The registry used by the application.
+metrics = MetricsRegistry()
+metrics.describe("billhub_upstream_seconds", "histogram",
+                 "Latency of calls to the top-up API by endpoint.")
+metrics.describe("billhub_upstream_in_flight", "gauge",
+                 "Calls to the top-up API currently in flight.")
+metrics.describe("billhub_upstream_errors_total", "counter",
+                 "Failed calls to the top-up API by endpoint.")
+metrics.describe("billhub_paypal_seconds", "histogram",
+                 "Latency of PayPal API calls.")
+metrics.describe("billhub_paypal_in_flight", "gauge",
+                 "PayPal API calls currently in flight.")
+metrics.describe("billhub_paypal_errors_total", "counter",
+                 "Failed PayPal API calls.")
+metrics.describe("billhub_http_request_seconds", "histogram",
+                 "Latency of HTTP requests by route.")
+metrics.describe("billhub_http_request_in_flight", "gauge",
+                 "HTTP requests currently being served.")
+metrics.describe("billhub_http_requests_total", "counter",
+                 "HTTP responses by route and status code.")
+metrics.describe("billhub_prefix_lookups_total", "counter",
+                 "Mobile number lookups by result (local hit or upstream).")
+metrics.describe("billhub_upstream_hedged_total", "counter",
+                 "Read-only calls to the top-up API sent a second time.")
@@ -0,0 +1,167 @@
+"""Define the outbox module.
+
+This module contains a background email sender. Messages are queued in
+memory and sent by one thread that keeps an authenticated SMTP connection
+open and sends queued messages in batches over it.
+"""
+
+import os
+import queue
+import smtplib
+import threading
+import time
+
+from application.models.helpers import Helpers
+
+
+class Outbox:
+    """Define Outbox class.
+
+    Queued emails are delivered over a reused SMTP_SSL connection. The
+    connection is closed after it has been idle for a while and reopened
+    on demand; failed sends are retried with exponential backoff.
+    """
+
+    def __init__(self, smtp_server, smtp_port, sender_email, password,
+                 batch_size=50, max_retries=5, backoff=2.0, idle_timeout=30,
+                 max_queue=10000):
+        """Initialize the Outbox instance.
+
+        Args:
+            smtp_server (str): The SMTP server address.
+            smtp_port (int): The SMTP port number.
+            sender_email (str): The sender's email address, also the login.
+            password (str): The password for the sender's email account.
+            batch_size (int): Maximum messages sent per batch.
+            max_retries (int): Attempts per message before it is dropped.
+            backoff (float): Base delay in seconds between retries.
+            idle_timeout (float): Seconds of inactivity after which the
+                                  SMTP connection is closed.
+            max_queue (int): Maximum number of queued messages.
+        """
+        self.smtp_server = smtp_server
+        self.smtp_port = int(smtp_port)
+        self.sender_email = sender_email
+        self.password = password
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._server = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring.
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build an Outbox from the environment, or None if not configured."""
+        smtp_server = os.getenv('smtp_server')
+        if not smtp_server:
+            return None
+        return cls(
+            smtp_server,
+            os.getenv('smtp_port', '465'),
+            os.getenv('email_sender', 'payment@remmittance.com'),
+            os.getenv('email_password'),
+            batch_size=int(os.getenv('OUTBOX_BATCH_SIZE', '50')),
+            max_retries=int(os.getenv('OUTBOX_MAX_RETRIES', '5'))
+        )
+
+    def start(self):
+        """Start the sender thread in the current process if needed."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._server = None
+            threading.Thread(target=self._run, name="outbox",
+                             daemon=True).start()
+
+    def enqueue(self, receiver_email, subject, html_message):
+        """Queue an HTML email without waiting for it to be sent.
+
+        Returns:
+            bool: False if the outbox is full and the message was dropped.
+        """
+        self.start()
+        try:
+            self._queue.put_nowait(
+                (receiver_email, subject, html_message, 0))
+            return True
+        except queue.Full:
+            print(f"Outbox full; email to {receiver_email} dropped.")
+            self.failed += 1
+            return False
+
+    def pending(self):
+        """Return the number of queued messages."""
+        return self._queue.qsize()
+
+    def _connect(self):
+        """Open and authenticate an SMTP connection if none is open."""
+        if self._server is None:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port,
+                                      timeout=30)
+            server.ehlo()
+            server.login(self.sender_email, self.password)
+            self._server = server
+            self.connections += 1
+        return self._server
+
+    def _disconnect(self):
+        """Close the SMTP connection, ignoring errors."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def _next_batch(self):
+        """Block for the next message and drain up to a batch after it."""
+        try:
+            batch = [self._queue.get(timeout=self.idle_timeout)]
+        except queue.Empty:
+            self._disconnect()
+            batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Send queued messages forever."""
+        while True:
+            batch = self._next_batch()
+            retry = []
+            for receiver_email, subject, html_message, attempt in batch:
+                message = Helpers.build_message(
+                    self.sender_email, receiver_email, subject, html_message)
+                try:
+                    self._connect().sendmail(
+                        self.sender_email, receiver_email,
+                        message.as_string())
+                    self.sent += 1
+                except (smtplib.SMTPException, OSError) as e:
+                    self._disconnect()
+                    if attempt + 1 >= self.max_retries:
+                        print(f"Failed to send email to {receiver_email}. "
+                              f"Error: {e}")
+                        self.failed += 1
+                    else:
+                        retry.append((receiver_email, subject, html_message,
+                                      attempt + 1))
+            if retry:
+                time.sleep(self.backoff * 2 ** (retry[0][3] - 1))
+                for item in retry:
+                    try:
+                        self._queue.put_nowait(item)
+                    except queue.Full:
+                        self.failed += 1
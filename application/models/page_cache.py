@@ -0,0 +1,95 @@
+"""Define the page cache module.
+
+This module contains a render cache for pages that do not depend on the
+session, such as the landing pages. Each page is rendered once per
+process (or once in a preloading gunicorn master) and served from memory
+with an ETag, so repeat visitors get a 304 without a body.
+"""
+
+import hashlib
+import os
+import threading
+from flask import Response, current_app, render_template, request
+
+
+class PageCache:
+    """Define PageCache class.
+
+    Rendered pages by template, context and script root. The cache is
+    bypassed while templates auto-reload (debug mode), so edits show up
+    immediately during development.
+    """
+
+    def __init__(self, max_age=None):
+        """Initialize the PageCache instance.
+
+        Args:
+            max_age (int, optional): Seconds browsers may reuse a page
+                                     before revalidating it; read from
+                                     PAGE_CACHE_MAX_AGE when None.
+        """
+        if max_age is None:
+            max_age = int(os.getenv("PAGE_CACHE_MAX_AGE", "60"))
+        self.max_age = max_age
+        self._pages = {}
+        self._lock = threading.Lock()
+
+        # Counters for monitoring.
+        self.hits = 0
+        self.renders = 0
+
+    def render(self, template, **context):
+        """
+        Return a rendered page and its ETag, rendering it on a miss.
+
+        Must be called within a request context.
+
+        Args:
+            template (str): The template name.
+            **context: Template variables; they must not depend on the
+                       session or the request.
+
+        Returns:
+            tuple: The page (bytes) and its ETag (str).
+        """
+        if current_app.jinja_env.auto_reload:
+            body = render_template(template, **context).encode()
+            return body, hashlib.sha256(body).hexdigest()[:32]
+
+        key = (template, request.script_root, tuple(sorted(context.items())))
+        page = self._pages.get(key)
+        if page is not None:
+            self.hits += 1
+            return page
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                body = render_template(template, **context).encode()
+                page = (body, hashlib.sha256(body).hexdigest()[:32])
+                self._pages[key] = page
+                self.renders += 1
+        return page
+
+    def respond(self, template, **context):
+        """
+        Return a cached page as a conditional response.
+
+        Args:
+            template (str): The template name.
+            **context: Template variables, as for render().
+
+        Returns:
+            flask.Response: The page, or a 304 if the request's
+                            If-None-Match matches its ETag.
+        """
+        body, etag = self.render(template, **context)
+        response = Response(body, mimetype="text/html")
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        return response.make_conditional(request)
+
+    def clear(self):
+        """Drop every cached page."""
+        with self._lock:
+            self._pages.clear()
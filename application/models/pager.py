@@ -0,0 +1,105 @@
+"""Define the pager module.
+
+This module contains helpers to read paginated list endpoints: the page
+count announced in the response headers, and an incremental parser that
+yields the items of a JSON array while its body is still arriving.
+"""
+
+import codecs
+import json
+
+WHITESPACE = " \t\r\n"
+
+# Characters that may follow an item of an array.
+DELIMITERS = ",]" + WHITESPACE
+
+
+def total_pages(headers):
+    """
+    Return the number of pages announced by a list response.
+
+    Args:
+        headers (Mapping): The response headers.
+
+    Returns:
+        int or None: The value of X-Total-Pages, or None if it is missing.
+    """
+    try:
+        return int(headers.get("X-Total-Pages"))
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_json_array(chunks):
+    """
+    Yield the items of a JSON array from an iterable of byte chunks.
+
+    Only the item being decoded is buffered, so memory stays bounded by
+    the largest item instead of the whole document.
+
+    Args:
+        chunks (iterable): The response body, in chunks of bytes.
+
+    Yields:
+        The decoded items of the array, in order.
+
+    Raises:
+        ValueError: If the body is not a complete JSON array.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    exhausted = False
+    started = False
+    expect_item = True
+
+    while True:
+        while position < len(buffer) and buffer[position] in WHITESPACE:
+            position += 1
+        item = end = None
+        if position < len(buffer):
+            char = buffer[position]
+            if not started:
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                position += 1
+                continue
+            if char == "]":
+                return
+            if char == ",":
+                if expect_item:
+                    raise ValueError("Unexpected ',' in JSON array")
+                expect_item = True
+                position += 1
+                continue
+            if not expect_item:
+                raise ValueError("Missing ',' in JSON array")
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # A number that ends with the buffer, or before anything but a
+            # delimiter, may continue in the next chunk ("1." then "5").
+            if end is not None and not exhausted and (
+                    end == len(buffer)
+                    or type(item) in (int, float)
+                    and buffer[end] not in DELIMITERS):
+                end = None
+            if end is not None:
+                yield item
+                position = end
+                expect_item = False
+                continue
+
+        # Read the next chunk, dropping what was already consumed.
+        if exhausted:
+            raise ValueError("Truncated or invalid JSON array")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            chunk = b""
+        buffer = buffer[position:] + utf8.decode(chunk, final=exhausted)
+        position = 0
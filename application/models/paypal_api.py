@@ -0,0 +1,185 @@
+"""Define the paypal_api module.
+
+This module contains the paypalrestsdk API object used by PayPalHandler.
+It is kept apart so that the SDK is only imported when a handler is
+built, not when the application starts.
+"""
+
+import json
+import os
+import threading
+import time
+import paypalrestsdk
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledApi(paypalrestsdk.Api):
+    """Define PooledApi class.
+
+    A paypalrestsdk.Api that sends its calls over a pooled keep-alive
+    session with timeouts, and keeps one OAuth access token shared by all
+    threads (and, with a token cache file, by all gunicorn workers). The
+    token is refreshed in the background before it expires, so requests
+    never wait for the OAuth round trip.
+    """
+
+    def __init__(self, pool_size=10, timeout=(3.05, 30), refresh_margin=300,
+                 token_cache_path=None, min_refresh_interval=30, **kwargs):
+        """Initialize the PooledApi instance.
+
+        Args:
+            pool_size (int): Maximum number of pooled connections.
+            timeout (tuple): Connect and read timeouts in seconds.
+            refresh_margin (float): Seconds before expiry at which the
+                                    token is refreshed, capped at half the
+                                    token's lifetime.
+            token_cache_path (str, optional): File used to share the token
+                                              between processes.
+            min_refresh_interval (float): Minimum seconds between two
+                                          background refreshes, and the
+                                          lifetime assumed for a token
+                                          without expires_in.
+            **kwargs: Options for paypalrestsdk.Api (mode, client_id, ...).
+        """
+        super().__init__(**kwargs)
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.token_cache_path = token_cache_path
+        self.token_expires_at = 0
+        self.on_timing = None
+        self._rejected_token = None
+        self._token_lock = threading.Lock()
+        self._refresher = None
+        self._pid = None
+
+        # Built on first use in each process, so that a preloading
+        # gunicorn master never shares sockets with its workers.
+        self.pool_size = pool_size
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Return the pooled HTTP session of the current process."""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or \
+                        self._session_pid != os.getpid():
+                    adapter = HTTPAdapter(pool_connections=2,
+                                          pool_maxsize=self.pool_size)
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def http_call(self, url, method, **kwargs):
+        """Make an HTTP call over the pooled session."""
+        response = self.session.request(
+            method, url, proxies=self.proxies, timeout=self.timeout, **kwargs)
+        if response.status_code == 401 and self.token_hash:
+            # Never pick the rejected token up again from the shared cache.
+            self._rejected_token = self.token_hash.get("access_token")
+        return self.handle_response(response, response.content.decode('utf-8'))
+
+    def validate_token_hash(self):
+        """Drop the cached token once it is within the refresh margin."""
+        if self.token_hash and time.time() >= self.token_expires_at:
+            self.token_hash = None
+
+    def get_token_hash(self, authorization_code=None, refresh_token=None,
+                       headers=None):
+        """Return the shared client-credentials token, fetching it if needed."""
+        if authorization_code is not None or refresh_token is not None:
+            return super().get_token_hash(authorization_code, refresh_token,
+                                          headers)
+        self._start_refresher()
+        self.validate_token_hash()
+        if self.token_hash is not None:
+            return self.token_hash
+        with self._token_lock:
+            self.validate_token_hash()
+            if self.token_hash is None and not self._load_cached_token():
+                self._fetch_token(headers)
+            return self.token_hash
+
+    def _fetch_token(self, headers=None):
+        """Request a new token from PayPal and share it."""
+        self.token_hash = None
+        started = time.perf_counter()
+        token = super().get_token_hash(headers=headers)
+        if self.on_timing is not None:
+            self.on_timing("oauth_token", time.perf_counter() - started)
+        expires_in = token.get("expires_in")
+        if expires_in:
+            # Short-lived tokens are used for at least half their lifetime.
+            lifetime = max(expires_in * 0.5, expires_in - self.refresh_margin)
+        else:
+            lifetime = self.min_refresh_interval
+        self.token_expires_at = time.time() + lifetime
+        self._store_cached_token()
+        return token
+
+    def _load_cached_token(self):
+        """Load a still valid token written by another worker."""
+        if not self.token_cache_path:
+            return False
+        try:
+            with open(self.token_cache_path) as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return False
+        if cached.get("expires_at", 0) <= time.time():
+            return False
+        if cached["token"].get("access_token") == self._rejected_token:
+            return False
+        self.token_hash = cached["token"]
+        self.token_expires_at = cached["expires_at"]
+        return True
+
+    def _store_cached_token(self):
+        """Write the current token for other workers, atomically."""
+        if not self.token_cache_path:
+            return
+        tmp_path = f"{self.token_cache_path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+            with os.fdopen(fd, "w") as cache_file:
+                json.dump({"token": self.token_hash,
+                           "expires_at": self.token_expires_at}, cache_file)
+            os.replace(tmp_path, self.token_cache_path)
+        except OSError as e:
+            print(f"Could not write PayPal token cache: {e}")
+
+    def _start_refresher(self):
+        """Start the background token refresher in this process."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="paypal-token", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        """Refresh the token shortly before it reaches the margin."""
+        while True:
+            delay = self.token_expires_at - time.time() - 5
+            if delay > 0:
+                time.sleep(min(delay, 60))
+                continue
+            with self._token_lock:
+                if self.token_expires_at - time.time() > 5:
+                    continue
+                try:
+                    if not self._load_cached_token():
+                        self._fetch_token()
+                except Exception as e:
+                    print(f"Error refreshing PayPal token: {e}")
+            # Never spin on the OAuth endpoint, even if the token (or one
+            # cached by another worker) is already close to expiry.
+            time.sleep(self.min_refresh_interval)
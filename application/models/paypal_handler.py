@@ -5,12 +5,11 @@ This module provides a class for handling PayPal payments.
 
 """
 
-import paypalrestsdk
-from dotenv import load_dotenv
+from application.models.metrics import metrics
+from contextlib import contextmanager
 import os
-
-# Load environment variables from the .env file
-load_dotenv()
+import threading
+import time
 
 
 class PayPalHandler:
@@ -18,11 +17,59 @@ class PayPalHandler:
         """
         Initialize the PayPalHandler class.
         """
-        paypalrestsdk.configure({
-            "mode": os.getenv("PAYPAL_MODE"),
-            "client_id": os.getenv("PAYPAL_CLIENT_ID"),
-            "client_secret": os.getenv("PAYPAL_CLIENT_SECRET")
-        })
+        # The SDK is only imported once a handler is needed.
+        from application.models.paypal_api import PooledApi
+
+        options = {
+            "mode": mode or os.getenv("PAYPAL_MODE") or "sandbox",
+            "client_id": client_id or os.getenv("PAYPAL_CLIENT_ID"),
+            "client_secret": (client_secret
+                              or os.getenv("PAYPAL_CLIENT_SECRET"))
+        }
+        if os.getenv("PAYPAL_ENDPOINT"):
+            options["endpoint"] = os.getenv("PAYPAL_ENDPOINT")
+        self.api = PooledApi(
+            pool_size=int(os.getenv("PAYPAL_POOL_SIZE", "10")),
+            timeout=(
+                float(os.getenv("PAYPAL_CONNECT_TIMEOUT", "3.05")),
+                float(os.getenv("PAYPAL_READ_TIMEOUT", "30"))
+            ),
+            refresh_margin=float(os.getenv("PAYPAL_TOKEN_REFRESH_MARGIN",
+                                           "300")),
+            token_cache_path=os.getenv("PAYPAL_TOKEN_CACHE"),
+            **options
+        )
+
+        # Per-call timing: count, total and max seconds, and the last call.
+        self.timings = {}
+        self._timings_lock = threading.Lock()
+        self.api.on_timing = self._record_token_timing
+
+    @contextmanager
+    def _timed(self, name):
+        """Record how long the PayPal call `name` takes."""
+        started = time.perf_counter()
+        try:
+            with metrics.timer("billhub_paypal_seconds",
+                               span=f"paypal_{name}", call=name):
+                yield
+        finally:
+            self._record_timing(name, time.perf_counter() - started)
+
+    def _record_token_timing(self, name, elapsed):
+        """Record an OAuth token request made by the API object."""
+        self._record_timing(name, elapsed)
+        metrics.observe("billhub_paypal_seconds", elapsed, call=name)
+
+    def _record_timing(self, name, elapsed):
+        """Add one call of `name` taking `elapsed` seconds to the timings."""
+        with self._timings_lock:
+            stats = self.timings.setdefault(
+                name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["last"] = elapsed
 
     def create_payment(self, usd_amount, customer_msisdn, request):
         """
@@ -35,8 +82,9 @@ class PayPalHandler:
                                         host and port information.
 
         Returns:
-            str: The PayPal redirect URL for the created payment.
-                 Returns None if the payment creation fails.
+            tuple: The PayPal payment ID and the redirect URL of the
+                   created payment, or (None, None) if the payment
+                   creation fails.
         """
         host = request.host
         return_url = (
@@ -46,6 +94,8 @@ class PayPalHandler:
                 )
         cancel_url = f"http://{host}/cancel_payment"
 
+        import paypalrestsdk
+
         payment = paypalrestsdk.Payment({
             "intent": "sale",
             "payer": {
@@ -61,22 +111,28 @@ class PayPalHandler:
                 "return_url": return_url,
                 "cancel_url": cancel_url
             }
-        })
+        }, api=self.api)
 
-        if payment.create():
+        with self._timed("create_payment"):
+            created = payment.create()
+        if created:
             for link in payment.links:
                 if link.method == "REDIRECT":
-                    return str(link.href)
+                    return payment.id, str(link.href)
 
-        return None
+        return None, None
 
-    def execute_payment(self, payment_id, payer_id):
+    def execute_payment(self, payment_id, payer_id, verify=False):
         """
         Execute a PayPal payment.
 
+        The payment is executed directly by its ID; the extra
+        Payment.find round trip is only made when verify is True.
+
         Args:
             payment_id (str): The PayPal payment ID.
             payer_id (str): The PayPal payer ID.
+            verify (bool): Fetch the payment before executing it.
 
         Returns:
             tuple: A tuple containing a boolean indicating whether the payment
@@ -85,8 +141,16 @@ class PayPalHandler:
                    and an optional error message as a string
                    (None if the payment was successful).
         """
-        payment = paypalrestsdk.Payment.find(payment_id)
-        if payment.execute({"payer_id": payer_id}):
+        import paypalrestsdk
+
+        if verify:
+            with self._timed("find_payment"):
+                payment = paypalrestsdk.Payment.find(payment_id, api=self.api)
+        else:
+            payment = paypalrestsdk.Payment({"id": payment_id}, api=self.api)
+        with self._timed("execute_payment"):
+            executed = payment.execute({"payer_id": payer_id})
+        if executed:
             return True, None
         else:
             return False, str(payment.error)
@@ -0,0 +1,137 @@
+"""Define the phone number module.
+
+This module contains a local E.164 normalizer and validator. Numbers are
+checked against a compact dialing-plan table (country calling code and
+national number length) before any upstream call, and their canonical
+form (+ and digits) is used as the key of the lookup and catalog caches.
+"""
+
+import os
+import re
+
+
+class InvalidPhoneNumber(ValueError):
+    """Raised when a mobile number cannot be a valid E.164 number."""
+
+
+# Calling code, ISO country code, shortest and longest national number.
+# Country calling codes are prefix-free, so the table is keyed by code.
+_DIALING_PLAN = """
+1 US 10 10|7 RU 10 10|20 EG 10 10|27 ZA 9 9|30 GR 10 10|31 NL 9 9
+32 BE 8 9|33 FR 9 9|34 ES 9 9|36 HU 8 9|39 IT 6 11|40 RO 9 9|41 CH 9 9
+43 AT 4 13|44 GB 9 10|45 DK 8 8|46 SE 7 10|47 NO 8 8|48 PL 9 9
+49 DE 6 13|51 PE 8 9|52 MX 10 10|53 CU 8 8|54 AR 10 11|55 BR 10 11
+56 CL 9 9|57 CO 8 10|58 VE 10 10|60 MY 8 10|61 AU 9 9|62 ID 8 12
+63 PH 8 10|64 NZ 8 10|65 SG 8 8|66 TH 8 9|81 JP 9 10|82 KR 8 10
+84 VN 9 10|86 CN 10 11|90 TR 10 10|91 IN 10 10|92 PK 9 10|93 AF 9 9
+94 LK 9 9|95 MM 7 10|98 IR 10 10|211 SS 9 9|212 MA 9 9|213 DZ 8 9
+216 TN 8 8|218 LY 9 9|220 GM 7 7|221 SN 9 9|222 MR 8 8|223 ML 8 8
+224 GN 8 9|225 CI 8 10|226 BF 8 8|227 NE 8 8|228 TG 8 8|229 BJ 8 10
+230 MU 7 8|231 LR 7 9|232 SL 8 8|233 GH 9 9|234 NG 8 10|235 TD 8 8
+236 CF 8 8|237 CM 8 9|238 CV 7 7|239 ST 7 7|240 GQ 9 9|241 GA 7 8
+242 CG 9 9|243 CD 9 9|244 AO 9 9|245 GW 7 9|248 SC 7 7|249 SD 9 9
+250 RW 9 9|251 ET 9 9|252 SO 7 9|253 DJ 8 8|254 KE 9 10|255 TZ 9 9
+256 UG 9 9|257 BI 8 8|258 MZ 8 9|260 ZM 9 9|261 MG 9 9|262 RE 9 9
+263 ZW 9 10|264 NA 8 10|265 MW 7 9|266 LS 8 8|267 BW 7 8|268 SZ 8 8
+269 KM 7 7|291 ER 7 7|297 AW 7 7|351 PT 9 9|352 LU 4 11|353 IE 7 9
+354 IS 7 9|355 AL 8 9|356 MT 8 8|357 CY 8 8|358 FI 5 12|359 BG 7 9
+370 LT 8 8|371 LV 8 8|372 EE 7 8|373 MD 8 8|374 AM 8 8|375 BY 9 10
+380 UA 9 9|381 RS 8 12|385 HR 8 9|386 SI 8 8|420 CZ 9 9|421 SK 9 9
+502 GT 8 8|503 SV 8 8|504 HN 8 8|505 NI 8 8|506 CR 8 8|507 PA 7 8
+509 HT 8 8|591 BO 8 8|593 EC 8 9|595 PY 9 9|598 UY 8 8|852 HK 8 8
+853 MO 8 8|855 KH 8 9|856 LA 8 10|880 BD 10 10|886 TW 8 9|960 MV 7 7
+961 LB 7 8|962 JO 8 9|963 SY 8 9|964 IQ 8 10|965 KW 8 8|966 SA 9 9
+967 YE 7 9|968 OM 8 8|970 PS 8 9|971 AE 8 9|972 IL 8 9|973 BH 8 8
+974 QA 7 8|975 BT 7 8|976 MN 8 8|977 NP 8 10|992 TJ 9 9|993 TM 8 8
+994 AZ 9 9|995 GE 9 9|996 KG 9 9|998 UZ 9 9
+"""
+
+DIALING_PLAN = {}
+for _entry in re.split(r"[|\n]", _DIALING_PLAN.strip()):
+    _code, _country, _shortest, _longest = _entry.split()
+    DIALING_PLAN[_code] = (_country, int(_shortest), int(_longest))
+
+# Characters people type between digits.
+_SEPARATORS = re.compile(r"[\s\-.()/]+")
+_DIGITS = re.compile(r"\+?[0-9]+")
+
+
+def parse(mobile_number, default_country_code=None):
+    """
+    Split a mobile number into its calling code and national number.
+
+    Args:
+        mobile_number (str): The number as typed: with a + or 00 prefix,
+                             with the calling code only, or in national
+                             format with a trunk 0 when a default calling
+                             code is given.
+        default_country_code (str, optional): Calling code for numbers in
+                                              national format; read from
+                                              PHONE_DEFAULT_COUNTRY_CODE
+                                              when None.
+
+    Returns:
+        tuple: The calling code (str, or None if it is not in the dialing
+               plan) and the national number (str).
+
+    Raises:
+        InvalidPhoneNumber: If the number cannot be valid.
+    """
+    if default_country_code is None:
+        default_country_code = os.getenv("PHONE_DEFAULT_COUNTRY_CODE", "")
+    number = _SEPARATORS.sub("", str(mobile_number or ""))
+    if not _DIGITS.fullmatch(number):
+        raise InvalidPhoneNumber(f"Not a phone number: {mobile_number!r}")
+
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    elif number.startswith("0") and default_country_code:
+        digits = default_country_code + number[1:]
+    else:
+        digits = number
+
+    if not 7 <= len(digits) <= 15 or digits.startswith("0"):
+        raise InvalidPhoneNumber(f"Not an E.164 number: {mobile_number!r}")
+
+    for length in (1, 2, 3):
+        plan = DIALING_PLAN.get(digits[:length])
+        if plan is not None:
+            national = digits[length:]
+            _, shortest, longest = plan
+            if not shortest <= len(national) <= longest:
+                raise InvalidPhoneNumber(
+                    f"Wrong length for a +{digits[:length]} number: "
+                    f"{mobile_number!r}"
+                )
+            return digits[:length], national
+    # Calling codes missing from the table are left to the API.
+    return None, digits
+
+
+def normalize(mobile_number, default_country_code=None):
+    """
+    Return the canonical E.164 form of a mobile number.
+
+    Args:
+        mobile_number (str): The number as typed.
+        default_country_code (str, optional): See parse().
+
+    Returns:
+        str: The number as + followed by its digits, e.g. +250788123456.
+
+    Raises:
+        InvalidPhoneNumber: If the number cannot be valid.
+    """
+    country_code, national = parse(mobile_number, default_country_code)
+    return f"+{country_code or ''}{national}"
+
+
+def is_valid(mobile_number, default_country_code=None):
+    """Return True if a mobile number passes the local checks."""
+    try:
+        parse(mobile_number, default_country_code)
+    except InvalidPhoneNumber:
+        return False
+    return True
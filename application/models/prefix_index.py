@@ -0,0 +1,181 @@
+"""Define the prefix index module.
+
+This module contains a digit trie mapping number prefixes (country code
+plus operator prefix) to operator IDs, so that most mobile number lookups
+can be answered without calling the `lookup/mobile-number` endpoint.
+"""
+
+import csv
+import json
+import threading
+
+
+class _Node:
+    """A node of the prefix trie."""
+
+    __slots__ = ("children", "operator_id", "confirmations", "conflicts")
+
+    def __init__(self):
+        self.children = {}
+        self.operator_id = None
+        self.confirmations = 0
+        self.conflicts = 0
+
+
+class PrefixIndex:
+    """Define PrefixIndex class.
+
+    A longest-match trie over the digits of a mobile number. Entries are
+    learned from confirmed upstream lookups or loaded from a seed file.
+    A prefix only answers a lookup when it satisfies the confidence
+    policy; ranges where numbers were seen on different operators are
+    treated as ported and left to the upstream API.
+    """
+
+    def __init__(self, learn_length=6, min_prefix_length=4,
+                 min_confirmations=2, max_conflicts=0):
+        """Initialize the PrefixIndex instance.
+
+        Args:
+            learn_length (int): Number of leading digits stored when a
+                                lookup result is learned.
+            min_prefix_length (int): Shortest prefix allowed to answer a
+                                     lookup.
+            min_confirmations (int): Upstream confirmations a learned
+                                     prefix needs before it is trusted.
+            max_conflicts (int): Number of times a prefix may have been
+                                 seen on another operator and still be
+                                 trusted.
+        """
+        self.learn_length = learn_length
+        self.min_prefix_length = min_prefix_length
+        self.min_confirmations = min_confirmations
+        self.max_conflicts = max_conflicts
+        self._root = _Node()
+        self._lock = threading.Lock()
+        self.size = 0
+
+    @staticmethod
+    def normalize(mobile_number):
+        """Return only the digits of a mobile number, without 00 prefix."""
+        digits = "".join(ch for ch in str(mobile_number) if ch.isdigit())
+        if digits.startswith("00"):
+            digits = digits[2:]
+        return digits
+
+    def insert(self, prefix, operator_id, confirmations=1):
+        """Record that numbers starting with prefix belong to operator_id.
+
+        Args:
+            prefix (str): The digit prefix.
+            operator_id (int): The operator ID.
+            confirmations (int): How many confirmations this adds.
+        """
+        prefix = self.normalize(prefix)
+        if not prefix:
+            return
+        with self._lock:
+            node = self._root
+            for digit in prefix:
+                child = node.children.get(digit)
+                if child is None:
+                    child = node.children[digit] = _Node()
+                node = child
+            if node.operator_id is None:
+                self.size += 1
+                node.operator_id = operator_id
+                node.confirmations = confirmations
+            elif node.operator_id == operator_id:
+                node.confirmations += confirmations
+            else:
+                # The range moved or contains ported numbers.
+                node.operator_id = operator_id
+                node.confirmations = confirmations
+                node.conflicts += 1
+
+    def learn(self, mobile_number, operator_id):
+        """Learn the prefix of a number confirmed by the upstream API."""
+        digits = self.normalize(mobile_number)
+        if len(digits) >= self.learn_length:
+            self.insert(digits[:self.learn_length], operator_id)
+
+    def lookup(self, mobile_number):
+        """Find the operator of a number by longest trusted prefix.
+
+        Args:
+            mobile_number (str): The mobile number to resolve.
+
+        Returns:
+            int or None: The operator ID, or None if no trusted prefix
+                         matches and the upstream API must be asked.
+        """
+        digits = self.normalize(mobile_number)
+        node = self._root
+        match = None
+        for depth, digit in enumerate(digits, start=1):
+            node = node.children.get(digit)
+            if node is None:
+                break
+            if node.operator_id is None:
+                continue
+            if node.conflicts > self.max_conflicts:
+                # A ported range below a trusted one must not be shadowed.
+                match = None
+            elif (depth >= self.min_prefix_length
+                  and node.confirmations >= self.min_confirmations):
+                match = node.operator_id
+        return match
+
+    def load_seed(self, path):
+        """Load trusted prefixes from a seed file.
+
+        The file is either a JSON object mapping prefixes to operator IDs
+        or a CSV file with `prefix,operator_id` rows.
+
+        Args:
+            path (str): Path to the seed file.
+
+        Returns:
+            int: The number of prefixes loaded.
+        """
+        with open(path, newline="") as seed_file:
+            if path.endswith(".json"):
+                rows = json.load(seed_file).items()
+            else:
+                rows = (
+                    row for row in csv.reader(seed_file)
+                    if row and not row[0].startswith("#")
+                )
+            count = 0
+            for prefix, operator_id in rows:
+                if not self.normalize(prefix):
+                    continue  # Header line.
+                self.insert(prefix, int(operator_id),
+                            confirmations=self.min_confirmations)
+                count += 1
+        return count
+
+    def dump(self, path):
+        """Write the trusted prefixes to a JSON seed file.
+
+        The file can be loaded back with load_seed.
+
+        Args:
+            path (str): Path to the seed file.
+
+        Returns:
+            int: The number of prefixes written.
+        """
+        entries = {}
+        stack = [("", self._root)]
+        while stack:
+            prefix, node = stack.pop()
+            if (node.operator_id is not None
+                    and node.conflicts <= self.max_conflicts
+                    and node.confirmations >= self.min_confirmations):
+                entries[prefix] = node.operator_id
+            for digit, child in node.children.items():
+                stack.append((prefix + digit, child))
+        with open(path, "w") as seed_file:
+            json.dump(entries, seed_file, indent=0, sort_keys=True)
+        return len(entries)
@@ -0,0 +1,86 @@
+"""Define the product module.
+
+This module contains a compact record of a top-up product. The API
+returns every product as a deeply nested dictionary; only the fields the
+application uses are kept, in one pass when the catalog is fetched.
+"""
+
+
+class Product:
+    """Define Product class.
+
+    Uses __slots__, so a product takes a fraction of the memory of the
+    nested dictionaries it is built from.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "operator_id",
+        "operator_name",
+        "retail_amount",
+        "retail_fee",
+        "retail_unit",
+        "destination_amount",
+        "destination_unit",
+    )
+
+    def __init__(self, id, name=None, operator_id=None, operator_name=None,
+                 retail_amount=None, retail_fee=None, retail_unit=None,
+                 destination_amount=None, destination_unit=None):
+        """Initialize the Product instance."""
+        self.id = id
+        self.name = name
+        self.operator_id = operator_id
+        self.operator_name = operator_name
+        self.retail_amount = retail_amount
+        self.retail_fee = retail_fee
+        self.retail_unit = retail_unit
+        self.destination_amount = destination_amount
+        self.destination_unit = destination_unit
+
+    @classmethod
+    def from_api(cls, item):
+        """
+        Build a product from one item of the products endpoint.
+
+        Args:
+            item (dict): The product as returned by the API.
+
+        Returns:
+            Product: The projected product.
+        """
+        operator = item.get("operator") or {}
+        retail = (item.get("prices") or {}).get("retail") or {}
+        destination = item.get("destination") or {}
+        return cls(
+            item.get("id"),
+            item.get("name"),
+            operator.get("id"),
+            operator.get("name"),
+            retail.get("amount"),
+            retail.get("fee"),
+            retail.get("unit"),
+            destination.get("amount"),
+            destination.get("unit")
+        )
+
+    def __repr__(self):
+        """Return a readable representation of the product."""
+        return (f"Product(id={self.id!r}, name={self.name!r}, "
+                f"retail={self.retail_amount!r} {self.retail_unit}, "
+                f"destination={self.destination_amount!r} "
+                f"{self.destination_unit})")
+
+
+def parse_products(items):
+    """
+    Project the items of the products endpoint into Product records.
+
+    Args:
+        items (list): The products as returned by the API.
+
+    Returns:
+        list: The Product records.
+    """
+    return [Product.from_api(item) for item in items]
@@ -0,0 +1,295 @@
+"""Define the profiler module.
+
+This module contains a sampling profiler that wraps the WSGI application
+and can be switched on at runtime, by a signal or the admin route. While
+it is on, a fraction of requests is sampled: a background thread takes a
+snapshot of the stacks running their views every few milliseconds and
+aggregates them per route. The result is written as collapsed stacks
+(for flamegraph.pl, speedscope or inferno) or as pstats files.
+
+When it is off, the only cost is one attribute check per request.
+"""
+
+import inspect
+import marshal
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from werkzeug.exceptions import HTTPException
+
+
+class SamplingProfiler:
+    """Define SamplingProfiler class.
+
+    WSGI middleware around a Flask application's wsgi_app. A thread is
+    attributed to a route when its stack contains that route's view
+    function, which also covers async views running on another thread's
+    event loop. Under concurrency, unsampled requests to a route that has
+    a sampled request in flight are sampled too, so the fraction is a
+    lower bound.
+    """
+
+    FORMATS = ("collapsed", "pstats")
+
+    def __init__(self, app, output_dir=None, sample_rate=None, interval=None,
+                 output_format=None):
+        """Initialize the SamplingProfiler instance.
+
+        Args:
+            app (Flask): The application; its wsgi_app is wrapped.
+            output_dir (str, optional): Directory the profiles are written
+                                        to; PROFILER_DIR when None.
+            sample_rate (float, optional): Fraction of requests sampled;
+                                           PROFILER_SAMPLE_RATE when None.
+            interval (float, optional): Seconds between stack snapshots;
+                                        PROFILER_INTERVAL when None.
+            output_format (str, optional): "collapsed" or "pstats";
+                                           PROFILER_FORMAT when None.
+        """
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.output_dir = output_dir or os.getenv(
+            "PROFILER_DIR", os.path.join("var", "profiles"))
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.getenv("PROFILER_SAMPLE_RATE", "0.1"))
+        self.interval = interval if interval is not None else float(
+            os.getenv("PROFILER_INTERVAL", "0.005"))
+        self.output_format = output_format or os.getenv(
+            "PROFILER_FORMAT", "collapsed")
+        if self.output_format not in self.FORMATS:
+            raise ValueError(f"Unknown profile format: {self.output_format}")
+
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._active = Counter()
+        self._stacks = defaultdict(Counter)
+        self._view_codes = None
+        self._sampler = None
+        # Reentrant: the signal handler may interrupt start() itself.
+        self._sampler_lock = threading.RLock()
+
+        # Counters for monitoring.
+        self.sampled_requests = 0
+        self.samples = 0
+
+    def __call__(self, environ, start_response):
+        """Serve a request, sampling it if the profiler is on."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return self.wsgi_app(environ, start_response)
+
+        route = self._route(environ)
+        if route is None:
+            return self.wsgi_app(environ, start_response)
+        with self._lock:
+            self._active[route] += 1
+            self.sampled_requests += 1
+        try:
+            # Bodies are usually rendered before the view returns; streamed
+            # bodies are only sampled while the view itself runs.
+            return self.wsgi_app(environ, start_response)
+        finally:
+            with self._lock:
+                self._active[route] -= 1
+                if not self._active[route]:
+                    del self._active[route]
+
+    def _route(self, environ):
+        """Return the URL rule a request matches, or None."""
+        try:
+            rule, _ = self.app.url_map.bind_to_environ(environ).match(
+                return_rule=True)
+        except HTTPException:
+            return None
+        return rule.rule
+
+    def start(self, sample_rate=None):
+        """
+        Switch the profiler on in this process.
+
+        Args:
+            sample_rate (float, optional): New fraction of requests sampled.
+        """
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        with self._sampler_lock:
+            self.enabled = True
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(
+                    target=self._sample_loop, name="profiler", daemon=True)
+                self._sampler.start()
+
+    def stop(self):
+        """
+        Switch the profiler off and write what it collected.
+
+        Returns:
+            list: Paths of the profile files written.
+        """
+        self.enabled = False
+        return self.dump()
+
+    def toggle(self, *_):
+        """Switch the profiler on or off (signal handler)."""
+        if self.enabled:
+            # Files are written by the sampler thread, not in the handler.
+            self.enabled = False
+        else:
+            self.start()
+
+    def install_signal_handler(self, signal_name=None):
+        """
+        Toggle the profiler when the process receives a signal.
+
+        Must be called from the main thread, after any server installed
+        its own handlers (gunicorn: in the post_worker_init hook).
+
+        Args:
+            signal_name (str, optional): Name of the signal; PROFILER_SIGNAL
+                                         (default SIGUSR2) when None. An
+                                         empty name installs nothing.
+        """
+        if signal_name is None:
+            signal_name = os.getenv("PROFILER_SIGNAL", "SIGUSR2")
+        if signal_name:
+            signal.signal(getattr(signal, signal_name), self.toggle)
+
+    def status(self):
+        """Return the settings and counters of the profiler."""
+        with self._lock:
+            pending = sum(sum(stacks.values())
+                          for stacks in self._stacks.values())
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "sample_rate": self.sample_rate,
+            "interval": self.interval,
+            "format": self.output_format,
+            "sampled_requests": self.sampled_requests,
+            "samples": self.samples,
+            "pending_samples": pending
+        }
+
+    def _codes(self):
+        """Return the code objects of the view functions, by URL rule."""
+        if self._view_codes is None:
+            codes = {}
+            for rule in self.app.url_map.iter_rules():
+                view = self.app.view_functions.get(rule.endpoint)
+                code = getattr(inspect.unwrap(view), "__code__", None)
+                if code is not None:
+                    codes[code] = rule.rule
+            self._view_codes = codes
+        return self._view_codes
+
+    def _sample_loop(self):
+        """Take stack snapshots while the profiler is on."""
+        own_id = threading.get_ident()
+        while self.enabled:
+            time.sleep(self.interval)
+            if self._active:
+                self._sample(own_id)
+        self.dump()
+
+    def _sample(self, own_id):
+        """Record the stack of every thread running a sampled route."""
+        codes = self._codes()
+        active = set(self._active)
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            route = None
+            while frame is not None:
+                code = frame.f_code
+                stack.append(code)
+                if code in codes:
+                    route = codes[code]
+                frame = frame.f_back
+            if route is None or route not in active:
+                continue
+            stack.reverse()
+            with self._lock:
+                self._stacks[route][tuple(stack)] += 1
+                self.samples += 1
+
+    def dump(self):
+        """
+        Write the stacks collected so far, one file per route, and reset.
+
+        Returns:
+            list: Paths of the profile files written.
+        """
+        with self._lock:
+            stacks, self._stacks = self._stacks, defaultdict(Counter)
+        if not stacks:
+            return []
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        paths = []
+        for route, counts in stacks.items():
+            name = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            path = os.path.join(
+                self.output_dir,
+                f"{name}.{os.getpid()}.{stamp}.{self.output_format}")
+            try:
+                if self.output_format == "pstats":
+                    self._write_pstats(path, counts)
+                else:
+                    self._write_collapsed(path, counts)
+            except OSError as e:
+                print(f"Error writing profile {path}: {e}")
+                continue
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def _frame_name(code):
+        """Return the name of a frame in a collapsed stack."""
+        return (f"{code.co_name} "
+                f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+
+    def _write_collapsed(self, path, counts):
+        """Write stacks as `frame;frame;frame count` lines."""
+        with open(path, "w") as profile:
+            for stack, count in counts.most_common():
+                frames = ";".join(self._frame_name(code) for code in stack)
+                profile.write(f"{frames} {count}\n")
+
+    def _write_pstats(self, path, counts):
+        """Write stacks in the format read by pstats.Stats."""
+        stats = {}
+
+        def function(code):
+            return (code.co_filename, code.co_firstlineno, code.co_name)
+
+        for stack, count in counts.items():
+            elapsed = count * self.interval
+            seen = set()
+            caller = None
+            for depth, code in enumerate(stack):
+                key = function(code)
+                leaf = depth == len(stack) - 1
+                entry = stats.setdefault(key, [0, 0, 0.0, 0.0, {}])
+                if key not in seen:
+                    # Recursive frames count once towards cumulative time.
+                    seen.add(key)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += elapsed
+                if leaf:
+                    entry[2] += elapsed
+                if caller is not None:
+                    nc, cc, tt, ct = entry[4].get(caller, (0, 0, 0.0, 0.0))
+                    entry[4][caller] = (nc + count, cc + count,
+                                        tt + (elapsed if leaf else 0.0),
+                                        ct + elapsed)
+                caller = key
+
+        with open(path, "wb") as profile:
+            marshal.dump({key: tuple(value) for key, value in stats.items()},
+                         profile)
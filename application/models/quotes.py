@@ -0,0 +1,282 @@
+"""Define the quotes module.
+
+This module contains the server-side price quoting engine. A quote
+prices an operator's whole product list in one currency in a single
+vectorized pass: retail amount, fee and total, converted with a cached
+FX table. Quotes are cached per (operator, currency), and the checkout
+charges the quoted total of the chosen product instead of trusting the
+amounts posted by the browser.
+
+NumPy is used when it is installed; otherwise the same arithmetic runs
+over plain lists.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - depends on the environment
+    numpy = None
+
+# Currency PayPal payments are created in.
+CHARGE_CURRENCY = "USD"
+
+
+class FxRates:
+    """Define FxRates class.
+
+    Units of each currency per US dollar, from FX_RATES (for example
+    "EUR=0.92,RWF=1300") and the JSON object in FX_RATES_FILE. The file
+    is re-read when it changes, at most every check_interval seconds;
+    every change bumps `version`, which invalidates cached quotes.
+    """
+
+    def __init__(self, rates=None, path=None, check_interval=60.0):
+        """Initialize the FxRates instance.
+
+        Args:
+            rates (dict, optional): Fixed rates; parsed from FX_RATES when
+                                    None.
+            path (str, optional): JSON file of rates, overriding the fixed
+                                  ones; FX_RATES_FILE when None.
+            check_interval (float): Seconds between checks of the file.
+        """
+        if rates is None:
+            rates = {}
+            for item in os.getenv("FX_RATES", "").split(","):
+                currency, _, rate = item.strip().partition("=")
+                if rate:
+                    rates[currency.upper()] = float(rate)
+        self.path = path if path is not None else os.getenv("FX_RATES_FILE")
+        self.check_interval = check_interval
+        self._fixed = rates
+        self._rates = {CHARGE_CURRENCY: 1.0, **rates}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def rates(self):
+        """Return the current rates, reloading the file if it changed."""
+        if self.path and \
+                time.monotonic() - self._checked_at >= self.check_interval:
+            with self._lock:
+                self._checked_at = time.monotonic()
+                try:
+                    mtime = os.path.getmtime(self.path)
+                    if mtime != self._mtime:
+                        with open(self.path) as rates_file:
+                            loaded = json.load(rates_file)
+                        self._rates = {
+                            CHARGE_CURRENCY: 1.0,
+                            **self._fixed,
+                            **{k.upper(): float(v) for k, v in loaded.items()}
+                        }
+                        self._mtime = mtime
+                        self.version += 1
+                except (OSError, ValueError, AttributeError) as e:
+                    print(f"Could not load FX rates: {e}")
+        return self._rates
+
+
+class Quote:
+    """Define Quote class.
+
+    Prices of one operator's products in one currency. The lists are
+    aligned with `products`; a price is None when it cannot be computed
+    (missing amount or unknown currency).
+    """
+
+    __slots__ = ("operator_id", "currency", "products", "retail", "fee",
+                 "total", "fx_version", "created_at", "_positions")
+
+    def __init__(self, operator_id, currency, products, retail, fee, total,
+                 fx_version):
+        """Initialize the Quote instance."""
+        self.operator_id = operator_id
+        self.currency = currency
+        self.products = products
+        self.retail = retail
+        self.fee = fee
+        self.total = total
+        self.fx_version = fx_version
+        self.created_at = time.monotonic()
+        self._positions = {
+            product.id: position for position, product in enumerate(products)
+        }
+
+    def __contains__(self, product_id):
+        """Return True if the quote lists a product."""
+        try:
+            return int(product_id) in self._positions
+        except (TypeError, ValueError):
+            return False
+
+    def price(self, product_id):
+        """
+        Return the quoted total of a product.
+
+        Args:
+            product_id (int or str): The product ID.
+
+        Returns:
+            float or None: The total, or None if the product is not in
+                           the quote or cannot be priced.
+        """
+        try:
+            position = self._positions.get(int(product_id))
+        except (TypeError, ValueError):
+            return None
+        return None if position is None else self.total[position]
+
+
+def _round_cents(values):
+    """Round amounts half up to two decimals; NaN becomes None."""
+    if numpy is not None:
+        rounded = numpy.floor(values * 100 + 0.5) / 100
+        return [None if math.isnan(v) else v for v in rounded.tolist()]
+    return [None if math.isnan(v) else math.floor(v * 100 + 0.5) / 100
+            for v in values]
+
+
+class QuoteEngine:
+    """Define QuoteEngine class.
+
+    Computes and caches quotes. Each quote is one pass over the columns
+    of the product list rather than a computation per product.
+    """
+
+    def __init__(self, fx=None, ttl=None, max_entries=1024):
+        """Initialize the QuoteEngine instance.
+
+        Args:
+            fx (FxRates, optional): The FX table; built from the
+                                    environment when None.
+            ttl (float, optional): Seconds a quote stays valid; QUOTE_TTL
+                                   when None.
+            max_entries (int): Maximum number of cached quotes.
+        """
+        self.fx = fx or FxRates()
+        self.ttl = ttl if ttl is not None else float(
+            os.getenv("QUOTE_TTL", "300"))
+        self.max_entries = max_entries
+        self.display_currencies = [
+            c.strip().upper()
+            for c in os.getenv("QUOTE_DISPLAY_CURRENCIES", "").split(",")
+            if c.strip() and c.strip().upper() != CHARGE_CURRENCY
+        ]
+        self._quotes = OrderedDict()
+        self._lock = threading.Lock()
+        self._missing_units = set()
+
+        # Counter for monitoring: products left unpriced for lack of a rate.
+        self.unpriced = 0
+
+    def quote(self, operator_id, products, currency=CHARGE_CURRENCY):
+        """
+        Return the quote of an operator's products in a currency.
+
+        Args:
+            operator_id (int): The operator ID, the first half of the
+                               cache key.
+            products (list): The operator's Product records, used when the
+                             cached quote is missing or expired.
+            currency (str): The currency of the quote.
+
+        Returns:
+            Quote: The cached or freshly computed quote.
+        """
+        key = (operator_id, currency)
+        rates = self.fx.rates()
+        with self._lock:
+            quote = self._quotes.get(key)
+            if quote is not None and quote.fx_version == self.fx.version \
+                    and time.monotonic() - quote.created_at < self.ttl:
+                self._quotes.move_to_end(key)
+                return quote
+
+        quote = self._compute(operator_id, products, currency, rates)
+        with self._lock:
+            self._quotes[key] = quote
+            self._quotes.move_to_end(key)
+            while len(self._quotes) > self.max_entries:
+                self._quotes.popitem(last=False)
+        return quote
+
+    def quotes(self, operator_id, products):
+        """Return the charge quote followed by the display quotes."""
+        return [self.quote(operator_id, products, currency)
+                for currency in [CHARGE_CURRENCY] + self.display_currencies
+                if currency in self.fx.rates()]
+
+    def price(self, operator_id, product_id, products):
+        """
+        Re-validate a product at checkout and return its charge total.
+
+        Args:
+            operator_id (int): The operator of the customer's number.
+            product_id (int or str): The product the customer chose.
+            products (list or None): The operator's current products, used
+                                     if the product is not in the cached
+                                     quote (for example a new catalog).
+
+        Returns:
+            float or None: The total in CHARGE_CURRENCY, or None if the
+                           product is not offered or cannot be priced.
+        """
+        if products is None:
+            return None
+        quote = self.quote(operator_id, products)
+        if product_id not in quote:
+            self.invalidate(operator_id)
+            quote = self.quote(operator_id, products)
+        return quote.price(product_id)
+
+    def invalidate(self, operator_id):
+        """Drop every cached quote of an operator."""
+        with self._lock:
+            for key in [k for k in self._quotes if k[0] == operator_id]:
+                del self._quotes[key]
+
+    def _compute(self, operator_id, products, currency, rates):
+        """Price a product list in one vectorized pass."""
+        nan = math.nan
+        target = rates.get(currency, nan)
+        retail = [nan if p.retail_amount is None else float(p.retail_amount)
+                  for p in products]
+        fee = [0.0 if p.retail_fee is None else float(p.retail_fee)
+               for p in products]
+        # Convert from each product's unit to the quote currency.
+        factor = [target / rates.get(p.retail_unit or CHARGE_CURRENCY, nan)
+                  for p in products]
+        if currency == CHARGE_CURRENCY:
+            self._check_units(products, rates)
+
+        if numpy is not None:
+            retail = numpy.array(retail) * numpy.array(factor)
+            fee = numpy.array(fee) * numpy.array(factor)
+            total = retail + fee
+        else:
+            retail = [r * f for r, f in zip(retail, factor)]
+            fee = [x * f for x, f in zip(fee, factor)]
+            total = [r + x for r, x in zip(retail, fee)]
+
+        return Quote(operator_id, currency, products, _round_cents(retail),
+                     _round_cents(fee), _round_cents(total), self.fx.version)
+
+    def _check_units(self, products, rates):
+        """Count products priced in a unit without a rate; warn once."""
+        missing = [p.retail_unit for p in products
+                   if p.retail_unit and p.retail_unit not in rates]
+        if not missing:
+            return
+        self.unpriced += len(missing)
+        for unit in set(missing) - self._missing_units:
+            self._missing_units.add(unit)
+            print(f"No FX rate for {unit}: products priced in {unit} are "
+                  f"not offered. Add it to FX_RATES or FX_RATES_FILE.")
@@ -0,0 +1,164 @@
+"""Define the rate limit module.
+
+This module contains token-bucket limiters for outbound calls to the
+top-up API, so that bursts of traffic stay under the provider's quota.
+A call that would exceed the quota waits for a token, up to a limit, and
+is shed beyond it instead of being answered with a 429 upstream.
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+
+class RateLimitedError(Exception):
+    """Raised when a call is shed because its endpoint is over quota."""
+
+
+class TokenBucket:
+    """Define TokenBucket class.
+
+    Holds up to `burst` tokens, refilled at `rate` tokens per second. A
+    caller reserves a token and is told how long to wait for it, so the
+    bucket itself never blocks and works for threads and coroutines.
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initialize the TokenBucket instance.
+
+        Args:
+            rate (float): Tokens added per second.
+            burst (float, optional): Bucket size; defaults to one
+                                     second's worth of tokens.
+        """
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """
+        Reserve a token.
+
+        Args:
+            max_wait (float): Longest acceptable wait in seconds.
+
+        Returns:
+            float or None: Seconds to wait before making the call, or None
+                           if the wait would be longer than max_wait (no
+                           token is taken then).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst,
+                               self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens may go negative: each one is a place in the queue.
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class RateLimiters:
+    """Define RateLimiters class.
+
+    One TokenBucket per endpoint. SERVICES_RATE_LIMIT sets the default
+    rate in calls per second (0 means unlimited), and SERVICES_RATE_LIMITS
+    overrides it per endpoint label, for example
+    "products=5,lookup/mobile-number=10".
+    Buckets are per process: with several gunicorn workers, divide the
+    provider's quota between them.
+    """
+
+    def __init__(self, default_rate=None, rates=None, max_wait=None):
+        """Initialize the registry.
+
+        Args:
+            default_rate (float, optional): Calls per second for endpoints
+                                            without their own rate.
+            rates (dict, optional): Calls per second by endpoint label.
+            max_wait (float, optional): Longest wait for a token before a
+                                        call is shed.
+        """
+        if default_rate is None:
+            default_rate = float(os.getenv("SERVICES_RATE_LIMIT", "0"))
+        if rates is None:
+            rates = {}
+            for item in os.getenv("SERVICES_RATE_LIMITS", "").split(","):
+                name, _, rate = item.strip().rpartition("=")
+                if name:
+                    rates[name] = float(rate)
+        if max_wait is None:
+            max_wait = float(os.getenv("SERVICES_RATE_MAX_WAIT", "2"))
+        self.default_rate = default_rate
+        self.rates = rates
+        self.max_wait = max_wait
+        self._buckets = {}
+        self._shed_at = {}
+        self._lock = threading.Lock()
+
+        # Counters for monitoring.
+        self.delayed = 0
+        self.shed = 0
+
+    def _bucket(self, name):
+        """Return the bucket of an endpoint, or None if it is unlimited."""
+        bucket = self._buckets.get(name)
+        if bucket is None and name not in self._buckets:
+            with self._lock:
+                if name not in self._buckets:
+                    rate = self.rates.get(name, self.default_rate)
+                    self._buckets[name] = TokenBucket(rate) if rate > 0 \
+                        else None
+                bucket = self._buckets[name]
+        return bucket
+
+    def _reserve(self, name):
+        """Return the wait for a token of an endpoint, or raise."""
+        bucket = self._bucket(name)
+        if bucket is None:
+            return 0.0
+        wait = bucket.reserve(self.max_wait)
+        if wait is None:
+            self.shed += 1
+            self._shed_at[name] = time.monotonic()
+            raise RateLimitedError(f"Rate limit reached for {name}")
+        if wait:
+            self.delayed += 1
+        return wait
+
+    def is_limited(self, name):
+        """Return True if a call to an endpoint was shed recently.
+
+        Recently means within max_wait seconds (at least one), so the
+        caller of a call that was just shed can tell why it failed.
+        """
+        shed_at = self._shed_at.get(name)
+        return (shed_at is not None
+                and time.monotonic() - shed_at <= max(self.max_wait, 1.0))
+
+    def acquire(self, name):
+        """
+        Wait for a token of an endpoint in the calling thread.
+
+        Raises:
+            RateLimitedError: If the wait would exceed max_wait.
+        """
+        wait = self._reserve(name)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, name):
+        """
+        Wait for a token of an endpoint without blocking the event loop.
+
+        Raises:
+            RateLimitedError: If the wait would exceed max_wait.
+        """
+        wait = self._reserve(name)
+        if wait:
+            await asyncio.sleep(wait)
@@ -0,0 +1,156 @@
+"""Define the reconciler module.
+
+This module contains a background service that follows submitted top-ups
+until DT One reports a final status, and records that status in the
+ledger. One loop polls every pending transaction in batches, instead of
+each customer refreshing their own page.
+"""
+
+import fcntl
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from application.models.ledger import FINAL_STATUSES, status_of
+
+
+class Reconciler:
+    """Define Reconciler class.
+
+    Pending transactions and their next check time live in the ledger,
+    so the work survives restarts and is shared by all gunicorn workers.
+    Only the worker holding the reconciler lock file polls.
+    """
+
+    def __init__(self, services, ledger, lock_path, batch_size=50,
+                 concurrency=4, min_interval=5.0, max_interval=600.0,
+                 max_age=86400.0, tick=1.0):
+        """Initialize the Reconciler instance.
+
+        Args:
+            services (GlobalServices): The service used to query DT One.
+            ledger (Ledger): The ledger holding pending transactions.
+            lock_path (str): Lock file electing the polling worker.
+            batch_size (int): Maximum transactions checked per batch.
+            concurrency (int): Maximum status requests in flight.
+            min_interval (float): Delay before the second check.
+            max_interval (float): Longest delay between two checks.
+            max_age (float): Seconds after which a transaction that is
+                             still not final is marked STUCK.
+            tick (float): Seconds between polls of the ledger.
+        """
+        self.services = services
+        self.ledger = ledger
+        self.lock_path = lock_path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_age = max_age
+        self.tick = tick
+        self._pid = None
+        self._lock_file = None
+        self._start_lock = threading.Lock()
+
+        # Grows while DT One fails or throttles us, shrinks on success.
+        self.slowdown = 1.0
+
+        # Counters for monitoring.
+        self.checks = 0
+        self.finalized = 0
+        self.stuck = 0
+        self.errors = 0
+
+    def start(self):
+        """Start the polling thread in the current process if needed."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="reconciler",
+                             daemon=True).start()
+
+    def _acquire_leadership(self):
+        """Try to become the only polling process on this host."""
+        if self._lock_file is not None:
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        """Poll due transactions forever."""
+        while True:
+            try:
+                if self._acquire_leadership():
+                    if self.run_once():
+                        continue  # More may be due; do not wait.
+            except Exception as e:
+                print(f"Reconciler error: {e}")
+            time.sleep(self.tick * self.slowdown)
+
+    def run_once(self):
+        """
+        Check one batch of due transactions.
+
+        Returns:
+            bool: True if a full batch was processed.
+        """
+        now = time.time()
+        due = self.ledger.due(now, limit=self.batch_size)
+        if not due:
+            return False
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            responses = list(pool.map(self._fetch, due))
+
+        updates = []
+        failures = 0
+        for transaction, response in zip(due, responses):
+            self.checks += 1
+            if response is None:
+                failures += 1
+                status = None
+            else:
+                status = status_of(response)
+            if status in FINAL_STATUSES:
+                self.finalized += 1
+                updates.append((transaction["trx_id"], status, None))
+            elif now - transaction["created_at"] > self.max_age:
+                self.stuck += 1
+                print(f"Transaction {transaction['trx_id']} is stuck in "
+                      f"{status or transaction['status']}.")
+                updates.append((transaction["trx_id"], "STUCK", None))
+            else:
+                updates.append((transaction["trx_id"], status,
+                                now + self._backoff(transaction["checks"])))
+        self.ledger.update_statuses(updates)
+
+        # Back off as a whole when most checks fail.
+        self.errors += failures
+        if failures > len(due) / 2:
+            self.slowdown = min(self.slowdown * 2, 60.0)
+        else:
+            self.slowdown = max(1.0, self.slowdown / 2)
+        return len(due) == self.batch_size
+
+    def _backoff(self, checks):
+        """Return the delay before the next check, with jitter."""
+        delay = min(self.max_interval, self.min_interval * 2 ** checks)
+        return delay * self.slowdown * random.uniform(0.8, 1.2)
+
+    def _fetch(self, transaction):
+        """Return the current state of a transaction from DT One."""
+        if not transaction["dtone_id"]:
+            return None
+        return self.services.get_transaction(transaction["dtone_id"])
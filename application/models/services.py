@@ -6,15 +6,29 @@ handling a couple of operations regarding the operations of the services.
 
 import os
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
-from dotenv import load_dotenv
+from urllib3.util.retry import Retry
+from application.models.catalog_cache import CatalogCache
+from application.models.catalog_snapshot import CatalogSnapshot, CatalogSync
+from application.models.prefix_index import PrefixIndex
+from application.models.product import Product
+from application.models.pager import iter_json_array, total_pages
+from application.models.circuit_breaker import CircuitBreaker, CircuitBreakers
+from application.models.circuit_breaker import CircuitOpenError
+from application.models.rate_limit import RateLimiters, RateLimitedError
+from application.models.single_flight import SingleFlight
+from application.models.phone_number import normalize, InvalidPhoneNumber
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import contextvars
+import threading
+from application.models.metrics import metrics, endpoint_label
 import json
+import sys
 import uuid
 import time
 
-# Load environment variables from the .env file
-load_dotenv()
-
 
 class GlobalServices:
     """Define GlobalServices class.
@@ -43,25 +57,204 @@ class GlobalServices:
         self.base_url = base_url.rstrip('/')
         self.auth = HTTPBasicAuth(username, password)
 
-    def _make_get_request(self, endpoint, params=None):
-        """Make a GET request to the specified endpoint."""
+        # Connect and read timeouts (seconds) for every upstream call.
+        self.timeout = (
+            float(os.getenv("SERVICES_CONNECT_TIMEOUT", "3.05")),
+            float(os.getenv("SERVICES_READ_TIMEOUT", "15"))
+        )
+        # The session is built on first use in each process, so a
+        # preloading gunicorn master never shares sockets with workers.
+        self._session_options = {
+            "pool_size": int(os.getenv("SERVICES_POOL_SIZE", "10")),
+            "max_retries": int(os.getenv("SERVICES_MAX_RETRIES", "2")),
+            "backoff_factor": float(
+                os.getenv("SERVICES_RETRY_BACKOFF", "0.3"))
+        }
+        self._session = None
+        self._session_pid = None
+        self._session_lock = threading.Lock()
+
+        # Fail fast on endpoints that keep failing or answering slowly.
+        self.breakers = CircuitBreakers()
+
+        # Stay under the provider's quota, and share identical calls
+        # that are already in flight.
+        self.rate_limiters = RateLimiters()
+        self.single_flight = SingleFlight()
+
+        # Send a second copy of a read-only call still running after this
+        # many seconds, and use whichever answers first (0 turns it off).
+        self.hedge_after = float(os.getenv("SERVICES_HEDGE_AFTER", "0"))
+        self._hedge_pool = None
+        self._hedge_pid = None
+        self._hedge_lock = threading.Lock()
+
+        # Page size and concurrency of paginated list endpoints.
+        self.page_size = int(os.getenv("SERVICES_PAGE_SIZE", "100"))
+        self.page_concurrency = int(
+            os.getenv("SERVICES_PAGE_CONCURRENCY", "4"))
+        self.lookup_per_page = int(
+            os.getenv("SERVICES_LOOKUP_PER_PAGE", "50"))
+
+        # Operator catalogs rarely change, so keep them in process.
+        self.catalog_cache = CatalogCache(
+            max_entries=int(os.getenv("CATALOG_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("CATALOG_CACHE_TTL", "3600")),
+            stale_ttl=float(os.getenv("CATALOG_CACHE_STALE_TTL", "21600"))
+        )
+
+        # Full catalog written by the sync job and shared by all workers.
+        self.catalog_snapshot = CatalogSnapshot(
+            os.getenv("CATALOG_SNAPSHOT_PATH",
+                      os.path.join("var", "catalog.snapshot")),
+            max_age=float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "86400")),
+            memo_size=int(os.getenv("CATALOG_SNAPSHOT_MEMO_SIZE", "64"))
+        )
+
+        # Operators of recently looked up numbers, by canonical number.
+        self.lookup_cache = CatalogCache(
+            max_entries=int(os.getenv("LOOKUP_CACHE_SIZE", "10000")),
+            ttl=float(os.getenv("LOOKUP_CACHE_TTL", "86400")),
+            stale_ttl=0
+        )
+
+        # Resolve most numbers to an operator locally by prefix.
+        self.prefix_index = PrefixIndex(
+            learn_length=int(os.getenv("PREFIX_LEARN_LENGTH", "6")),
+            min_prefix_length=int(os.getenv("PREFIX_MIN_LENGTH", "4")),
+            min_confirmations=int(os.getenv("PREFIX_MIN_CONFIRMATIONS", "2")),
+            max_conflicts=int(os.getenv("PREFIX_MAX_CONFLICTS", "0"))
+        )
+        prefix_seed_file = os.getenv("PREFIX_SEED_FILE")
+        if prefix_seed_file:
+            try:
+                self.prefix_index.load_seed(prefix_seed_file)
+            except (OSError, ValueError) as e:
+                print(f"Could not load prefix seed file: {e}")
+
+    @property
+    def session(self):
+        """Return the HTTP session of the current process."""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._session_lock:
+                if self._session is None or \
+                        self._session_pid != os.getpid():
+                    self._session = self._build_session(
+                        **self._session_options)
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _build_session(self, pool_size, max_retries, backoff_factor):
+        """Build the long-lived HTTP session used for all API calls.
+
+        The session keeps TCP/TLS connections to BASE_URL alive between
+        requests, so each gunicorn worker only pays the handshake once per
+        pooled connection instead of once per call.
+
+        Args:
+            pool_size (int): Maximum number of pooled connections kept
+                             open to the API host.
+            max_retries (int): How many times an idempotent GET is retried
+                               on connection errors or 5xx/429 responses.
+            backoff_factor (float): Exponential backoff factor between
+                                    retries.
+
+        Returns:
+            requests.Session: The configured session.
+        """
+        # Only GETs are retried; retrying a POST could credit a number twice.
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.auth = self.auth
+        session.headers.update({"Content-Type": "application/json"})
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _hedged(self, label, call, *args):
+        """
+        Run a read-only call, starting a second copy if it is slow.
+
+        Args:
+            label (str): The endpoint label of the call.
+            call (callable): Returns the result, or None on failure.
+            *args: Arguments for call.
+
+        Returns:
+            The first successful result, or None if both copies failed.
+        """
+        with self._hedge_lock:
+            if self._hedge_pool is None or self._hedge_pid != os.getpid():
+                self._hedge_pool = ThreadPoolExecutor(
+                    thread_name_prefix="hedge")
+                self._hedge_pid = os.getpid()
+        pool = self._hedge_pool
+
+        def submit():
+            # Keep the request's timing spans in the pool thread.
+            return pool.submit(contextvars.copy_context().run, call, *args)
+
+        first = submit()
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            pass
+        if self.breakers.get(label).state != CircuitBreaker.CLOSED:
+            return first.result()
+        metrics.inc("billhub_upstream_hedged_total", endpoint=label)
+        pending = {first, submit()}
+        result = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    return result
+        return result
+
+    def _make_get_request(self, endpoint, params=None, hedge=False):
+        """Make a GET request to the specified endpoint.
+
+        With hedge=True, a slow call is hedged (see SERVICES_HEDGE_AFTER).
+        """
         url = f"{self.base_url}/{endpoint}"
-        headers = {"Content-Type": "application/json"}
+        label = endpoint_label(endpoint)
+        if hedge and self.hedge_after > 0:
+            return self._hedged(label, self._make_get_request, endpoint,
+                                params)
 
         try:
-            response = requests.get(
-                url,
-                params=params,
-                headers=headers,
-                auth=self.auth
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            self.rate_limiters.acquire(label)
+            with self.breakers.guard(label), \
+                    metrics.timer("billhub_upstream_seconds", span=label,
+                                  endpoint=label, method="GET"):
+                response = self.session.get(
+                    url,
+                    params=params,
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json()
+        except (CircuitOpenError, RateLimitedError) as e:
+            print(f"{e}; failing fast.")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"Error occurred during GET request: {e}")
             return None
 
-    def _make_post_request(self, method, endpoint, payload=None):
+    def _make_post_request(self, method, endpoint, payload=None,
+                           hedge=False):
         """Authenticate requests.
 
         Makes an HTTP request to the specified endpoint with the given method,
@@ -71,27 +264,35 @@ class GlobalServices:
             method (str): The HTTP method ("GET", "POST", "PUT", "DELETE")
             endpoint (str): The endpoint URL.
             payload (dict, optional): The data to include in the request.
+            hedge (bool): Hedge a slow call; only for read-only calls.
 
         Returns:
             dict or None: The JSON response from the server,
                             or None if an error occurs.
         """
         url = f"{self.base_url}/{endpoint}"
-        headers = {
-            "Content-Type": "application/json"
-        }
+        label = endpoint_label(endpoint)
+        if hedge and self.hedge_after > 0:
+            return self._hedged(label, self._make_post_request, method,
+                                endpoint, payload)
 
         try:
-            response = requests.request(
-                method,
-                url,
-                json=payload,
-                headers=headers,
-                auth=self.auth
-                )
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            return response.json()
-        except requests.exceptions.RequestException as http_err:
+            self.rate_limiters.acquire(label)
+            with self.breakers.guard(label), \
+                    metrics.timer("billhub_upstream_seconds", span=label,
+                                  endpoint=label, method=method):
+                response = self.session.request(
+                    method,
+                    url,
+                    json=payload,
+                    timeout=self.timeout
+                    )
+                response.raise_for_status()  # Raise an exception for HTTP errors
+                return response.json()
+        except (CircuitOpenError, RateLimitedError) as e:
+            print(f"{e}; failing fast.")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as http_err:
             print(f"HTTP error occurred: {http_err}")
             return None
 
@@ -99,56 +300,237 @@ class GlobalServices:
         """
         Perform a lookup for the given mobile number using the Dtone API.
 
+        The number is validated and normalized locally first, so a
+        malformed number never reaches the API. Then the lookup cache and
+        the prefix index are consulted; the API is only called for unknown
+        or ported number ranges, and its answer is learned.
+
         Args:
             mobile_number (str): The mobile number to lookup.
 
         Returns:
-            Operator_id(int): The Operator ID that identifies the operator.
+            Operator_id(int): The Operator ID that identifies the operator,
+                              or None if the number is invalid.
+        """
+        mobile_number, operator_id = self._lookup_locally(mobile_number)
+        if mobile_number is None or operator_id is not None:
+            return operator_id
+
+        # Concurrent lookups of the same number share one API call.
+        return self.single_flight.do(
+            ("lookup", mobile_number),
+            self._lookup_upstream,
+            mobile_number
+        )
+
+    def _lookup_locally(self, mobile_number):
         """
+        Validate a number and resolve it without calling the API.
+
+        Args:
+            mobile_number (str): The mobile number as typed.
+
+        Returns:
+            tuple: The canonical number (None if it is invalid) and its
+                   operator ID (None if the API must be asked).
+        """
+        try:
+            mobile_number = normalize(mobile_number)
+        except InvalidPhoneNumber as e:
+            metrics.inc("billhub_prefix_lookups_total", result="invalid")
+            print(f"Invalid Number: {e}")
+            return None, None
+
+        operator_id, _ = self.lookup_cache.lookup(mobile_number)
+        if operator_id is None:
+            operator_id = self.prefix_index.lookup(mobile_number)
+        if operator_id is not None:
+            metrics.inc("billhub_prefix_lookups_total", result="local")
+        else:
+            metrics.inc("billhub_prefix_lookups_total", result="upstream")
+        return mobile_number, operator_id
+
+    def _lookup_upstream(self, mobile_number):
+        """Ask the API for the operator of a number and learn the result."""
+        operator_id = None
         endpoint = "lookup/mobile-number"
         payload = {
             "mobile_number": mobile_number,
             "page": 1,
-            "per_page": 50
+            "per_page": self.lookup_per_page
         }
         try:
-            result = self._make_post_request("POST", endpoint, payload)
-            print("Inside Try brock")
+            # The lookup has no side effects, so it may be hedged.
+            result = self._make_post_request("POST", endpoint, payload,
+                                             hedge=True)
             for item in result:
                 if item.get('identified'):
                     operator_id = item.get('id')
                     print("Operator ID:", operator_id)
+                    break
+            if operator_id is not None:
+                self.lookup_cache.set(mobile_number, operator_id)
+                self.prefix_index.learn(mobile_number, operator_id)
             return operator_id
         except Exception as e:
             print("Invalid Number")
+            return None
 
     def get_products(self, operator_id):
         """
         Retrieve products from the API, filtered by operator ID.
 
+        Catalogs are served from the shared catalog snapshot, then from
+        the in-process catalog cache, and only fetched from the API on a
+        miss or when an entry has expired.
+
         Args:
             operator_id (int): The operator ID to filter products.
 
         Returns:
-            list or None: A list of product objects, or None if an error occurs
+            list or None: A list of Product records, or None if an error occurs
         """
-        endpoint = "products"
-        params = {"operator_id": operator_id}
+        if operator_id is None:
+            return None
 
         try:
-            products = self._make_get_request(endpoint, params=params)
+            products = self.catalog_snapshot.get_products(operator_id)
             if products is not None:
-                if operator_id is not None:
-                    return products
-                else:
-                    return None
-            else:
-                print("No products received from the API.")
-                return None
+                return products
+            return self.catalog_cache.get(operator_id, self._fetch_products)
         except Exception as e:
             print(f"Error retrieving products: {e}")
             return None
 
+    def _fetch_products(self, operator_id):
+        """Fetch the products of one operator from the API.
+
+        Concurrent fetches of the same operator share one API call. If
+        the API fails or its circuit is open, an outdated catalog
+        snapshot is better than nothing and is served instead.
+        """
+        if self.hedge_after > 0:
+            products = self.single_flight.do(
+                ("products", operator_id), self._hedged, "products",
+                self._list_products, operator_id)
+        else:
+            products = self.single_flight.do(
+                ("products", operator_id), self._list_products, operator_id)
+        if products is None:
+            products = self.catalog_snapshot.get_products(operator_id,
+                                                          stale_ok=True)
+        return products
+
+    def _list_products(self, operator_id):
+        """List the products of one operator, or None on failure."""
+        try:
+            return list(self.iter_products(operator_id))
+        except (CircuitOpenError, RateLimitedError) as e:
+            print(f"{e}; failing fast.")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"No products received from the API: {e}")
+            return None
+
+    def iter_products(self, operator_id=None, per_page=None,
+                      concurrency=None):
+        """
+        Yield products from the API, page by page.
+
+        The first page is parsed while it downloads, and up to
+        `concurrency` of the following pages are fetched at the same time
+        while earlier ones are consumed. Products are yielded in API order
+        and only the pages in flight are held in memory.
+
+        Args:
+            operator_id (int, optional): Only list this operator's products;
+                                         all products when None.
+            per_page (int, optional): Number of products per page.
+            concurrency (int, optional): Maximum number of pages fetched
+                                         at once.
+
+        Yields:
+            Product: The products, in API order.
+
+        Raises:
+            requests.exceptions.RequestException: If a page cannot be
+                                                  fetched.
+            ValueError: If a page is not a JSON array.
+            CircuitOpenError: If the products circuit is open.
+            RateLimitedError: If the products rate limit is exceeded.
+        """
+        per_page = per_page or self.page_size
+        concurrency = concurrency or self.page_concurrency
+        params = {"per_page": per_page}
+        if operator_id is not None:
+            params["operator_id"] = operator_id
+
+        response = self._open_page("products", params, 1)
+        pages = total_pages(response.headers)
+        count = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            # Start on the next pages while the first one is parsed.
+            pending = []
+            next_page = 2
+            while pages is not None and next_page <= pages \
+                    and len(pending) < concurrency:
+                pending.append(pool.submit(self._fetch_page, "products",
+                                           params, next_page))
+                next_page += 1
+            try:
+                for item in self._read_page(response):
+                    count += 1
+                    yield Product.from_api(item)
+
+                if pages is None:
+                    # Without a page count, read on until a short page.
+                    page = 1
+                    while count == page * per_page:
+                        page += 1
+                        for product in self._fetch_page("products", params,
+                                                        page):
+                            count += 1
+                            yield product
+                    return
+
+                while pending:
+                    products = pending.pop(0).result()
+                    if next_page <= pages:
+                        pending.append(pool.submit(
+                            self._fetch_page, "products", params, next_page))
+                        next_page += 1
+                    yield from products
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _open_page(self, endpoint, params, page):
+        """Request one page of a list endpoint without reading its body."""
+        label = endpoint_label(endpoint)
+        self.rate_limiters.acquire(label)
+        with self.breakers.guard(label), \
+                metrics.timer("billhub_upstream_seconds", span=label,
+                              endpoint=label, method="GET"):
+            response = self.session.get(
+                f"{self.base_url}/{endpoint}",
+                params={**params, "page": page},
+                timeout=self.timeout,
+                stream=True
+            )
+            response.raise_for_status()
+        return response
+
+    @staticmethod
+    def _read_page(response):
+        """Yield the items of a page while its body downloads."""
+        with response:
+            yield from iter_json_array(response.iter_content(65536))
+
+    def _fetch_page(self, endpoint, params, page):
+        """Fetch one page of products and project it in one pass."""
+        response = self._open_page(endpoint, params, page)
+        return [Product.from_api(item) for item in self._read_page(response)]
+
     def create_transaction(self, mobile_number, trx_id, product_id):
         """Create a transaction."""
         endpoint = "async/transactions"
@@ -167,6 +549,18 @@ class GlobalServices:
             print("Create transaction failed:", e)
             return None
 
+    def get_transaction(self, transaction_id):
+        """
+        Retrieve the current state of a transaction.
+
+        Args:
+            transaction_id (int): The DT One transaction ID.
+
+        Returns:
+            dict or None: The transaction, or None if an error occurs.
+        """
+        return self._make_get_request(f"transactions/{transaction_id}")
+
     def generate_transaction_id(self):
         """Generate a unique transaction ID."""
         # Generate a UUID to ensure uniqueness
@@ -181,8 +575,123 @@ class GlobalServices:
         return transaction_id
 
 
+def bulk_main(argv):
+    """Run a bulk top-up from a CSV or JSONL file.
+
+    Usage: python -m application.models.services bulk FILE [--concurrency N]
+    """
+    import argparse
+    from application.models.bulk import BulkTopUp
+
+    parser = argparse.ArgumentParser(
+        prog="python -m application.models.services bulk",
+        description="Credit every (msisdn, product_id) row of a file."
+    )
+    parser.add_argument("file", help="CSV or JSONL file, '-' for stdin")
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=int(os.getenv("BULK_CONCURRENCY", "8")),
+        help="maximum number of numbers processed at once"
+    )
+    args = parser.parse_args(argv)
+
+    if args.file == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.file) as bulk_file:
+            text = bulk_file.read()
+
+    bulk = BulkTopUp(GlobalServices(), concurrency=args.concurrency)
+    failed = 0
+    for result in bulk.run(BulkTopUp.parse_rows(text)):
+        failed += result["status"] == "failed"
+        print(json.dumps(result), flush=True)
+    return 1 if failed else 0
+
+
+def sync_catalog_main(argv):
+    """Write the catalog snapshot from the full products listing.
+
+    Usage: python -m application.models.services sync-catalog [--path P]
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m application.models.services sync-catalog",
+        description="Write the shared catalog snapshot file."
+    )
+    parser.add_argument(
+        "--path",
+        default=os.getenv("CATALOG_SNAPSHOT_PATH",
+                          os.path.join("var", "catalog.snapshot")),
+        help="snapshot file to write"
+    )
+    args = parser.parse_args(argv)
+
+    count = CatalogSync(GlobalServices(), args.path).sync()
+    if count is None:
+        return 1
+    print(f"Wrote {count} products to {args.path}")
+    return 0
+
+
+def prefix_seed_main(argv):
+    """Write a prefix seed file from the lookups of a list of numbers.
+
+    Prefixes already in PREFIX_SEED_FILE are kept; a learned prefix is
+    only written once it has been confirmed PREFIX_MIN_CONFIRMATIONS
+    times without conflict.
+
+    Usage: python -m application.models.services prefix-seed FILE
+           [--output P]
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m application.models.services prefix-seed",
+        description="Look numbers up and write their trusted prefixes."
+    )
+    parser.add_argument("file",
+                        help="file with one number per line, '-' for stdin")
+    parser.add_argument(
+        "--output",
+        default=os.getenv("PREFIX_SEED_FILE",
+                          os.path.join("var", "prefixes.json")),
+        help="JSON seed file to write"
+    )
+    args = parser.parse_args(argv)
+
+    if args.file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.file) as numbers_file:
+            lines = numbers_file.read().splitlines()
+
+    services = GlobalServices()
+    for line in lines:
+        number = line.split(",")[0].strip()
+        if number and not number.startswith("#"):
+            services.lookup_mobile_number(number)
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = services.prefix_index.dump(args.output)
+    print(f"Wrote {count} prefixes to {args.output}")
+    return 0
+
+
 # Example usage:
 if __name__ == "__main__":
+    from application.models.config import load_config
+    load_config()
+
+    if len(sys.argv) > 1 and sys.argv[1] == "bulk":
+        sys.exit(bulk_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "sync-catalog":
+        sys.exit(sync_catalog_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "prefix-seed":
+        sys.exit(prefix_seed_main(sys.argv[2:]))
+
     global_services = GlobalServices()
 
     mobile_number = input("Enter the mobile number to lookup: ")
@@ -198,22 +707,12 @@ if __name__ == "__main__":
     print(type(products))
 
     for product in products:
-        if product['prices']['retail'] is not None:
-            retail_amount = product['prices']['retail']['amount']
-            fee = product['prices']['retail']['fee']
-            unit = product['prices']['retail']['unit']
-        else:
-            retail_amount = None
-            fee = None
-
-        destination_amount = product['destination']['amount']
-        destination_currency = product['destination']['unit']
-        product_id = product['id']
         print(
-            f"Retail amount: {retail_amount} {unit}, "
-            f"Fee: {fee} {unit}, "
-            f"Destination amount: {destination_amount} {destination_currency},"
-            f"Product_id : {product_id}")
+            f"Retail amount: {product.retail_amount} {product.retail_unit}, "
+            f"Fee: {product.retail_fee} {product.retail_unit}, "
+            f"Destination amount: {product.destination_amount} "
+            f"{product.destination_unit},"
+            f"Product_id : {product.id}")
     print()
     print()
     trx_id = global_services.generate_transaction_id()
@@ -0,0 +1,236 @@
+"""Define the session store module.
+
+This module contains server-side session backends for Flask. The session
+cookie only carries an opaque session ID; the session data itself lives
+in process memory or in an SQLite database shared by all gunicorn workers.
+"""
+
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from flask.sessions import session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+
+def encode_session(data):
+    """Serialize session data to compact, compressed bytes."""
+    return zlib.compress(session_json_serializer.dumps(dict(data)).encode())
+
+
+def decode_session(blob):
+    """Deserialize bytes produced by encode_session."""
+    return session_json_serializer.loads(zlib.decompress(blob).decode())
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """A session whose data is kept on the server."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        """Initialize the session with its ID and initial data."""
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class MemorySessionStore:
+    """Define MemorySessionStore class.
+
+    An in-process LRU of encoded sessions with expiry. Only suitable when
+    a single process serves the application.
+    """
+
+    def __init__(self, max_entries=10000):
+        """Initialize the store with its maximum number of sessions."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        """Return the encoded session for sid, or None if missing/expired."""
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            expires, blob = entry
+            if expires < time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return blob
+
+    def save(self, sid, blob, expires):
+        """Store an encoded session until the expires timestamp."""
+        with self._lock:
+            self._entries[sid] = (expires, blob)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, sid):
+        """Remove a session."""
+        with self._lock:
+            self._entries.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Define SQLiteSessionStore class.
+
+    Sessions are stored in an SQLite database in WAL mode, so that every
+    gunicorn worker on the host sees the same sessions.
+    """
+
+    def __init__(self, path, cleanup_every=500):
+        """Initialize the store.
+
+        Args:
+            path (str): Path to the SQLite database file.
+            cleanup_every (int): Number of writes between purges of
+                                 expired sessions.
+        """
+        self.path = path
+        self.cleanup_every = cleanup_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "sid TEXT PRIMARY KEY, expires REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires)"
+        )
+
+    def _connection(self):
+        """Return the SQLite connection of the current thread and process."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        """Return the encoded session for sid, or None if missing/expired."""
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires >= ?",
+            (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, blob, expires):
+        """Store an encoded session until the expires timestamp."""
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (sid, expires, data) "
+            "VALUES (?, ?, ?)",
+            (sid, expires, blob)
+        )
+        self._writes += 1
+        if self._writes % self.cleanup_every == 0:
+            conn.execute("DELETE FROM sessions WHERE expires < ?",
+                         (time.time(),))
+
+    def delete(self, sid):
+        """Remove a session."""
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?",
+                                   (sid,))
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Define ServerSideSessionInterface class.
+
+    A Flask session interface that keeps session data in a store and only
+    sends an opaque, random session ID to the browser.
+    """
+
+    def __init__(self, store, ttl=3600):
+        """Initialize the interface.
+
+        Args:
+            store: A MemorySessionStore or SQLiteSessionStore.
+            ttl (int): Seconds a session is kept after its last change.
+        """
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        """Load the session referenced by the request cookie."""
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            blob = self.store.load(sid)
+            if blob is not None:
+                try:
+                    return ServerSession(decode_session(blob), sid=sid)
+                except (ValueError, zlib.error):
+                    pass
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        """Persist the session and set the session ID cookie."""
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified:
+            return
+
+        self.store.save(session.sid, encode_session(session),
+                        time.time() + self.ttl)
+        if session.new or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+        response.vary.add("Cookie")
+
+
+def create_session_interface():
+    """Build the session interface selected by the environment.
+
+    SESSION_BACKEND is `sqlite` (default, shared across workers),
+    `memory` (single process) or `cookie` (Flask's signed cookie).
+
+    Returns:
+        SessionInterface or None: None keeps Flask's default sessions.
+    """
+    backend = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    ttl = int(os.getenv("SESSION_TTL", "3600"))
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        store = MemorySessionStore(
+            max_entries=int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+        )
+    else:
+        store = SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", os.path.join("var", "sessions.db"))
+        )
+    return ServerSideSessionInterface(store, ttl=ttl)
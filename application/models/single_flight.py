@@ -0,0 +1,90 @@
+"""Define the single flight module.
+
+This module contains helpers that coalesce concurrent identical calls:
+while a call for a key is in flight, other callers for the same key wait
+for its result instead of making their own upstream request.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Define SingleFlight class.
+
+    Coalesces calls made from several threads.
+    """
+
+    def __init__(self):
+        """Initialize the SingleFlight instance."""
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, call, *args):
+        """
+        Run call(*args), or wait for the identical call already running.
+
+        Args:
+            key: Identifies identical calls.
+            call (callable): The call to make.
+            *args: Arguments for call.
+
+        Returns:
+            The result of the call, shared by every caller of the key.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = call(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class AsyncSingleFlight:
+    """Define AsyncSingleFlight class.
+
+    Coalesces coroutine calls made on one event loop.
+    """
+
+    def __init__(self):
+        """Initialize the AsyncSingleFlight instance."""
+        self._tasks = {}
+        self.shared = 0
+
+    async def do(self, key, call):
+        """
+        Await call(), or the identical call already running.
+
+        Args:
+            key: Identifies identical calls.
+            call (callable): Returns the coroutine to run.
+
+        Returns:
+            The result of the call, shared by every caller of the key.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # A cancelled caller must not cancel the call shared with others.
+        return await asyncio.shield(task)
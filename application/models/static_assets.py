@@ -0,0 +1,90 @@
+"""Define the static assets module.
+
+This module fingerprints static files with a hash of their content.
+URLs built with url_for('static', ...) carry the hash, so a fingerprinted
+file can be cached by browsers for a year: a new version of the file gets
+a new URL.
+"""
+
+import hashlib
+import os
+import threading
+
+
+class StaticAssets:
+    """Define StaticAssets class.
+
+    Content hashes of the files in a static folder. A hash is computed on
+    first use and again only when the file's size or mtime changes.
+    """
+
+    # Cache lifetime of fingerprinted files.
+    IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self, folder):
+        """Initialize the StaticAssets instance.
+
+        Args:
+            folder (str): The static folder of the application.
+        """
+        self.folder = folder
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, filename):
+        """
+        Return the content hash of a static file.
+
+        Args:
+            filename (str): The file path relative to the static folder.
+
+        Returns:
+            str or None: A short hex digest, or None if the file is missing.
+        """
+        path = os.path.join(self.folder, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        identity = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(filename)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as static_file:
+            for block in iter(lambda: static_file.read(65536), b""):
+                digest.update(block)
+        fingerprint = digest.hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (identity, fingerprint)
+        return fingerprint
+
+    def url_defaults(self, endpoint, values):
+        """Add the fingerprint to URLs of static files (url_defaults hook)."""
+        if endpoint != "static" or "filename" not in values or "v" in values:
+            return
+        fingerprint = self.fingerprint(values["filename"])
+        if fingerprint is not None:
+            values["v"] = fingerprint
+
+    def cache_response(self, filename, fingerprint, response):
+        """
+        Let browsers keep a static file for a year if its URL is current.
+
+        Args:
+            filename (str): The requested file.
+            fingerprint (str or None): The `v` argument of the request.
+            response (flask.Response): The static file response.
+
+        Returns:
+            flask.Response: The response, with long-lived cache headers if
+                            the fingerprint matches the file's content.
+        """
+        if fingerprint and response.status_code in (200, 304) and \
+                fingerprint == self.fingerprint(filename):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = self.IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
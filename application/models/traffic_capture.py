@@ -0,0 +1,170 @@
+"""Define the traffic capture module.
+
+This module records the requests of the purchase flow as JSON lines, so
+that production traffic can be replayed offline (see tests/replay.py).
+Phone numbers, emails, PayPal IDs and session IDs are replaced with
+keyed pseudonyms: the same value always maps to the same pseudonym
+within a capture, so each user's sequence of requests stays intact.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from application.models.phone_number import parse, InvalidPhoneNumber
+
+
+class TrafficCapture:
+    """Define TrafficCapture class.
+
+    Off unless CAPTURE_PATH is set. Whole user sessions are sampled
+    (CAPTURE_SAMPLE_RATE), never single requests, and every worker
+    appends to the same file with O_APPEND, one write per line.
+    """
+
+    # Routes of the purchase flow.
+    DEFAULT_ROUTES = ("/buy_global_airtime", "/create_transaction",
+                      "/execute_payment")
+
+    # Request fields replaced with pseudonyms, and their kind.
+    PRIVATE_FIELDS = {
+        "Phone_number": "phone",
+        "Email": "email",
+        "paymentId": "PAY",
+        "PayerID": "PAYER",
+        "token": "EC",
+        "customer_msisdn": "phone"
+    }
+
+    def __init__(self, path=None, salt=None, routes=None, sample_rate=None):
+        """Initialize the TrafficCapture instance.
+
+        Args:
+            path (str, optional): The JSONL file; CAPTURE_PATH when None.
+                                  Capture is off without a path.
+            salt (str, optional): Key of the pseudonyms; CAPTURE_SALT
+                                  when None. Set it when running several
+                                  workers, or each gets its own random key
+                                  and a user's requests would not match
+                                  up across workers.
+            routes (iterable, optional): URL rules to capture;
+                                         CAPTURE_ROUTES (comma-separated)
+                                         or the purchase flow when None.
+            sample_rate (float, optional): Fraction of sessions captured;
+                                           CAPTURE_SAMPLE_RATE when None.
+        """
+        self.path = path if path is not None else os.getenv("CAPTURE_PATH")
+        salt = salt or os.getenv("CAPTURE_SALT") or os.urandom(16).hex()
+        self._key = salt.encode()
+        if routes is None:
+            routes = [r for r in os.getenv("CAPTURE_ROUTES", "").split(",")
+                      if r] or self.DEFAULT_ROUTES
+        self.routes = frozenset(routes)
+        self.sample_rate = sample_rate if sample_rate is not None else float(
+            os.getenv("CAPTURE_SAMPLE_RATE", "1"))
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring.
+        self.captured = 0
+
+    @property
+    def enabled(self):
+        """Return True if requests are being captured."""
+        return bool(self.path)
+
+    def _digest(self, kind, value):
+        """Return a keyed hash of a value, as hex."""
+        return hmac.new(self._key, f"{kind}:{value}".encode(),
+                        hashlib.sha256).hexdigest()
+
+    def pseudonym(self, kind, value):
+        """
+        Return the pseudonym of a private value.
+
+        Phone numbers keep their calling code, their first two national
+        digits (the operator prefix) and their length, so that replayed
+        numbers resolve to the same kind of operator; the other digits
+        come from the keyed hash.
+
+        Args:
+            kind (str): The kind of value (see PRIVATE_FIELDS).
+            value (str): The value.
+
+        Returns:
+            str: The pseudonym.
+        """
+        if not value:
+            return value
+        digest = self._digest(kind, value)
+        if kind == "phone":
+            try:
+                country_code, national = parse(value)
+            except InvalidPhoneNumber:
+                return f"invalid-{digest[:12]}"
+            digits = str(int(digest, 16))
+            fake = national[:2] + digits[:max(0, len(national) - 2)]
+            return f"+{country_code or ''}{fake}"
+        if kind == "email":
+            return f"user-{digest[:12]}@example.invalid"
+        return f"{kind}-{digest[:20]}"
+
+    def _anonymize(self, fields):
+        """Return request fields with private values replaced."""
+        return {
+            name: (self.pseudonym(self.PRIVATE_FIELDS[name], value)
+                   if name in self.PRIVATE_FIELDS else value)
+            for name, value in fields.items()
+        }
+
+    def record(self, request, response, session_id, elapsed):
+        """
+        Capture one request if it belongs to a captured route and session.
+
+        Args:
+            request (flask.Request): The request.
+            response (flask.Response): Its response.
+            session_id (str or None): Identifies the user's session.
+            elapsed (float): Seconds the request took.
+        """
+        rule = request.url_rule.rule if request.url_rule else None
+        if rule not in self.routes or not session_id:
+            return
+        user = self._digest("session", session_id)[:16]
+        if self.sample_rate < 1 and \
+                int(user[:8], 16) / 0xFFFFFFFF >= self.sample_rate:
+            return
+
+        entry = {
+            # When the request started, for replay with the same timing.
+            "ts": round(time.time() - elapsed, 6),
+            "user": user,
+            "method": request.method,
+            "route": rule,
+            "args": self._anonymize(request.args.to_dict()),
+            "form": self._anonymize(request.form.to_dict()),
+            "status": response.status_code,
+            "elapsed_ms": round(elapsed * 1000, 3)
+        }
+        self._write(entry)
+
+    def _write(self, entry):
+        """Append one JSON line to the capture file."""
+        line = (json.dumps(entry, separators=(",", ":")) + "\n").encode()
+        try:
+            with self._lock:
+                if self._fd is None or self._pid != os.getpid():
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._fd = os.open(
+                        self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                        0o600)
+                    self._pid = os.getpid()
+                os.write(self._fd, line)
+                self.captured += 1
+        except OSError as e:
+            print(f"Error writing traffic capture: {e}")
@@ -0,0 +1,33 @@
+"""Gunicorn settings for BillHub.
+
+The application is preloaded in the master: templates and the catalog
+snapshot are loaded once and shared copy-on-write by every worker, and
+workers start in milliseconds. Connections and background threads are
+only opened in the workers, after the fork.
+"""
+
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1").lower() not in ("0", "false")
+
+
+def when_ready(server):
+    """Load shared data in the master before the first fork."""
+    if preload_app:
+        server.app.wsgi().preload_shared_data()
+        # Keep the preloaded objects out of the collector, so collections
+        # in the workers do not touch (and copy) their pages.
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """Start the worker's background threads."""
+    server.app.wsgi().start_background_tasks()
+
+
+def post_worker_init(worker):
+    """Let the worker's profiler be toggled by PROFILER_SIGNAL."""
+    worker.wsgi.profiler.install_signal_handler()
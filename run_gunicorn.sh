@@ -1,2 +1,2 @@
-# Run gunicorn in the background. 
-gunicorn -w 2 -b 0.0.0.0:8000 -D app:app
+# Run gunicorn in the background (settings in gunicorn.conf.py).
+gunicorn -c gunicorn.conf.py -D app:app
@@ -0,0 +1,281 @@
+"""Benchmark the purchase flow against local fake upstream servers.
+
+Starts the fake DT One and PayPal servers from tests/fakes.py, serves the
+application on a local threaded WSGI server and drives
+/buy_global_airtime, /create_transaction and /execute_payment with an
+increasing number of concurrent virtual users. For every concurrency
+level it reports p50/p95/p99 latency and requests per second per route,
+and exits non-zero when a threshold or the saved baseline is exceeded.
+
+Usage:
+    python -m tests.benchmark --levels 1,4,16 --iterations 25 \\
+        --upstream-latency-ms 40 --max-p95-ms 500 --baseline bench.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from tests.fakes import FakeDTOneServer, FakePayPalServer, FaultConfig
+from tests.fakes import start
+
+ROUTES = ("/buy_global_airtime", "/create_transaction", "/execute_payment")
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank percentile of a sorted list of samples."""
+    if not samples:
+        return 0.0
+    # The rank is ceil(fraction * n); the epsilon absorbs float error
+    # such as 0.07 * 100 == 7.000000000000001.
+    rank = math.ceil(fraction * len(samples) - 1e-9)
+    index = max(0, min(len(samples) - 1, rank - 1))
+    return samples[index]
+
+
+def start_app(dtone, paypal, workdir):
+    """Point the application at the fakes and serve it locally.
+
+    Returns:
+        tuple: The application's base URL and the WSGI server.
+    """
+    os.environ.update({
+        "BASE_URL": dtone.url,
+        "services_username": "bench",
+        "services_password": "bench",
+        "PAYPAL_MODE": "sandbox",
+        "PAYPAL_CLIENT_ID": "bench",
+        "PAYPAL_CLIENT_SECRET": "bench",
+        "PAYPAL_ENDPOINT": paypal.url,
+        "SESSION_DB_PATH": os.path.join(workdir, "sessions.db"),
+        "FULFILLMENT_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "LEDGER_DB_PATH": os.path.join(workdir, "ledger.db"),
+        "PAYMENT_RESULTS_DB_PATH": os.path.join(workdir, "payments.db"),
+        "CATALOG_SNAPSHOT_PATH": os.path.join(workdir, "catalog.snapshot"),
+    })
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def purchase(base_url, rng, timings, errors, poll_timeout=30.0):
+    """Run one complete purchase as a new user and record route latency."""
+    session = requests.Session()
+
+    def timed(route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path,
+                                       allow_redirects=False, timeout=60,
+                                       **kwargs)
+        except requests.RequestException:
+            errors[route] += 1
+            return None
+        timings[route].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            errors[route] += 1
+            return None
+        return response
+
+    number = f"2507{rng.randint(20, 99)}{rng.randint(100000, 999999)}"
+    response = timed(ROUTES[0], "POST", ROUTES[0],
+                     data={"Phone_number": number})
+    if response is None:
+        return False
+    operator_id = FakeDTOneServer.operator_for(number)
+    product_id = operator_id * 1000 + rng.randint(1, 5)
+
+    response = timed(ROUTES[1], "POST", ROUTES[1], data={
+        "product_id": product_id,
+        "retail_price": "1.5",
+        "transaction_fee": "",
+        "destination_amount": "500"
+    })
+    if response is None or "Location" not in response.headers:
+        return False
+    payment_id = parse_qs(urlparse(
+        response.headers["Location"]).query).get("paymentId", [""])[0]
+
+    response = timed(ROUTES[2], "GET",
+                     f"{ROUTES[2]}?paymentId={payment_id}&PayerID=BENCH")
+    if response is None:
+        return False
+
+    # With the fulfillment queue, wait for the job like the status page.
+    marker = "/job_status/"
+    if marker in response.text:
+        job_id = response.text.split(marker, 1)[1].split('"', 1)[0]
+        deadline = time.monotonic() + poll_timeout
+        while time.monotonic() < deadline:
+            status = session.get(f"{base_url}{marker}{job_id}",
+                                 timeout=10).json().get("status")
+            if status == "done":
+                return True
+            if status == "failed":
+                errors["fulfillment"] += 1
+                return False
+            time.sleep(0.05)
+        errors["fulfillment"] += 1
+        return False
+    return True
+
+
+def run_level(base_url, users, iterations, seed):
+    """Run users * iterations purchases with `users` running at once."""
+    timings = {route: [] for route in ROUTES}
+    errors = {route: 0 for route in ROUTES}
+    errors["fulfillment"] = 0
+    lock = threading.Lock()
+
+    def user(index):
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(iterations):
+            local_timings = {route: [] for route in ROUTES}
+            local_errors = dict.fromkeys(errors, 0)
+            purchase(base_url, rng, local_timings, local_errors)
+            with lock:
+                for route in ROUTES:
+                    timings[route].extend(local_timings[route])
+                for key, count in local_errors.items():
+                    errors[key] += count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    elapsed = time.perf_counter() - started
+
+    report = {"users": users, "elapsed": elapsed, "routes": {}}
+    for route in ROUTES:
+        samples = sorted(timings[route])
+        report["routes"][route] = {
+            "requests": len(samples),
+            "errors": errors[route],
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(samples, 0.50) * 1000,
+            "p95_ms": percentile(samples, 0.95) * 1000,
+            "p99_ms": percentile(samples, 0.99) * 1000,
+        }
+    report["fulfillment_errors"] = errors["fulfillment"]
+    return report
+
+
+def print_report(report):
+    """Print one concurrency level as a table."""
+    print(f"\nconcurrency={report['users']} "
+          f"elapsed={report['elapsed']:.2f}s "
+          f"fulfillment_errors={report['fulfillment_errors']}")
+    print(f"{'route':<22}{'reqs':>7}{'errs':>6}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<22}{stats['requests']:>7}{stats['errors']:>6}"
+              f"{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}")
+
+
+def check(reports, args, baseline):
+    """Return the list of threshold and baseline violations."""
+    failures = []
+    for report in reports:
+        level = str(report["users"])
+        for route, stats in report["routes"].items():
+            error_rate = min(1.0, stats["errors"] / max(stats["requests"], 1))
+            if args.max_error_rate is not None \
+                    and error_rate > args.max_error_rate:
+                failures.append(f"c={level} {route}: error rate "
+                                f"{error_rate:.3f} > {args.max_error_rate}")
+            if args.max_p95_ms is not None \
+                    and stats["p95_ms"] > args.max_p95_ms:
+                failures.append(f"c={level} {route}: p95 "
+                                f"{stats['p95_ms']:.1f}ms > {args.max_p95_ms}ms")
+            previous = baseline.get(level, {}).get(route)
+            if previous:
+                limit = previous["p95_ms"] * (1 + args.tolerance)
+                if stats["p95_ms"] > limit:
+                    failures.append(
+                        f"c={level} {route}: p95 {stats['p95_ms']:.1f}ms "
+                        f"regressed from {previous['p95_ms']:.1f}ms")
+                floor = previous["rps"] * (1 - args.tolerance)
+                if stats["rps"] < floor:
+                    failures.append(
+                        f"c={level} {route}: {stats['rps']:.1f} req/s "
+                        f"regressed from {previous['rps']:.1f} req/s")
+    return failures
+
+
+def main(argv=None):
+    """Run the benchmark and return the process exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--levels", default="1,4,16",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=20,
+                        help="purchases per virtual user and level")
+    parser.add_argument("--upstream-latency-ms", type=float, default=30.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--paypal-latency-ms", type=float, default=50.0)
+    parser.add_argument("--paypal-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-p95-ms", type=float, default=None,
+                        help="fail if any route's p95 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="fail if any route's error rate exceeds this")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed regression against the baseline")
+    parser.add_argument("--save-baseline", default=None,
+                        help="write this run's results to a JSON file")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    dtone = start(FakeDTOneServer(FaultConfig(
+        args.upstream_latency_ms, args.upstream_jitter_ms,
+        args.upstream_error_rate, seed=args.seed)))
+    paypal = start(FakePayPalServer(FaultConfig(
+        args.paypal_latency_ms, 0, args.paypal_error_rate, seed=args.seed)))
+    workdir = tempfile.mkdtemp(prefix="billhub-bench-")
+    base_url, server = start_app(dtone, paypal, workdir)
+
+    reports = []
+    for users in (int(level) for level in args.levels.split(",")):
+        report = run_level(base_url, users, args.iterations, args.seed)
+        print_report(report)
+        reports.append(report)
+    server.shutdown()
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as baseline_file:
+            json.dump({str(r["users"]): r["routes"] for r in reports},
+                      baseline_file, indent=2)
+
+    failures = check(reports, args, baseline)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print(f"\nupstream requests={dtone.requests} errors={dtone.errors}; "
+          f"paypal requests={paypal.requests} errors={paypal.errors}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Define the fakes module.
+
+This module contains local stand-in servers for the DT One top-up API and
+the PayPal payments API, with configurable latency and error injection.
+They are used by the benchmark suite to run the purchase flow offline.
+"""
+
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FaultConfig:
+    """Define FaultConfig class.
+
+    Latency and error injection settings shared by a fake server.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 seed=None):
+        """Initialize the FaultConfig instance.
+
+        Args:
+            latency_ms (float): Base latency added to every response.
+            jitter_ms (float): Random extra latency, uniform in [0, jitter].
+            error_rate (float): Fraction of requests answered with a 500.
+            seed (int, optional): Seed for reproducible runs.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def apply(self):
+        """Sleep for the injected latency; return True to inject an error."""
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+            fail = self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        return fail
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    """Base request handler answering with JSON."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        """Keep the benchmark output quiet."""
+
+    def read_json(self):
+        """Return the decoded JSON request body, or {}."""
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+    def send_json(self, payload, status=200, headers=None):
+        """Send a JSON response."""
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_fault(self):
+        """Apply the server's fault config; True if an error was sent."""
+        self.server.requests += 1
+        if self.server.faults.apply():
+            self.server.errors += 1
+            self.send_json({"errors": [{"message": "Injected failure"}]},
+                           status=500)
+            return True
+        return False
+
+
+class _DTOneHandler(_JSONHandler):
+    """Handler of the fake DT One API."""
+
+    def do_GET(self):
+        """Serve products and transaction status."""
+        if self.handle_fault():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.startswith("/transactions/"):
+            transaction_id = url.path.rsplit("/", 1)[-1]
+            self.send_json(self.server.transaction(transaction_id))
+            return
+        if url.path == "/products":
+            operator_id = int(query.get("operator_id", ["0"])[0] or 0)
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["100"])[0])
+            if operator_id:
+                products = self.server.products(operator_id)
+            else:
+                products = self.server.all_products()
+            start = (page - 1) * per_page
+            pages = max(1, -(-len(products) // per_page))
+            self.send_json(products[start:start + per_page], headers={
+                "X-Total": str(len(products)),
+                "X-Total-Pages": str(pages),
+                "X-Page": str(page),
+                "X-Per-Page": str(per_page)
+            })
+            return
+        self.send_json({"errors": [{"message": "Not found"}]}, status=404)
+
+    def do_POST(self):
+        """Serve number lookups and transaction creation."""
+        payload = self.read_json()
+        if self.handle_fault():
+            return
+        if self.path.startswith("/lookup/mobile-number"):
+            number = "".join(
+                ch for ch in str(payload.get("mobile_number", ""))
+                if ch.isdigit())
+            if len(number) < 8:
+                self.send_json([])
+                return
+            operator_id = self.server.operator_for(number)
+            self.send_json([
+                {"id": operator_id + 1, "name": "Other", "identified": False},
+                {"id": operator_id, "name": f"Operator {operator_id}",
+                 "identified": True}
+            ])
+            return
+        if self.path.startswith("/async/transactions"):
+            self.send_json(self.server.create_transaction(payload),
+                           status=201)
+            return
+        self.send_json({"errors": [{"message": "Not found"}]}, status=404)
+
+
+class FakeDTOneServer(ThreadingHTTPServer):
+    """Define FakeDTOneServer class.
+
+    Serves `lookup/mobile-number`, `products`, `async/transactions` and
+    `transactions/<id>` with deterministic data.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, faults=None, products_per_operator=20,
+                 address=("127.0.0.1", 0)):
+        """Initialize the fake and bind it to a free local port."""
+        super().__init__(address, _DTOneHandler)
+        self.faults = faults or FaultConfig()
+        self.products_per_operator = products_per_operator
+        self.requests = 0
+        self.errors = 0
+        self._ids = itertools.count(1)
+        self._transactions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Return the base URL of the server."""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @staticmethod
+    def operator_for(number):
+        """Map a number to an operator ID by its first five digits."""
+        return 1000 + int(number[:5]) % 97
+
+    def products(self, operator_id):
+        """Return the product catalog of an operator."""
+        return [
+            {
+                "id": operator_id * 1000 + i,
+                "name": f"Top-up {i}",
+                "description": f"{i * 500} units",
+                "operator": {"id": operator_id,
+                             "name": f"Operator {operator_id}"},
+                "prices": {
+                    "retail": {"amount": round(1.5 * i, 2), "fee": 0.25,
+                               "unit": "USD", "unit_type": "CURRENCY"},
+                    "wholesale": {"amount": round(1.2 * i, 2),
+                                  "unit": "USD", "unit_type": "CURRENCY"}
+                },
+                "destination": {"amount": i * 500, "unit": "RWF",
+                                "unit_type": "CURRENCY"}
+            }
+            for i in range(1, self.products_per_operator + 1)
+        ]
+
+    def all_products(self):
+        """Return the product catalogs of every operator."""
+        return [product for operator_id in range(1000, 1097)
+                for product in self.products(operator_id)]
+
+    def create_transaction(self, payload):
+        """Record a transaction and return its SUBMITTED representation."""
+        product_id = int(payload.get("product_id") or 0)
+        operator_id = product_id // 1000
+        index = product_id % 1000 or 1
+        transaction = {
+            "id": next(self._ids),
+            "external_id": payload.get("external_id"),
+            "confirmation_date": time.strftime("%Y-%m-%dT%H:%M:%SZ",
+                                               time.gmtime()),
+            "credit_party_identifier": payload.get(
+                "credit_party_identifier", {}),
+            "product": {"id": product_id, "description": f"{index * 500} units",
+                        "operator": {"id": operator_id,
+                                     "name": f"Operator {operator_id}"}},
+            "prices": {
+                "retail": {"amount": round(1.5 * index, 2), "unit": "USD"},
+                "wholesale": {"amount": round(1.2 * index, 2), "unit": "USD"}
+            },
+            "status": {"id": 50000, "message": "SUBMITTED",
+                       "class": {"id": 5, "message": "SUBMITTED"}},
+            "created_at": time.time()
+        }
+        with self._lock:
+            self._transactions[str(transaction["id"])] = transaction
+        return transaction
+
+    def transaction(self, transaction_id):
+        """Return a transaction, COMPLETED once it is a second old."""
+        with self._lock:
+            transaction = dict(self._transactions.get(transaction_id) or {})
+        if transaction and time.time() - transaction["created_at"] > 1:
+            transaction["status"] = {
+                "id": 70000, "message": "COMPLETED",
+                "class": {"id": 7, "message": "COMPLETED"}}
+        return transaction
+
+
+class _PayPalHandler(_JSONHandler):
+    """Handler of the fake PayPal API."""
+
+    def do_POST(self):
+        """Serve OAuth tokens, payment creation and execution."""
+        self.read_json()
+        if self.handle_fault():
+            return
+        if self.path == "/v1/oauth2/token":
+            self.send_json({"access_token": "fake-token",
+                            "token_type": "Bearer", "expires_in": 32400})
+            return
+        if self.path == "/v1/payments/payment":
+            payment_id = f"PAYID-{next(self.server.ids)}"
+            self.send_json({
+                "id": payment_id,
+                "state": "created",
+                "links": [{
+                    "href": f"{self.server.url}/approve?paymentId={payment_id}",
+                    "rel": "approval_url",
+                    "method": "REDIRECT"
+                }]
+            }, status=201)
+            return
+        if self.path.endswith("/execute"):
+            payment_id = self.path.split("/")[-2]
+            self.send_json({"id": payment_id, "state": "approved"})
+            return
+        self.send_json({"name": "NOT_FOUND"}, status=404)
+
+
+class FakePayPalServer(ThreadingHTTPServer):
+    """Define FakePayPalServer class.
+
+    Serves the OAuth token, payment creation and payment execution
+    endpoints used by PayPalHandler.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, faults=None, address=("127.0.0.1", 0)):
+        """Initialize the fake and bind it to a free local port."""
+        super().__init__(address, _PayPalHandler)
+        self.faults = faults or FaultConfig()
+        self.requests = 0
+        self.errors = 0
+        self.ids = itertools.count(1)
+
+    @property
+    def url(self):
+        """Return the base URL of the server."""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+def start(server):
+    """Serve a fake server on a daemon thread and return it."""
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,256 @@
+"""Replay captured purchase-flow traffic against the application.
+
+Reads a capture file written with CAPTURE_PATH set (see
+application/models/traffic_capture.py) and plays every captured user's
+requests in order, each user with its own HTTP session, so the session
+cookie carries the state from /buy_global_airtime through
+/execute_payment. Requests start at their captured offsets divided by
+--speedup; --speedup 0 sends each user's requests back to back. Users
+run concurrently, up to --users at once.
+
+By default the application is served locally against the fake upstream
+servers, as in tests/benchmark.py; --url replays against a running
+deployment instead. The report gives throughput and p50/p95/p99 latency
+per route, next to the latency that was captured.
+
+Usage:
+    python -m tests.replay var/capture.jsonl --speedup 10 --users 64
+    python -m tests.replay capture.jsonl --url http://127.0.0.1:8000
+"""
+
+import argparse
+import json
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from tests.benchmark import percentile, start_app
+from tests.fakes import FakeDTOneServer, FakePayPalServer, FaultConfig
+from tests.fakes import start
+
+# Products offered on the page returned by /buy_global_airtime.
+_PRODUCT_IDS = re.compile(r'name="product_id" value="(\d+)"')
+
+
+def load_capture(path):
+    """
+    Read a capture file.
+
+    Returns:
+        tuple: The time of the first request and the requests of every
+               user, in order, as a list of lists.
+    """
+    users = defaultdict(list)
+    with open(path) as capture_file:
+        for line in capture_file:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                users[entry["user"]].append(entry)
+    if not users:
+        return 0.0, []
+    sequences = [sorted(entries, key=lambda e: e["ts"])
+                 for entries in users.values()]
+    sequences.sort(key=lambda entries: entries[0]["ts"])
+    return sequences[0][0]["ts"], sequences
+
+
+class Replay:
+    """Define Replay class.
+
+    Plays captured user sequences against a base URL and collects the
+    latency of every request by route.
+    """
+
+    def __init__(self, base_url, speedup=1.0, timeout=60.0):
+        """Initialize the Replay instance.
+
+        Args:
+            base_url (str): The application's base URL.
+            speedup (float): Time compression; 0 ignores captured timing.
+            timeout (float): Timeout of every request in seconds.
+        """
+        self.base_url = base_url.rstrip("/")
+        self.speedup = speedup
+        self.timeout = timeout
+        self.timings = defaultdict(list)
+        self.captured = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.skipped = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._t0 = 0.0
+        self._started = 0.0
+
+    def _wait(self, entry):
+        """Sleep until an entry's replay time; record how late it is."""
+        if not self.speedup:
+            return
+        due = self._started + (entry["ts"] - self._t0) / self.speedup
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        elif -delay > self.max_lag:
+            with self._lock:
+                self.max_lag = max(self.max_lag, -delay)
+
+    def play_user(self, entries):
+        """Replay one user's requests with a session of their own."""
+        session = requests.Session()
+        offered = []
+        payment_id = None
+        for entry in entries:
+            route = entry["route"]
+            if "<" in route:
+                # Paths with variables (job IDs...) cannot be rebuilt.
+                with self._lock:
+                    self.skipped += 1
+                continue
+            args = dict(entry.get("args") or {})
+            form = dict(entry.get("form") or {})
+            if route == "/create_transaction" and offered and \
+                    form.get("product_id") not in offered:
+                form["product_id"] = offered[0]
+            if route == "/execute_payment" and payment_id:
+                args["paymentId"] = payment_id
+
+            self._wait(entry)
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    entry["method"], self.base_url + route, params=args,
+                    data=form or None, allow_redirects=False,
+                    timeout=self.timeout)
+            except requests.RequestException:
+                with self._lock:
+                    self.errors[route] += 1
+                continue
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.timings[route].append(elapsed)
+                self.captured[route].append(entry.get("elapsed_ms", 0.0))
+                if response.status_code >= 400:
+                    self.errors[route] += 1
+
+            # Carry the state the browser would carry between pages.
+            if route == "/buy_global_airtime":
+                offered = _PRODUCT_IDS.findall(response.text)
+            elif route == "/create_transaction":
+                location = response.headers.get("Location", "")
+                payment_id = parse_qs(urlparse(location).query).get(
+                    "paymentId", [payment_id])[0]
+
+    def run(self, t0, sequences, users):
+        """
+        Replay every sequence, starting each user at its captured time.
+
+        Args:
+            t0 (float): Time of the first captured request.
+            sequences (list): The requests of every user, in order.
+            users (int): Maximum number of users replayed at once.
+
+        Returns:
+            dict: The report, with per-route statistics.
+        """
+        self._t0 = t0
+        self._started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            for entries in sequences:
+                self._wait(entries[0])
+                pool.submit(self.play_user, entries)
+        elapsed = time.perf_counter() - self._started
+
+        report = {"users": users, "elapsed": elapsed, "skipped": self.skipped,
+                  "max_lag_ms": self.max_lag * 1000, "routes": {}}
+        for route in sorted(self.timings):
+            samples = sorted(self.timings[route])
+            captured = sorted(self.captured[route])
+            report["routes"][route] = {
+                "requests": len(samples),
+                "errors": self.errors[route],
+                "rps": len(samples) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(samples, 0.50) * 1000,
+                "p95_ms": percentile(samples, 0.95) * 1000,
+                "p99_ms": percentile(samples, 0.99) * 1000,
+                "captured_p95_ms": percentile(captured, 0.95),
+            }
+        return report
+
+
+def print_report(report):
+    """Print the replay report as a table."""
+    print(f"\nusers={report['users']} elapsed={report['elapsed']:.2f}s "
+          f"skipped={report['skipped']} "
+          f"max_lag={report['max_lag_ms']:.1f}ms")
+    print(f"{'route':<22}{'reqs':>7}{'errs':>6}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'was p95':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<22}{stats['requests']:>7}{stats['errors']:>6}"
+              f"{stats['rps']:>9.1f}{stats['p50_ms']:>9.1f}"
+              f"{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+              f"{stats['captured_p95_ms']:>9.1f}")
+
+
+def main(argv=None):
+    """Replay a capture and return the process exit code."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("capture", help="JSONL file written by the capture")
+    parser.add_argument("--url", default=None,
+                        help="replay against this running application")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="time compression; 0 ignores captured timing")
+    parser.add_argument("--users", type=int, default=32,
+                        help="maximum number of users replayed at once")
+    parser.add_argument("--upstream-latency-ms", type=float, default=30.0)
+    parser.add_argument("--paypal-latency-ms", type=float, default=50.0)
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="fail if any route's error rate exceeds this")
+    parser.add_argument("--save-report", default=None,
+                        help="write the report to a JSON file")
+    args = parser.parse_args(argv)
+
+    t0, sequences = load_capture(args.capture)
+    if not sequences:
+        print(f"No requests in {args.capture}")
+        return 1
+
+    server = dtone = paypal = None
+    base_url = args.url
+    if base_url is None:
+        dtone = start(FakeDTOneServer(FaultConfig(args.upstream_latency_ms)))
+        paypal = start(FakePayPalServer(FaultConfig(args.paypal_latency_ms)))
+        workdir = tempfile.mkdtemp(prefix="billhub-replay-")
+        base_url, server = start_app(dtone, paypal, workdir)
+
+    report = Replay(base_url, speedup=args.speedup).run(
+        t0, sequences, args.users)
+    if server is not None:
+        server.shutdown()
+    print_report(report)
+    if dtone is not None:
+        print(f"\nupstream requests={dtone.requests} errors={dtone.errors}; "
+              f"paypal requests={paypal.requests} errors={paypal.errors}")
+    if args.save_report:
+        with open(args.save_report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    failed = False
+    if args.max_error_rate is not None:
+        for route, stats in report["routes"].items():
+            error_rate = stats["errors"] / max(stats["requests"], 1)
+            if error_rate > args.max_error_rate:
+                print(f"FAIL {route}: error rate {error_rate:.3f} "
+                      f"> {args.max_error_rate}")
+                failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Define the benchmark suite tests."""
+
+import unittest
+from types import SimpleNamespace
+
+import requests
+
+from tests.benchmark import check, percentile
+from tests.fakes import FakeDTOneServer, FaultConfig, start
+
+
+class TestReport(unittest.TestCase):
+    """Define TestReport class."""
+
+    def test_percentile(self):
+        """Percentiles use the nearest rank of the sorted samples."""
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 0.50), 50)
+        self.assertEqual(percentile(samples, 0.95), 95)
+        self.assertEqual(percentile(samples, 1.0), 100)
+        self.assertEqual(percentile(samples[:10], 0.5), 5)
+        self.assertEqual(percentile(samples, 0.07), 7)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertEqual(percentile([], 0.95), 0.0)
+
+    def test_check(self):
+        """Thresholds and baseline regressions are reported."""
+        args = SimpleNamespace(max_error_rate=0.0, max_p95_ms=500,
+                               tolerance=0.25)
+        reports = [{"users": 4, "routes": {
+            "/a": {"requests": 10, "errors": 0, "p95_ms": 100, "rps": 50},
+            "/b": {"requests": 10, "errors": 1, "p95_ms": 600, "rps": 50}
+        }}]
+        self.assertEqual(len(check(reports, args, {})), 2)
+        baseline = {"4": {"/a": {"p95_ms": 50, "rps": 100}}}
+        failures = check(reports, args, baseline)
+        self.assertEqual(len(failures), 4)
+        self.assertTrue(any("regressed from 50.0ms" in f for f in failures))
+
+
+class TestFakeDTOne(unittest.TestCase):
+    """Define TestFakeDTOne class."""
+
+    def start(self, faults=None):
+        """Serve a fake DT One API for the test."""
+        server = start(FakeDTOneServer(faults, products_per_operator=3))
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_lookup_and_products(self):
+        """Numbers map to a stable operator that lists its products."""
+        server = self.start()
+        lookup = requests.post(f"{server.url}/lookup/mobile-number",
+                               json={"mobile_number": "+250788123456"},
+                               timeout=5).json()
+        operator_id = FakeDTOneServer.operator_for("250788123456")
+        self.assertIn({"id": operator_id, "name": f"Operator {operator_id}",
+                       "identified": True}, lookup)
+        products = requests.get(f"{server.url}/products",
+                                params={"operator_id": operator_id},
+                                timeout=5).json()
+        self.assertEqual([p["id"] for p in products],
+                         [operator_id * 1000 + i for i in (1, 2, 3)])
+
+    def test_error_injection(self):
+        """Injected errors are answered with a 500 and counted."""
+        server = self.start(FaultConfig(error_rate=1.0, seed=1))
+        response = requests.get(f"{server.url}/products", timeout=5)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(server.errors, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
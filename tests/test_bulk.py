@@ -0,0 +1,148 @@
+"""Define the bulk top-up tests."""
+
+import itertools
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from application.models.bulk import BulkTopUp
+
+
+class FakeServices:
+    """Define FakeServices class.
+
+    Stands in for GlobalServices: every number belongs to operator 1,
+    which offers products 10 and 11.
+    """
+
+    def __init__(self, products=None, fail_on=None):
+        """Initialize the FakeServices instance.
+
+        Args:
+            products (list, optional): Product IDs of the catalog; None
+                                       when it cannot be fetched.
+            fail_on (str, optional): Number whose transactions raise.
+        """
+        self.products = products
+        self.fail_on = fail_on
+        self._ids = itertools.count(1)
+
+    def lookup_mobile_number(self, msisdn):
+        return 1
+
+    def get_products(self, operator_id):
+        if self.products is None:
+            return None
+        return [SimpleNamespace(id=product_id)
+                for product_id in self.products]
+
+    def generate_transaction_id(self):
+        return f"trx-{next(self._ids)}"
+
+    def create_transaction(self, msisdn, trx_id, product_id):
+        if msisdn == self.fail_on:
+            raise RuntimeError("unexpected")
+        return {"status": {"message": "SUBMITTED"}}
+
+
+class TestParseRows(unittest.TestCase):
+    """Define TestParseRows class."""
+
+    def test_csv_with_header(self):
+        """The header line is skipped and product IDs become ints."""
+        rows = BulkTopUp.parse_rows(
+            "msisdn,product_id\n+250788123456,12\n+254712345678,7\n")
+        self.assertEqual(rows, [
+            {"line": 2, "msisdn": "+250788123456", "product_id": 12},
+            {"line": 3, "msisdn": "+254712345678", "product_id": 7}
+        ])
+
+    def test_csv_without_header(self):
+        """The first row is kept when it is not a header."""
+        rows = BulkTopUp.parse_rows("+250788123456,12\n\n250788000111,3\n")
+        self.assertEqual([row["line"] for row in rows], [1, 3])
+        self.assertEqual([row["product_id"] for row in rows], [12, 3])
+
+    def test_csv_invalid_number_is_kept(self):
+        """Invalid numbers are left for run() to report, not dropped."""
+        rows = BulkTopUp.parse_rows("12345,4\n+250788123456,12\n")
+        self.assertEqual([row["msisdn"] for row in rows],
+                         ["12345", "+250788123456"])
+
+    def test_csv_invalid_product_id(self):
+        """A product ID that is not a number rejects the file."""
+        with self.assertRaises(ValueError):
+            BulkTopUp.parse_rows("+250788123456,12\n+254712345678,abc\n")
+
+    def test_jsonl(self):
+        """JSONL rows are parsed one object per line."""
+        rows = BulkTopUp.parse_rows(
+            '{"msisdn": 250788123456, "product_id": 12}\n'
+            '\n'
+            '{"msisdn": " +254712345678 ", "product_id": "7"}\n')
+        self.assertEqual(rows, [
+            {"line": 1, "msisdn": "250788123456", "product_id": 12},
+            {"line": 3, "msisdn": "+254712345678", "product_id": 7}
+        ])
+
+
+class TestRun(unittest.TestCase):
+    """Define TestRun class."""
+
+    rows = [
+        {"line": 1, "msisdn": "+250788123456", "product_id": 10},
+        {"line": 2, "msisdn": "+250788123456", "product_id": 99},
+        {"line": 3, "msisdn": "+254712345678", "product_id": 11}
+    ]
+
+    def run_rows(self, services, ledger=None):
+        results = BulkTopUp(services, ledger, concurrency=2).run(self.rows)
+        return {result["line"]: result for result in results}
+
+    def test_results(self):
+        """Offered products are submitted, others fail."""
+        results = self.run_rows(FakeServices(products=[10, 11]))
+        self.assertEqual(results[1]["status"], "submitted")
+        self.assertEqual(results[2]["error"],
+                         "Product not offered by the operator.")
+        self.assertEqual(results[3]["status"], "submitted")
+
+    def test_submitted_rows_are_recorded(self):
+        """Each created transaction is recorded in the ledger."""
+        ledger = mock.Mock()
+        results = self.run_rows(FakeServices(products=[10, 11]), ledger)
+        recorded = sorted(call.args[0] for call in ledger.record.mock_calls)
+        self.assertEqual(recorded, sorted([results[1]["trx_id"],
+                                           results[3]["trx_id"]]))
+        ledger.record.assert_any_call(
+            results[3]["trx_id"], {"status": {"message": "SUBMITTED"}},
+            msisdn="+254712345678", product_id=11)
+
+        ledger.record.side_effect = OSError("disk full")
+        results = self.run_rows(FakeServices(products=[10, 11]), ledger)
+        self.assertEqual(results[1]["status"], "submitted")
+
+    def test_catalog_unavailable(self):
+        """Rows fail when the catalog cannot be checked."""
+        for products in (None, []):
+            results = self.run_rows(FakeServices(products=products))
+            self.assertEqual(
+                {result["status"] for result in results.values()},
+                {"failed"})
+
+    def test_unexpected_error(self):
+        """An unexpected error still yields one failed row per input."""
+        results = self.run_rows(
+            FakeServices(products=[10, 11], fail_on="+254712345678"))
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[3]["status"], "failed")
+
+        services = FakeServices(products=[10, 11])
+        services.get_products = lambda operator_id: 1 / 0
+        results = self.run_rows(services)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[1]["error"], "Internal error.")
+
+
+if __name__ == "__main__":
+    unittest.main()
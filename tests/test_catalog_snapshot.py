@@ -0,0 +1,59 @@
+"""Define the catalog snapshot tests."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from application.models.catalog_snapshot import CatalogSnapshot
+from application.models.catalog_snapshot import write_snapshot
+from application.models.product import Product
+
+
+def products(operator_id, amount):
+    """Return two products of an operator at a retail amount."""
+    return [Product(operator_id * 1000 + i, f"Product {i}", operator_id,
+                    "Operator", amount, 0.5, "USD", 100, "RWF")
+            for i in range(2)]
+
+
+class TestCatalogSnapshot(unittest.TestCase):
+    """Define TestCatalogSnapshot class."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "catalog.bin")
+        write_snapshot(self.path, products(7, 5) + products(9, 8))
+        self.snapshot = CatalogSnapshot(self.path, check_interval=0)
+
+    def test_get_products(self):
+        """Products round-trip through the file; unknown operators miss."""
+        found = self.snapshot.get_products(7)
+        self.assertEqual([p.id for p in found], [7000, 7001])
+        self.assertEqual(found[0].retail_amount, 5)
+        self.assertIsInstance(found[0].retail_amount, int)
+        self.assertIsNone(self.snapshot.get_products(8))
+
+    def test_decoded_once_per_version(self):
+        """Records are decoded once per operator until the file changes."""
+        first = self.snapshot.get_products(7)
+        second = self.snapshot.get_products(7)
+        self.assertIsNot(first, second)
+        self.assertIs(first[0], second[0])
+
+        write_snapshot(self.path, products(7, 6))
+        os.utime(self.path, ns=(0, 1))
+        self.assertEqual(self.snapshot.get_products(7)[0].retail_amount, 6)
+
+    def test_decoded_products_are_bounded(self):
+        """Only the most recently used operators stay decoded."""
+        snapshot = CatalogSnapshot(self.path, check_interval=0, memo_size=1)
+        first = snapshot.get_products(7)
+        snapshot.get_products(9)
+        self.assertIsNot(snapshot.get_products(7)[0], first[0])
+        self.assertEqual(len(snapshot._mapped._decoded), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Define the circuit breaker tests."""
+
+import unittest
+
+from application.models.circuit_breaker import CircuitBreaker
+from application.models.circuit_breaker import CircuitBreakers
+from application.models.circuit_breaker import CircuitOpenError
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Define TestCircuitBreaker class."""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker("products", window=4, min_calls=4,
+                                      open_seconds=0, half_open_probes=1)
+
+    def trip(self):
+        """Open the circuit with failed calls."""
+        for _ in range(4):
+            self.breaker.record(False, 0.1, self.breaker.check())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_on_failures(self):
+        """The circuit opens once the failure rate is reached."""
+        for _ in range(3):
+            self.breaker.record(False, 0.1, self.breaker.check())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record(True, 0.1, self.breaker.check())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_probe_closes_the_circuit(self):
+        """One probe at a time; a successful one closes the circuit."""
+        self.trip()
+        probe = self.breaker.check()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_late_calls_are_not_probes(self):
+        """Calls admitted while closed do not free or decide a probe."""
+        late = [self.breaker.check() for _ in range(3)]
+        self.trip()
+        probe = self.breaker.check()
+        for admission in late:
+            self.breaker.record(True, 0.1, admission)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(self.breaker._probes, 1)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.check()
+        self.breaker.record(False, 0.1, probe)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_probes_of_an_earlier_trial(self):
+        """A probe finishing after its trial ended leaves the count alone."""
+        self.breaker.half_open_probes = 2
+        self.trip()
+        first, second = self.breaker.check(), self.breaker.check()
+        self.breaker.record(False, 0.1, first)
+        probe = self.breaker.check()
+        self.breaker.record(True, 0.1, second)
+        self.assertEqual(self.breaker._probes, 1)
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_guard(self):
+        """Client errors are not failures; server errors are."""
+        breakers = CircuitBreakers(window=2, min_calls=2, failure_rate=1.0,
+                                   open_seconds=60)
+
+        class ClientError(Exception):
+            response = type("Response", (), {"status_code": 404})
+
+        for error in (ClientError, ClientError, RuntimeError, RuntimeError):
+            self.assertFalse(breakers.is_open("lookup"))
+            with self.assertRaises(error):
+                with breakers.guard("lookup"):
+                    raise error()
+        self.assertTrue(breakers.is_open("lookup"))
+        with self.assertRaises(CircuitOpenError):
+            with breakers.guard("lookup"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
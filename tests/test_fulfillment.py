@@ -0,0 +1,125 @@
+"""Define the fulfillment queue tests."""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from application.models.fulfillment import FulfillmentQueue
+
+
+def dead_pid():
+    """Return the PID of a process that has exited."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestFulfillmentQueue(unittest.TestCase):
+    """Define TestFulfillmentQueue class."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "jobs.db")
+
+    def queue(self, handler=lambda job: {"echo": job}, **options):
+        """Return a queue on the test database."""
+        options.setdefault("poll_interval", 0.02)
+        return FulfillmentQueue(handler, self.path, max_workers=2, **options)
+
+    def wait(self, queue, job_id, timeout=5.0):
+        """Wait until a job is no longer queued or running."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = queue.get(job_id)
+            if job["status"] in (FulfillmentQueue.DONE,
+                                 FulfillmentQueue.FAILED):
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_run_jobs(self):
+        """Jobs run once on the pool, with their result or error."""
+        def handler(job):
+            if job.get("fail"):
+                raise RuntimeError("declined")
+            return {"echo": job}
+
+        queue = self.queue(handler)
+        done = queue.submit({"n": 1})
+        failed = queue.submit({"fail": True})
+        self.assertEqual(self.wait(queue, done)["result"],
+                         {"echo": {"n": 1}})
+        job = self.wait(queue, failed)
+        self.assertEqual(job["error"], "declined")
+        self.assertIsNone(queue.get("missing"))
+
+    def test_claim_is_exclusive(self):
+        """A queued job is claimed by exactly one claimer."""
+        first = self.queue()
+        second = self.queue()
+        first._connection().execute(
+            "INSERT INTO jobs (id, status, payload, created_at) "
+            "VALUES ('J1', 'queued', '{}', 0)")
+        self.assertEqual(first._claim(), ("J1", {}))
+        self.assertIsNone(second._claim())
+
+    def test_queued_jobs_survive_a_restart(self):
+        """Jobs queued before a restart run in the next process."""
+        self.queue()._connection().execute(
+            "INSERT INTO jobs (id, status, payload, created_at) "
+            "VALUES ('J1', 'queued', ?, 0)", ('{"n": 1}',))
+        queue = self.queue()
+        queue.start()
+        self.assertEqual(self.wait(queue, "J1")["status"],
+                         FulfillmentQueue.DONE)
+
+    def test_interrupted_jobs_fail(self):
+        """Running jobs of dead processes fail; live ones are kept."""
+        queue = self.queue(job_timeout=300)
+        now = time.time()
+        conn = queue._connection()
+        for job_id, owner, started_at in (
+                ("dead", dead_pid(), now),
+                ("timed-out", os.getppid(), now - 600),
+                ("alive", os.getppid(), now),
+                ("reused-pid", os.getpid(), now),
+                ("legacy", None, now)):
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, created_at,"
+                " started_at, owner) VALUES (?, 'running', '{}', ?, ?, ?)",
+                (job_id, now, started_at, owner))
+        queue._fail_interrupted()
+        statuses = {job_id: queue.get(job_id)["status"]
+                    for job_id in ("dead", "timed-out", "alive",
+                                   "reused-pid", "legacy")}
+        self.assertEqual(statuses, {
+            "dead": FulfillmentQueue.FAILED,
+            "timed-out": FulfillmentQueue.FAILED,
+            "alive": FulfillmentQueue.RUNNING,
+            "reused-pid": FulfillmentQueue.FAILED,
+            "legacy": FulfillmentQueue.RUNNING
+        })
+        self.assertIn("needs review", queue.get("dead")["error"])
+
+    def test_sweep_runs_while_dispatching(self):
+        """A job interrupted after startup is failed by the dispatcher."""
+        release = threading.Event()
+        queue = self.queue(lambda job: release.wait(5), sweep_interval=0.05)
+        self.addCleanup(release.set)
+        queue.start()
+        queue._connection().execute(
+            "INSERT INTO jobs (id, status, payload, created_at, started_at,"
+            " owner) VALUES ('J1', 'running', '{}', 0, ?, ?)",
+            (time.time(), dead_pid()))
+        self.assertEqual(self.wait(queue, "J1")["status"],
+                         FulfillmentQueue.FAILED)
+
+
+if __name__ == "__main__":
+    unittest.main()
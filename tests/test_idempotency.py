@@ -0,0 +1,212 @@
+"""Define the idempotent PayPal return tests."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from application.models.fulfillment import FulfillmentError
+from application.models.idempotency import IdempotencyStore
+
+with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+    import app as billhub
+
+
+def top_up_result(trx_id):
+    """Return a fulfilment result as stored for a completed payment."""
+    return {
+        "trx_id": trx_id,
+        "response": {
+            "confirmation_date": "2024-01-01T00:00:00Z",
+            "credit_party_identifier": {"mobile_number": "+250788123456"},
+            "prices": {"retail": {"amount": 5, "unit": "USD"},
+                       "wholesale": {"amount": 4, "unit": "USD"}},
+            "product": {"operator": {"name": "Operator"},
+                        "description": "Airtime"},
+            "status": {"message": "SUBMITTED"}
+        }
+    }
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    """Define TestIdempotencyStore class."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = IdempotencyStore(os.path.join(directory, "results.db"),
+                                      ttl=60, lock_timeout=60)
+
+    def test_claim_once(self):
+        """Only the first claim runs; repeats see the entry."""
+        self.assertEqual(self.store.claim("PAY-1:P"), (True, None))
+        claimed, entry = self.store.claim("PAY-1:P")
+        self.assertFalse(claimed)
+        self.assertEqual(entry["status"], IdempotencyStore.PENDING)
+        self.assertEqual(self.store.claim("PAY-1:Q"), (True, None))
+
+    def test_outcomes(self):
+        """Completed and failed outcomes are replayed as stored."""
+        self.store.claim("PAY-1:P")
+        self.store.complete("PAY-1:P", {"trx_id": "T1"})
+        self.store.claim("PAY-2:P")
+        self.store.fail("PAY-2:P", "Payment declined.")
+        self.assertEqual(self.store.claim("PAY-1:P")[1]["result"],
+                         {"trx_id": "T1"})
+        self.assertEqual(self.store.claim("PAY-2:P")[1]["error"],
+                         "Payment declined.")
+
+    def test_expired_key_is_claimed_again(self):
+        """An outcome past its TTL no longer blocks the key."""
+        self.store.ttl = -1
+        self.store.claim("PAY-1:P")
+        self.assertIsNone(self.store.get("PAY-1:P"))
+        self.assertEqual(self.store.claim("PAY-1:P"), (True, None))
+
+    def test_wait_for_the_first_request(self):
+        """A repeat waits for the outcome of the request still running."""
+        self.store.claim("PAY-1:P")
+        timer = threading.Timer(
+            0.1, self.store.complete, ("PAY-1:P", {"trx_id": "T1"}))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        entry = self.store.wait("PAY-1:P", timeout=5, interval=0.01)
+        self.assertEqual(entry["status"], IdempotencyStore.DONE)
+
+    def test_payments(self):
+        """A created payment is bound to its order until it expires."""
+        self.store.save_payment("PAY-1", 12, "5.00", 7)
+        self.assertEqual(self.store.get_payment("PAY-1"), {
+            "payment_id": "PAY-1", "product_id": 12, "operator_id": 7,
+            "total": "5.00"})
+        self.assertIsNone(self.store.get_payment("PAY-2"))
+        self.store.ttl = -1
+        self.store.save_payment("PAY-3", 12, "5.00")
+        self.assertIsNone(self.store.get_payment("PAY-3"))
+
+
+class TestExecutePaymentReplay(unittest.TestCase):
+    """Define TestExecutePaymentReplay class.
+
+    PayPal returns with inline fulfilment; the top-up itself is mocked.
+    """
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.store = store = IdempotencyStore(
+            os.path.join(directory, "results.db"))
+        for payment_id in ("PAY-1", "PAY-2", "PAY-3"):
+            store.save_payment(payment_id, 12, "5.00", 7)
+        self.fulfil = mock.AsyncMock(return_value=top_up_result("T1"))
+        for name, value in (("payment_results", store),
+                            ("fulfil_payment", self.fulfil)):
+            patcher = mock.patch.object(billhub, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+            self.app = billhub.create_app({
+                "SECRET_KEY": "test",
+                "FULFILLMENT_WORKERS": 0,
+                "RECONCILER_ENABLED": False,
+                "CATALOG_SYNC_INTERVAL": 0
+            })
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as session:
+            session["product_id"] = 12
+
+    def test_completed_payment_is_replayed(self):
+        """A refreshed return page shows the same top-up, run once."""
+        url = "/execute_payment?paymentId=PAY-1&PayerID=P"
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertIn(b"T1", second.data)
+        self.fulfil.assert_awaited_once()
+
+    def test_failed_payment_is_replayed(self):
+        """A failed payment is reported again rather than retried."""
+        self.fulfil.side_effect = FulfillmentError("Payment declined.")
+        url = "/execute_payment?paymentId=PAY-2&PayerID=P"
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 302)
+        self.fulfil.assert_awaited_once()
+
+    def test_unexpected_error_needs_review(self):
+        """A crash during fulfilment fails the key instead of leaving it."""
+        self.fulfil.side_effect = KeyError("trx_id")
+        url = "/execute_payment?paymentId=PAY-2&PayerID=P"
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 302)
+        entry = self.store.get("PAY-2:P")
+        self.assertEqual(entry["status"], IdempotencyStore.FAILED)
+        self.assertIn("needs review", entry["error"])
+        self.fulfil.assert_awaited_once()
+
+    def test_abandoned_key_needs_review(self):
+        """A key left pending without a job by a dead worker is reported."""
+        self.store.claim("PAY-3:P")
+        self.store.lock_timeout = -1
+        response = self.client.get(
+            "/execute_payment?paymentId=PAY-3&PayerID=P")
+        self.assertEqual(response.status_code, 302)
+        with self.client.session_transaction() as session:
+            self.assertIn("needs review", session["_flashes"][-1][1])
+        self.fulfil.assert_not_awaited()
+
+    def test_payment_bound_to_its_product(self):
+        """The product paid for is credited; other orders are refused."""
+        self.client.get("/execute_payment?paymentId=PAY-1&PayerID=P")
+        self.assertEqual(self.fulfil.await_args.args[0]["product_id"], 12)
+        with self.client.session_transaction() as session:
+            session["product_id"] = 99
+        for url in ("/execute_payment?paymentId=PAY-2&PayerID=P",
+                    "/execute_payment?paymentId=PAY-9&PayerID=P"):
+            self.assertEqual(self.client.get(url).status_code, 302)
+        self.fulfil.assert_awaited_once()
+
+    def test_missing_payer(self):
+        """A return without a PayerID is refused before any claim."""
+        response = self.client.get("/execute_payment?paymentId=PAY-3")
+        self.assertEqual(response.status_code, 302)
+        self.fulfil.assert_not_awaited()
+
+
+class TestFulfilPayment(unittest.TestCase):
+    """Define TestFulfilPayment class."""
+
+    def test_receipt_error_keeps_the_top_up(self):
+        """A receipt that cannot be queued does not fail the payment."""
+        response = top_up_result("T1")["response"]
+        patches = {
+            "paypal_handler": mock.Mock(
+                execute_payment=mock.Mock(return_value=(True, None))),
+            "service": mock.Mock(
+                generate_transaction_id=mock.Mock(return_value="T1")),
+            "async_service": mock.Mock(
+                create_transaction=mock.AsyncMock(return_value=response)),
+            "ledger": mock.Mock(),
+            "helpers": mock.Mock(send_receipt_email=mock.Mock(
+                side_effect=OSError("disk full")))
+        }
+        for name, value in patches.items():
+            patcher = mock.patch.object(billhub, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        job = {"payment_id": "PAY-1", "payer_id": "P", "product_id": 12,
+               "phone_number": "+250788123456", "email": "a@example.com"}
+        with mock.patch("builtins.print"):
+            result = asyncio.run(billhub.fulfil_payment(job))
+        self.assertEqual(result, {"trx_id": "T1", "response": response})
+        patches["ledger"].record.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
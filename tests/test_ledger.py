@@ -0,0 +1,64 @@
+"""Define the ledger tests."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from application.models.ledger import Ledger
+
+
+def response(transaction_id, status, amount):
+    """Return a top-up API response with a status class."""
+    return {
+        "id": transaction_id,
+        "status": {"class": {"message": status}},
+        "product": {"id": 1, "operator": {"name": "Operator"}},
+        "prices": {"retail": {"amount": amount, "unit": "USD"},
+                   "wholesale": {"amount": amount - 1, "unit": "USD"}}
+    }
+
+
+class TestDailyTotals(unittest.TestCase):
+    """Define TestDailyTotals class."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.ledger = Ledger(os.path.join(directory, "ledger.db"),
+                             flush_interval=60)
+        self.today = time.strftime("%Y-%m-%d", time.gmtime())
+
+    def totals(self):
+        return self.ledger.totals(self.today, self.today, group_by="operator")
+
+    def test_only_completed_top_ups_are_counted(self):
+        """Declined and pending top-ups stay out of the totals."""
+        self.ledger.record("T1", response(1, "COMPLETED", 5))
+        self.ledger.record("T2", response(2, "DECLINED", 7))
+        self.ledger.record("T3", response(3, "SUBMITTED", 9))
+        self.ledger.flush()
+        self.assertEqual(self.totals(), [{
+            "operator_name": "Operator", "retail_unit": "USD", "count": 1,
+            "retail_total": 5, "wholesale_total": 4
+        }])
+
+    def test_top_ups_are_counted_when_they_complete(self):
+        """A top-up enters the totals once, when it completes."""
+        self.ledger.record("T1", response(1, "SUBMITTED", 5))
+        self.ledger.record("T2", response(2, "SUBMITTED", 7))
+        self.ledger.flush()
+        self.assertEqual(self.totals(), [])
+
+        self.ledger.update_statuses([("T1", "COMPLETED", None),
+                                     ("T2", "DECLINED", None)])
+        self.ledger.update_statuses([("T1", "COMPLETED", None)])
+        totals = self.totals()
+        self.assertEqual(len(totals), 1)
+        self.assertEqual(totals[0]["count"], 1)
+        self.assertEqual(totals[0]["retail_total"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Define the metrics registry tests."""
+
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from application.models.metrics import MetricsRegistry
+
+with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+    import app as billhub
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Define TestMetricsRegistry class."""
+
+    def test_exited_threads_are_folded(self):
+        """Shards of exited threads are merged, not kept forever."""
+        registry = MetricsRegistry()
+        for _ in range(50):
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(lambda _: registry.inc("jobs"), range(8)))
+        registry.inc("jobs")
+        self.assertEqual(registry.snapshot()[("jobs", ())], [401])
+        self.assertLessEqual(len(registry._shards), 2)
+
+    def test_worker_label(self):
+        """Every sample is labelled with the worker's process ID."""
+        registry = MetricsRegistry()
+        registry.inc("jobs", route="/a")
+        registry.register_collector(lambda: [("queued", {}, 3)])
+        rendered = registry.render()
+        self.assertIn(f'jobs{{route="/a",worker="{os.getpid()}"}} 1',
+                      rendered)
+        self.assertIn(f'queued{{worker="{os.getpid()}"}} 3', rendered)
+
+
+class TestRequestMetrics(unittest.TestCase):
+    """Define TestRequestMetrics class."""
+
+    def test_failed_request_is_counted_once(self):
+        """A view that raises is counted as one 500 request."""
+        registry = MetricsRegistry()
+        patcher = mock.patch.object(billhub, "metrics", registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+            app = billhub.create_app({
+                "SECRET_KEY": "test",
+                "FULFILLMENT_WORKERS": 0,
+                "RECONCILER_ENABLED": False,
+                "CATALOG_SYNC_INTERVAL": 0
+            })
+
+        def fail():
+            raise RuntimeError("boom")
+
+        app.add_url_rule("/fail", "fail", fail)
+        response = app.test_client().get("/fail")
+        self.assertEqual(response.status_code, 500)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot[("billhub_http_requests_total", (
+            ("route", "/fail"), ("status", 500)))], [1])
+        self.assertEqual(snapshot[("billhub_http_request_in_flight", (
+            ("route", "/fail"),))], [0])
+
+
+if __name__ == "__main__":
+    unittest.main()
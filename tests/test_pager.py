@@ -0,0 +1,77 @@
+"""Define the pager tests."""
+
+import json
+import unittest
+
+from application.models.pager import iter_json_array, total_pages
+
+DOCUMENT = (' [ {"id": 1, "name": "Opérateur \\"A\\"", "tags": ["x", "]"]},'
+            '\n\t-12.5e-1 , "a\\\\b\\u00e9,]" ,true,null, [] ,{}, 0, 42 ] ')
+
+
+def split(data, *positions):
+    """Return data cut into chunks at the given positions."""
+    bounds = [0, *positions, len(data)]
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Define TestIterJsonArray class."""
+
+    def test_whole_body(self):
+        """A body in one chunk gives the items of the array."""
+        self.assertEqual(list(iter_json_array([DOCUMENT.encode()])),
+                         json.loads(DOCUMENT))
+
+    def test_every_chunk_boundary(self):
+        """Objects, strings, escapes, numbers and whitespace can be split."""
+        data = DOCUMENT.encode()
+        expected = json.loads(DOCUMENT)
+        for position in range(1, len(data)):
+            self.assertEqual(list(iter_json_array(split(data, position))),
+                             expected, position)
+        self.assertEqual(list(iter_json_array(bytes([b]) for b in data)),
+                         expected)
+
+    def test_split_numbers(self):
+        """A number is only yielded once it cannot continue."""
+        for chunks, expected in (
+                ([b"[1.", b"5]"], [1.5]),
+                ([b"[1", b"2", b"3]"], [123]),
+                ([b"[2e", b"3, -", b"1]"], [2000.0, -1]),
+                ([b"[7", b" ", b"]"], [7]),
+                ([b"[8", b"]"], [8])):
+            self.assertEqual(list(iter_json_array(chunks)), expected, chunks)
+
+    def test_items_before_the_end(self):
+        """Items are yielded while the rest of the body is still coming."""
+        def chunks():
+            yield b'[{"id": 1}, 2.5, '
+            self.assertEqual(seen, [{"id": 1}, 2.5])
+            yield b'"three"]'
+
+        seen = []
+        for item in iter_json_array(chunks()):
+            seen.append(item)
+        self.assertEqual(seen, [{"id": 1}, 2.5, "three"])
+
+    def test_invalid(self):
+        """Bodies that are not one complete array are rejected."""
+        for chunks in ([b'{"id": 1}'], [b"[1, 2"], [b"[1 2]"], [b"[1,,2]"],
+                       [b"[1.", b"x]"], [b"[1x]"], [b""]):
+            with self.assertRaises(ValueError):
+                list(iter_json_array(chunks))
+
+
+class TestTotalPages(unittest.TestCase):
+    """Define TestTotalPages class."""
+
+    def test_total_pages(self):
+        """The page count header is read as an integer, if valid."""
+        self.assertEqual(total_pages({"X-Total-Pages": "3"}), 3)
+        self.assertIsNone(total_pages({"X-Total-Pages": "many"}))
+        self.assertIsNone(total_pages({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
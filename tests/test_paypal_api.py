@@ -0,0 +1,60 @@
+"""Define the PayPal API token refresh tests."""
+
+import time
+import unittest
+from unittest import mock
+
+import paypalrestsdk
+
+from application.models.paypal_api import PooledApi
+
+
+class TestTokenRefresh(unittest.TestCase):
+    """Define TestTokenRefresh class."""
+
+    def make_api(self, token):
+        """Return an API whose OAuth call returns token and counts calls."""
+        api = PooledApi(mode="sandbox", client_id="id", client_secret="secret",
+                        refresh_margin=300, min_refresh_interval=0.05)
+        self.fetches = 0
+
+        def fetch(*args, **kwargs):
+            self.fetches += 1
+            api.token_hash = dict(token)
+            return api.token_hash
+
+        patcher = mock.patch.object(paypalrestsdk.Api, "get_token_hash",
+                                    side_effect=fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.park_refresher, api)
+        return api
+
+    @staticmethod
+    def park_refresher(api):
+        """Keep a started refresher asleep once the OAuth mock is gone."""
+        api.min_refresh_interval = 3600
+        api.token_expires_at = float("inf")
+        time.sleep(0.1)
+
+    def test_expiry_never_in_the_past(self):
+        """Short or missing lifetimes still leave the token usable."""
+        for token, lifetime in (({"expires_in": 32400}, 32100),
+                                ({"expires_in": 200}, 100),
+                                ({"expires_in": 0}, 0.05),
+                                ({}, 0.05)):
+            api = self.make_api(dict(token, access_token="A"))
+            api._fetch_token()
+            self.assertAlmostEqual(api.token_expires_at - time.time(),
+                                   lifetime, delta=0.02)
+
+    def test_refresh_loop_does_not_spin(self):
+        """The refresher waits between refreshes of short-lived tokens."""
+        api = self.make_api({"access_token": "A"})
+        api._start_refresher()
+        time.sleep(0.3)
+        self.assertLessEqual(self.fetches, 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Define the phone number normalizer tests."""
+
+import unittest
+
+from application.models.phone_number import (
+    DIALING_PLAN, InvalidPhoneNumber, is_valid, normalize, parse)
+
+
+class TestNormalize(unittest.TestCase):
+    """Define TestNormalize class."""
+
+    def test_international_formats(self):
+        """+, 00 and bare calling codes give the same E.164 number."""
+        for typed in ("+250788123456", "00250788123456", "250788123456",
+                      "+250 788-123-456", "(+250) 788.123.456"):
+            self.assertEqual(normalize(typed), "+250788123456")
+
+    def test_national_format(self):
+        """A trunk 0 is replaced by the default calling code."""
+        self.assertEqual(normalize("0788123456", "250"), "+250788123456")
+        with self.assertRaises(InvalidPhoneNumber):
+            normalize("0788123456", "")
+
+    def test_calling_codes(self):
+        """The longest matching calling code is never shadowed."""
+        self.assertEqual(parse("+12025550123"), ("1", "2025550123"))
+        self.assertEqual(parse("+447911123456"), ("44", "7911123456"))
+        self.assertEqual(parse("+254712345678"), ("254", "712345678"))
+
+    def test_national_lengths(self):
+        """National numbers must fit the length of their country."""
+        self.assertTrue(is_valid("+250788123456"))
+        self.assertFalse(is_valid("+25078812345"))
+        self.assertFalse(is_valid("+2507881234567"))
+        self.assertTrue(is_valid("+2547123456789"))
+        self.assertFalse(is_valid("+120255501234"))
+
+    def test_unknown_calling_code(self):
+        """Calling codes missing from the plan are left to the API."""
+        self.assertEqual(parse("+8881234567"), (None, "8881234567"))
+
+    def test_invalid(self):
+        """Text, short, long and zero-led numbers are rejected."""
+        for typed in ("", None, "abc", "+25078812345a", "12345",
+                      "+1234567890123456", "+0788123456", "++250788123456"):
+            with self.assertRaises(InvalidPhoneNumber):
+                normalize(typed)
+
+    def test_dialing_plan_is_prefix_free(self):
+        """No calling code is a prefix of another one."""
+        for code in DIALING_PLAN:
+            for length in range(1, len(code)):
+                self.assertNotIn(code[:length], DIALING_PLAN, code)
+        for country, shortest, longest in DIALING_PLAN.values():
+            self.assertLessEqual(shortest, longest, country)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Define the prefix index tests."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from application.models import services
+from application.models.prefix_index import PrefixIndex
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """Define TestPrefixIndex class."""
+
+    def setUp(self):
+        self.index = PrefixIndex(learn_length=6, min_prefix_length=4,
+                                 min_confirmations=2)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = directory
+
+    def test_longest_match(self):
+        """The longest trusted prefix answers; short ones never do."""
+        self.index.insert("2507", 1, confirmations=2)
+        self.index.insert("250788", 2, confirmations=2)
+        self.index.insert("250", 3, confirmations=2)
+        self.assertEqual(self.index.lookup("+250788123456"), 2)
+        self.assertEqual(self.index.lookup("00250 789 123456"), 1)
+        self.assertIsNone(self.index.lookup("+250612345678"))
+        self.assertEqual(self.index.size, 3)
+
+    def test_confirmation_threshold(self):
+        """A learned prefix is trusted once it is confirmed enough."""
+        self.index.learn("+250788123456", 1)
+        self.assertIsNone(self.index.lookup("+250788999999"))
+        self.index.learn("+250788654321", 1)
+        self.assertEqual(self.index.lookup("+250788999999"), 1)
+        self.index.learn("+25078", 1)  # Too short to learn.
+        self.assertEqual(self.index.size, 1)
+
+    def test_conflicts(self):
+        """A range seen on another operator is left to the API."""
+        for operator_id in (1, 1, 2, 2):
+            self.index.learn("+250788123456", operator_id)
+        self.assertIsNone(self.index.lookup("+250788123456"))
+
+        # A ported range is not shadowed by a trusted shorter one.
+        self.index.insert("2507", 3, confirmations=2)
+        self.assertIsNone(self.index.lookup("+250788123456"))
+        self.assertEqual(self.index.lookup("+250789123456"), 3)
+
+        tolerant = PrefixIndex(min_confirmations=1, max_conflicts=1)
+        tolerant.learn("+250788123456", 1)
+        tolerant.learn("+250788123456", 2)
+        self.assertEqual(tolerant.lookup("+250788123456"), 2)
+
+    def test_dump_and_load(self):
+        """Trusted prefixes written by dump are loaded back by load_seed."""
+        self.index.insert("2507", 1, confirmations=2)
+        self.index.insert("250788", 2, confirmations=2)
+        self.index.learn("+254712345678", 3)  # Not confirmed yet.
+        for operator_id in (4, 4, 5, 5):
+            self.index.learn("+256772123456", operator_id)  # Ported.
+        path = os.path.join(self.directory, "prefixes.json")
+        self.assertEqual(self.index.dump(path), 2)
+        with open(path) as seed_file:
+            self.assertEqual(json.load(seed_file),
+                             {"2507": 1, "250788": 2})
+
+        loaded = PrefixIndex(min_confirmations=2)
+        self.assertEqual(loaded.load_seed(path), 2)
+        self.assertEqual(loaded.lookup("+250788123456"), 2)
+        self.assertEqual(loaded.lookup("+250789123456"), 1)
+
+    def test_load_csv_seed(self):
+        """CSV seeds may have a header and comment lines."""
+        path = os.path.join(self.directory, "prefixes.csv")
+        with open(path, "w") as seed_file:
+            seed_file.write("prefix,operator_id\n# Rwanda\n250788,2\n")
+        self.assertEqual(self.index.load_seed(path), 1)
+        self.assertEqual(self.index.lookup("+250788123456"), 2)
+
+
+class TestPrefixSeedCommand(unittest.TestCase):
+    """Define TestPrefixSeedCommand class."""
+
+    def test_prefix_seed(self):
+        """Looked-up numbers are written as a seed file."""
+        index = PrefixIndex(min_confirmations=2)
+
+        class FakeServices:
+            prefix_index = index
+
+            def lookup_mobile_number(self, number):
+                index.learn(number, 7 if number.startswith("+250") else 9)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        numbers = os.path.join(directory, "numbers.csv")
+        with open(numbers, "w") as numbers_file:
+            numbers_file.write("# numbers\n+250788123456,10\n"
+                               "+250788654321\n\n+254712345678\n")
+        output = os.path.join(directory, "var", "prefixes.json")
+        with mock.patch.object(services, "GlobalServices", FakeServices), \
+                mock.patch("sys.stdout", io.StringIO()):
+            status = services.prefix_seed_main([numbers, "--output", output])
+        self.assertEqual(status, 0)
+        with open(output) as seed_file:
+            self.assertEqual(json.load(seed_file), {"250788": 7})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""Define the quote engine tests."""
+
+import contextlib
+import io
+import unittest
+
+from application.models.product import Product
+from application.models.quotes import FxRates, QuoteEngine
+
+
+def product(product_id, amount, fee=0.5, unit="USD"):
+    """Return a product of operator 7."""
+    return Product(product_id, f"Product {product_id}", 7, "Operator",
+                   amount, fee, unit, 100, "RWF")
+
+
+class TestQuoteEngine(unittest.TestCase):
+    """Define TestQuoteEngine class."""
+
+    def setUp(self):
+        self.engine = QuoteEngine(FxRates(rates={"EUR": 0.5}, path=""),
+                                  ttl=300)
+        self.products = [product(1, 5), product(2, 10.005, fee=None),
+                         product(3, 4, unit="EUR")]
+
+    def test_quote(self):
+        """Totals are converted to USD and rounded half up to cents."""
+        quote = self.engine.quote(7, self.products)
+        self.assertEqual(quote.total, [5.5, 10.01, 9.0])
+        self.assertEqual(quote.fee, [0.5, 0.0, 1.0])
+
+    def test_price_revalidates_the_product(self):
+        """Checkout prices come from the server, for offered products."""
+        self.assertEqual(self.engine.price(7, "1", self.products), 5.5)
+        self.assertIsNone(self.engine.price(7, 99, self.products))
+        self.assertIsNone(self.engine.price(7, "1' OR 1", self.products))
+        self.assertIsNone(self.engine.price(7, 1, None))
+
+    def test_price_follows_a_new_catalog(self):
+        """A product missing from the cached quote is priced afresh."""
+        self.engine.quote(7, self.products)
+        products = self.products + [product(4, 20)]
+        self.assertEqual(self.engine.price(7, 4, products), 20.5)
+
+    def test_missing_rate(self):
+        """Products without a rate are unpriced, with a single warning."""
+        products = [product(1, 5), product(5, 1000, unit="RWF"),
+                    product(6, 2000, unit="RWF")]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            quote = self.engine.quote(7, products)
+            self.engine.invalidate(7)
+            self.engine.quote(7, products)
+        self.assertEqual(quote.total, [5.5, None, None])
+        self.assertIsNone(self.engine.price(7, 5, products))
+        self.assertEqual(output.getvalue().count("No FX rate for RWF"), 1)
+        self.assertEqual(self.engine.unpriced, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Define the rate limit tests."""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from application.models.rate_limit import (
+    RateLimitedError, RateLimiters, TokenBucket)
+
+with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+    import app as billhub
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Define TestTokenBucket class."""
+
+    def test_burst_then_wait(self):
+        """A full bucket serves a burst; later calls wait their turn."""
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(0), 0.0)
+        self.assertEqual(bucket.reserve(0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 0.1, delta=0.01)
+        self.assertAlmostEqual(bucket.reserve(1), 0.2, delta=0.01)
+
+    def test_max_wait(self):
+        """A call that would wait too long is refused without a token."""
+        bucket = TokenBucket(rate=10, burst=1)
+        bucket.reserve(0)
+        self.assertIsNone(bucket.reserve(0.05))
+        self.assertIsNone(bucket.reserve(0.05))
+        self.assertAlmostEqual(bucket.reserve(1), 0.1, delta=0.01)
+
+
+class TestRateLimiters(unittest.TestCase):
+    """Define TestRateLimiters class."""
+
+    def test_shed_over_quota(self):
+        """Calls beyond max_wait are shed and reported per endpoint."""
+        limiters = RateLimiters(default_rate=0, rates={"lookup": 1},
+                                max_wait=0)
+        limiters.acquire("lookup")
+        limiters.acquire("products")
+        self.assertFalse(limiters.is_limited("lookup"))
+        with self.assertRaises(RateLimitedError):
+            asyncio.run(limiters.acquire_async("lookup"))
+        self.assertTrue(limiters.is_limited("lookup"))
+        self.assertFalse(limiters.is_limited("products"))
+        self.assertEqual(limiters.shed, 1)
+
+    def test_rates_from_environment(self):
+        """SERVICES_RATE_LIMITS overrides the default rate per endpoint."""
+        with mock.patch.dict(os.environ, {
+                "SERVICES_RATE_LIMIT": "3",
+                "SERVICES_RATE_LIMITS": "products=5, lookup/mobile-number=1"}):
+            limiters = RateLimiters()
+        self.assertEqual(limiters.default_rate, 3)
+        self.assertEqual(limiters.rates, {"products": 5,
+                                          "lookup/mobile-number": 1})
+
+
+class TestShedLookup(unittest.TestCase):
+    """Define TestShedLookup class."""
+
+    def test_shed_lookup_is_not_an_unknown_number(self):
+        """A lookup shed by the rate limit asks the user to come back."""
+        limiters = RateLimiters(default_rate=1, max_wait=0)
+        service = mock.Mock(rate_limiters=limiters)
+        service.breakers.is_open.return_value = False
+        async_service = mock.Mock(
+            lookup_mobile_number=mock.AsyncMock(return_value=None))
+        for name, value in (("service", service),
+                            ("async_service", async_service),
+                            ("start_background_tasks", mock.Mock())):
+            patcher = mock.patch.object(billhub, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with mock.patch.dict(os.environ, {"SESSION_BACKEND": "memory"}):
+            client = billhub.create_app({
+                "SECRET_KEY": "test",
+                "FULFILLMENT_WORKERS": 0,
+                "RECONCILER_ENABLED": False,
+                "CATALOG_SYNC_INTERVAL": 0
+            }).test_client()
+        form = {"Phone_number": "+250788123456"}
+
+        response = client.post("/buy_global_airtime", data=form)
+        self.assertIn(b"could not find the operator", response.data)
+        limiters.acquire("lookup/mobile-number")
+        with self.assertRaises(RateLimitedError):
+            limiters.acquire("lookup/mobile-number")
+        response = client.post("/buy_global_airtime", data=form)
+        self.assertIn(b"temporarily unavailable", response.data)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""Define the server-side session tests."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flask import Flask, session
+
+from application.models.session_store import (
+    MemorySessionStore, ServerSideSessionInterface, SQLiteSessionStore,
+    decode_session, encode_session)
+
+
+def make_app(store, ttl=3600):
+    """Return an app that keeps its sessions in store."""
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.session_interface = ServerSideSessionInterface(store, ttl=ttl)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["phone_number"] = value
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("phone_number", "")
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+class TestStores(unittest.TestCase):
+    """Define TestStores class."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "sessions.db")
+
+    def test_round_trip(self):
+        """Sessions are stored, loaded, expired and deleted."""
+        blob = encode_session({"product_id": 12, "email": "a@example.com"})
+        self.assertEqual(decode_session(blob),
+                         {"product_id": 12, "email": "a@example.com"})
+        for store in (MemorySessionStore(), SQLiteSessionStore(self.path)):
+            store.save("live", blob, time.time() + 60)
+            store.save("expired", blob, time.time() - 1)
+            self.assertEqual(store.load("live"), blob)
+            self.assertIsNone(store.load("expired"))
+            self.assertIsNone(store.load("missing"))
+            store.delete("live")
+            self.assertIsNone(store.load("live"))
+
+    def test_lru_eviction(self):
+        """The memory store drops its least recently used session."""
+        store = MemorySessionStore(max_entries=2)
+        expires = time.time() + 60
+        store.save("a", b"A", expires)
+        store.save("b", b"B", expires)
+        store.load("a")
+        store.save("c", b"C", expires)
+        self.assertEqual(store.load("a"), b"A")
+        self.assertIsNone(store.load("b"))
+        self.assertEqual(store.load("c"), b"C")
+
+    def test_sqlite_is_shared(self):
+        """Two stores on one database see the same sessions."""
+        first = SQLiteSessionStore(self.path)
+        second = SQLiteSessionStore(self.path)
+        first.save("sid", b"data", time.time() + 60)
+        self.assertEqual(second.load("sid"), b"data")
+        second.delete("sid")
+        self.assertIsNone(first.load("sid"))
+
+
+class TestServerSideSessionInterface(unittest.TestCase):
+    """Define TestServerSideSessionInterface class."""
+
+    def test_cookie_only_carries_the_id(self):
+        """The cookie holds a random ID; the data stays on the server."""
+        store = MemorySessionStore()
+        client = make_app(store).test_client()
+        client.get("/set/250788123456")
+        sid = client.get_cookie("session").value
+        self.assertNotIn("250788", sid)
+        self.assertGreaterEqual(len(sid), 32)
+        self.assertEqual(decode_session(store.load(sid)),
+                         {"phone_number": "250788123456"})
+        self.assertEqual(client.get("/get").data, b"250788123456")
+
+    def test_expired_session_starts_over(self):
+        """A session past its TTL is replaced by a new, empty one."""
+        client = make_app(MemorySessionStore(), ttl=-1).test_client()
+        client.get("/set/250788123456")
+        self.assertEqual(client.get("/get").data, b"")
+
+    def test_cleared_session_is_deleted(self):
+        """Clearing a session removes it from the store and the cookie."""
+        store = MemorySessionStore()
+        client = make_app(store).test_client()
+        client.get("/set/250788123456")
+        sid = client.get_cookie("session").value
+        client.get("/clear")
+        self.assertIsNone(store.load(sid))
+        self.assertIsNone(client.get_cookie("session"))
+
+    def test_workers_share_sqlite_sessions(self):
+        """A session set by one worker is read by another."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "sessions.db")
+        first = make_app(SQLiteSessionStore(path)).test_client()
+        second = make_app(SQLiteSessionStore(path)).test_client()
+        first.get("/set/250788123456")
+        second.set_cookie("session", first.get_cookie("session").value)
+        self.assertEqual(second.get("/get").data, b"250788123456")
+
+
+if __name__ == "__main__":
+    unittest.main()
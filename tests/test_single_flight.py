@@ -0,0 +1,126 @@
+"""Define the single flight tests."""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from application.models.single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Define TestSingleFlight class."""
+
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def run_concurrently(self, flights, call, callers=4):
+        """Return the futures of callers that all join one call."""
+        pool = ThreadPoolExecutor(max_workers=callers)
+        self.addCleanup(pool.shutdown)
+        futures = [pool.submit(flights.do, "key", call)]
+        self.started.wait(5)
+        futures += [pool.submit(flights.do, "key", call)
+                    for _ in range(callers - 1)]
+        # Let the call finish once every follower is waiting for it.
+        while flights.shared < callers - 1:
+            time.sleep(0.001)
+        self.release.set()
+        return futures
+
+    def test_identical_calls_are_coalesced(self):
+        """Concurrent callers of a key share one call and its result."""
+        def call():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            return {"operator": 7}
+
+        flights = SingleFlight()
+        futures = self.run_concurrently(flights, call)
+        results = [future.result(5) for future in futures]
+        self.assertEqual(results, [{"operator": 7}] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flights.shared, 3)
+        # The key is free again once the call is done.
+        self.assertEqual(flights.do("key", lambda: 8), 8)
+
+    def test_exception_reaches_every_caller(self):
+        """A failed call raises its exception in the followers too."""
+        def call():
+            self.calls += 1
+            self.started.set()
+            self.release.wait(5)
+            raise ValueError("upstream failed")
+
+        flights = SingleFlight()
+        for future in self.run_concurrently(flights, call):
+            with self.assertRaisesRegex(ValueError, "upstream failed"):
+                future.result(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flights.do("key", lambda: 8), 8)
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    """Define TestAsyncSingleFlight class."""
+
+    def test_identical_calls_are_coalesced(self):
+        """Concurrent awaits of a key share one coroutine and its result."""
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 7
+
+        async def main():
+            flights = AsyncSingleFlight()
+            results = await asyncio.gather(
+                *(flights.do("key", call) for _ in range(4)),
+                flights.do("other", call))
+            return flights, results
+
+        flights, results = asyncio.run(main())
+        self.assertEqual(results, [7] * 5)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(flights.shared, 3)
+        self.assertEqual(flights._tasks, {})
+
+    def test_exception_reaches_every_caller(self):
+        """A failed coroutine raises its exception in the followers too."""
+        async def call():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        async def main():
+            flights = AsyncSingleFlight()
+            return await asyncio.gather(
+                *(flights.do("key", call) for _ in range(3)),
+                return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertEqual([str(result) for result in results],
+                         ["upstream failed"] * 3)
+
+    def test_cancelled_caller_keeps_the_call(self):
+        """Cancelling one caller does not cancel the shared call."""
+        async def call():
+            await asyncio.sleep(0.02)
+            return 7
+
+        async def main():
+            flights = AsyncSingleFlight()
+            first = asyncio.ensure_future(flights.do("key", call))
+            second = asyncio.ensure_future(flights.do("key", call))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(main()), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()